@@ -1,17 +1,45 @@
-# ai_processer.py (LLM 并发优化修正版)
+# ai_processer.py (LLM 异步自适应并发版)
 
+import asyncio
 import json
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from openai import OpenAI
-from simhash import Simhash
-import re
-from simhash_utils import generate_simhash
-import concurrent.futures  # 引入并发库
-from config import AI_API_KEY, AI_BASE_URL, AI_MODEL_NAME, SIMHASH_THRESHOLD
-
-# 假设 SimHash 位宽为 128 (与 simhash_utils.py 保持一致)
-SIMHASH_F_BITS = 128
-MAX_LLM_WORKERS = 5  # LLM 并发线程数：不宜设置过高，以避免API限速
+from openai import AsyncOpenAI, OpenAI
+from typing import Callable, Optional, Sequence
+from dedup_engines import DedupEngine, create_dedup_engine, get_text_features  # noqa: F401 - get_text_features 保留旧导入路径
+from dup_clusters import DuplicateClusters
+from diff_utils import diff_blocks
+from llm_cache import LLMCache, make_cache_key
+from llm_engine import AdaptiveLLMEngine
+from llm_metrics import format_summary, run_metrics
+from llm_output import (
+    KEY_POINT_MAX_CHARS,
+    KEY_POINTS_COUNT,
+    OutputValidationError,
+    build_correction_prompt,
+    correction_history,
+    parse_map_output,
+    parse_summary_output,
+)
+from llm_router import TIER_LARGE, TIER_SMALL, ModelRouter, ModelTier, create_tier_limiter
+from prompt_builder import clean_text, prompt_stats, select_content, split_chunks
+from rate_limiter import RateLimiter, estimate_request_tokens, estimate_tokens, usage_total_tokens
+from config import (
+    AI_API_KEY,
+    AI_BASE_URL,
+    AI_MODEL_NAME,
+    INCREMENTAL_SUMMARY_ENABLED,
+    INCREMENTAL_SUMMARY_MAX_CHANGE_RATIO,
+    INCREMENTAL_SUMMARY_MAX_CHARS,
+    LLM_CACHE_ENABLED,
+    LLM_CHUNK_OVERLAP_TOKENS,
+    LLM_CHUNK_TOKENS,
+    LLM_LONG_DOC_TOKENS,
+    LLM_MAX_CHUNKS,
+    LLM_SUMMARY_MIN_CHARS,
+    SIMHASH_THRESHOLD,
+)
 
 # ----------------------------------------------------------------------
 # AI配置
@@ -20,16 +48,59 @@ client = OpenAI(
     api_key=AI_API_KEY,
     base_url=AI_BASE_URL,
 )
+# 同步客户端保留 SDK 自带重试（同步路径不经过 AdaptiveLLMEngine），重试次数无法观测，在运行报告中记为未知
+_SYNC_RETRIES_UNKNOWN = None
 
 
 # ----------------------------------------------------------------------
-# 辅助函数：SimHash 去重 (已包含 SimHash 位宽修正)
+# 辅助函数：近重复去重（引擎可插拔，默认 SimHash）
 # ----------------------------------------------------------------------
-def filter_duplicates(articles: list, threshold: int = SIMHASH_THRESHOLD) -> tuple[list, list]:
-    stored_entries: list[dict] = []
+def _default_article_key(item: dict) -> str:
+    return str(item.get('slug') or item.get('id') or item.get('link') or item.get('url') or item.get('title') or '')
+
+
+def _filtered_reference(item: dict, reason: str) -> dict:
+    """构造过滤记录：仅保留元数据，不再复制正文。"""
+
+    reference = {key: value for key, value in item.items() if key != 'content'}
+    reference['_filtered_reason'] = reason
+    return reference
+
+
+def filter_duplicates(
+    articles: list,
+    threshold: int = SIMHASH_THRESHOLD,
+    clusters: Optional[DuplicateClusters] = None,
+    key_func: Optional[Callable[[dict], str]] = None,
+    engine: Optional[DedupEngine] = None,
+) -> tuple[list, list]:
+    """近重复去重，具体算法由 config.DEDUP_ENGINE 选择（见 dedup_engines.py）。
+
+    传入 clusters 时，除本批文章外还会与历史唯一文章的指纹比对，
+    命中的匹配写入并查集；被过滤的重复文章只记录 canonical 文章的 key。
+    threshold 仅对 SimHash 引擎生效。
+    """
+
+    key_func = key_func or _default_article_key
+    engine = engine or create_dedup_engine(simhash_threshold=threshold)
+    batch_index = engine.new_index()
+    batch_articles: dict[str, dict] = {}
     unique_articles: list[dict] = []
     filtered_articles: list[dict] = []
 
+    history_index = None
+    if clusters is not None:
+        clusters.bind_engine(engine.name)
+        batch_keys = {key_func(item) for item in articles}
+        history_index = engine.new_index()
+        for history_key, encoded in clusters.iter_fingerprints():
+            if history_key in batch_keys:
+                continue
+            try:
+                history_index.add(history_key, engine.decode(encoded))
+            except ValueError:
+                continue
+
     for item in articles:
         content = item.get('content', '')
         if not content:
@@ -39,28 +110,32 @@ def filter_duplicates(articles: list, threshold: int = SIMHASH_THRESHOLD) -> tup
             continue
 
         try:
-            item_simhash = generate_simhash(content)
+            fingerprint = engine.fingerprint(content)
         except Exception as e:
             filtered_item = item.copy()
-            filtered_item['_filtered_reason'] = f'simhash_error: {e}'
+            filtered_item['_filtered_reason'] = f'{engine.name}_error: {e}'
             filtered_articles.append(filtered_item)
             continue
 
-        duplicate_of = None
-        for entry in stored_entries:
-            existing_simhash = Simhash(int(entry['value']), f=SIMHASH_F_BITS)
-            distance = item_simhash.distance(existing_simhash)
-
-            if distance <= threshold:
-                duplicate_of = entry['article']
-                break
+        item_key = key_func(item)
+        duplicate_key = batch_index.query(fingerprint)
 
-        if duplicate_of is None:
+        if duplicate_key is None:
             unique_articles.append(item)
-            stored_entries.append({'value': item_simhash.value, 'article': item})
+            batch_index.add(item_key, fingerprint)
+            batch_articles[item_key] = item
+            if clusters is not None:
+                history_key = history_index.query(fingerprint)
+                if history_key is not None:
+                    clusters.record_match(item_key, history_key)
+                clusters.set_fingerprint(item_key, engine.encode(fingerprint))
         else:
-            filtered_item = item.copy()
-            filtered_item['_filtered_reason'] = 'duplicate'
+            duplicate_of = batch_articles[duplicate_key]
+            canonical_key = duplicate_key
+            if clusters is not None:
+                canonical_key = clusters.record_match(item_key, duplicate_key)
+            filtered_item = _filtered_reference(item, 'duplicate')
+            filtered_item['_duplicate_of'] = canonical_key
             filtered_item['_duplicate_of_title'] = duplicate_of.get('title')
             filtered_item['_duplicate_of_source'] = duplicate_of.get('source')
             filtered_articles.append(filtered_item)
@@ -68,133 +143,813 @@ def filter_duplicates(articles: list, threshold: int = SIMHASH_THRESHOLD) -> tup
     return unique_articles, filtered_articles
 
 
+_SUMMARY_FIELDS = ('deep_summary', 'key_points', 'open_question')
+
+
+def has_llm_summary(article: dict) -> bool:
+    """判断文章是否已带有可复用（未报错）的 LLM 摘要。"""
+
+    llm_result = article.get('llm_result')
+    if isinstance(llm_result, dict) and llm_result.get('error'):
+        return False
+    summary = article.get('deep_summary')
+    if not summary and isinstance(llm_result, dict):
+        summary = llm_result.get('deep_summary')
+    return bool(summary)
+
+
+def inherit_cluster_summary(article: dict, source: dict) -> dict:
+    """让 article 继承同簇文章 source 的摘要，不调用 LLM。"""
+
+    inherited = article.copy()
+    llm_result = dict(source.get('llm_result') or {})
+    for field in _SUMMARY_FIELDS:
+        if source.get(field) is not None:
+            llm_result[field] = source[field]
+    llm_result.pop('error', None)
+
+    link = article.get('link') or article.get('url')
+    summary = llm_result.get('deep_summary') or ''
+    summary_with_link = summary
+    if link and summary:
+        summary_with_link = f"{summary.rstrip()}\n\n原文链接：{link}"
+    llm_result['deep_summary_with_link'] = summary_with_link
+
+    inherited['llm_result'] = llm_result
+    inherited['deep_summary'] = summary
+    inherited['deep_summary_with_link'] = summary_with_link
+    inherited['key_points'] = llm_result.get('key_points', [])
+    inherited['open_question'] = llm_result.get('open_question', '')
+    inherited['processed_at'] = source.get('processed_at') or datetime.now().isoformat()
+    return inherited
+
+
 # ----------------------------------------------------------------------
 # LLM 核心处理逻辑
 # ----------------------------------------------------------------------
-def process_with_llm(article: dict) -> dict:
-    """调用 AI API 为单篇文章生成结构化摘要。"""
+# 提示词布局：固定前缀 + 逐篇内容
+# 服务商的前缀缓存（OpenAI、DeepSeek 等）只对与此前请求逐 token 相同的开头生效。
+# 系统提示、输出格式说明与少样本示例组成固定前缀 PROMPT_PREFIX_MESSAGES，放在每次请求的最前面；
+# 标题、正文、变更等逐篇变化的内容一律放在最后一条 user 消息中。
+SYSTEM_PROMPT = (
+    "你是一位专注于服务南京大学学生的信息提炼专家。你的任务是阅读给定文章，提取对南大学生最有价值的信息，包括：紧急通知、学术DDL（截止日期）、奖学金/实习/竞赛等资源机遇、校园活动、以及学业与个人发展建议。输出必须严格遵循指定JSON结构，不包含任何额外文本或说明。摘要和要点应基于事实、突出时效性和可操作性，语言简洁清晰。"
+)
+
+# 字数要求取自 llm_output 的校验常量，修改时提示词与校验同步变化
+SCHEMA_INSTRUCTIONS = f"""除非用户消息另行指定输出格式，请返回 JSON，字段要求：
+- deep_summary：不少于{LLM_SUMMARY_MIN_CHARS}字的中文摘要，聚焦关键有效信息。
+- key_points：长度为{KEY_POINTS_COUNT}的字符串数组，每项{KEY_POINT_MAX_CHARS}字以内，概述核心要点。
+- open_question：一个引导深入思考的开放性问题。
+"""
+
+# 少样本示例：(用户消息, 模型回复)，格式与 _build_full_prompt 的输出一致
+FEW_SHOT_EXAMPLES = (
+    (
+        """请为下面的文章生成摘要。
+文章标题：关于2024-2025学年国家奖学金评审工作的通知
+文章内容：
+各院系：根据学校安排，2024-2025学年国家奖学金评审工作现已启动。
+申请对象为我校全日制本科二年级及以上学生，上一学年综合测评排名位于本专业前10%，且无不及格课程记录。
+申请人须于10月20日17:00前登录学生工作系统提交申请表及证明材料，经逐级审核后由院系推荐。每人奖励金额为10000元。
+评审结果将于11月上旬在学生工作处网站公示，公示期5个工作日。如有疑问请联系所在院系辅导员。""",
+        json.dumps({
+            'deep_summary': (
+                "南京大学2024-2025学年国家奖学金评审工作已经启动，面向全日制本科二年级及以上学生。"
+                "申请需同时满足两项条件：上一学年综合测评成绩位于本专业前10%，且没有不及格课程记录。"
+                "符合条件的同学须在10月20日17:00前登录学生工作系统，提交申请表和相关证明材料，错过截止时间将无法参评。"
+                "材料经院系逐级审核后由院系推荐，获评者每人可获得10000元奖励。"
+                "评审结果预计于11月上旬在学生工作处网站公示，公示期为5个工作日。"
+                "有意申请的同学应尽早核对自己的综测排名、准备证明材料，遇到问题可联系所在院系辅导员。"
+            ),
+            'key_points': ['10月20日17:00前提交申请', '综测前10%且无挂科', '奖金1万元，11月上旬公示'],
+            'open_question': '除了综测排名，你还能通过哪些方面的积累提升自己在奖学金评审中的竞争力？',
+        }, ensure_ascii=False),
+    ),
+)
+
+
+def _build_prefix_messages() -> tuple:
+    messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{SCHEMA_INSTRUCTIONS}"}]
+    for user_example, assistant_example in FEW_SHOT_EXAMPLES:
+        messages.append({"role": "user", "content": user_example})
+        messages.append({"role": "assistant", "content": assistant_example})
+    return tuple(messages)
+
+
+PROMPT_PREFIX_MESSAGES = _build_prefix_messages()
+PROMPT_PREFIX_TEXT = '\n'.join(message['content'] for message in PROMPT_PREFIX_MESSAGES)
+
+# 修改前缀或提示词模板时同步提升版本号，旧的缓存结果随之失效（见 llm_cache.py）
+PROMPT_PREFIX_VERSION = 'prefix-v3'
+FULL_PROMPT_VERSION = 'full-v3'
+INCREMENTAL_PROMPT_VERSION = 'incremental-v2'
+MAP_PROMPT_VERSION = 'map-v2'
+REDUCE_PROMPT_VERSION = 'reduce-v2'
+
+
+def _build_full_prompt(title: str, content: str) -> str:
+    selected = select_content(title, content)
+    label = '文章内容（已按重要性节选，“……”处有省略）' if selected.truncated else '文章内容'
+    return f"""请为下面的文章生成摘要。
+文章标题：{title}
+{label}：
+{selected.text}"""
+
+
+def _build_incremental_prompt(title: str, previous: dict, changes: str) -> str:
+    previous_points = previous.get('key_points') or (previous.get('llm_result') or {}).get('key_points') or []
+    if isinstance(previous_points, list):
+        previous_points = '\n'.join(f"- {point}" for point in previous_points)
+    previous_summary = previous.get('deep_summary') or (previous.get('llm_result') or {}).get('deep_summary') or ''
+    return f"""这篇文章此前已生成摘要，现在正文有局部更新。请结合原摘要与下列变更内容，输出更新后的完整摘要：
+保留仍然有效的信息，纳入新增/修改的内容，删除已被撤销或替换的信息。
+文章标题：{title}
+
+原摘要：
+{previous_summary}
+
+原要点：
+{previous_points}
+
+正文变更：
+{changes}"""
+
+
+def _build_map_prompt(title: str, index: int, total: int, chunk: str) -> str:
+    return f"""以下是长文档《{title}》的第 {index}/{total} 部分（相邻部分有少量重叠）。
+请只依据这一部分，提取对南大学生有价值的信息，务必保留其中的日期、截止时间、金额、地点与报名方式。
+本步骤不使用默认格式，请返回 JSON：{{"summary": "本部分的中文摘要（150字以内）", "facts": ["关键事实", ...]}}
+
+{chunk}"""
+
+
+def _build_reduce_prompt(title: str, partials: list[dict]) -> str:
+    sections = []
+    for index, partial in enumerate(partials, 1):
+        facts = partial.get('facts') or []
+        if isinstance(facts, list):
+            facts = '；'.join(str(fact) for fact in facts)
+        sections.append(f"[第 {index} 部分] {partial.get('summary', '')}\n关键事实：{facts}")
+    joined = '\n\n'.join(sections)
+    return f"""这是一篇长文档，以下是按原文顺序分段提炼的摘要与关键事实。请汇总为整篇文档的摘要，合并重复信息，保留全部时效性信息。
+文章标题：{title}
+
+{joined}"""
+
+
+def _long_document_chunks(content: str) -> Optional[list[str]]:
+    """正文超过 LLM_LONG_DOC_TOKENS 时切块走 map-reduce，否则返回 None。"""
+
+    if LLM_LONG_DOC_TOKENS <= 0:
+        return None
+    text = clean_text(content)
+    total_tokens = estimate_tokens(text)
+    if total_tokens <= LLM_LONG_DOC_TOKENS:
+        return None
+    # 块数超过上限时放大块尺寸，保证覆盖全文
+    chunk_tokens = max(LLM_CHUNK_TOKENS, -(-total_tokens // max(LLM_MAX_CHUNKS, 1)) + LLM_CHUNK_OVERLAP_TOKENS)
+    return split_chunks(text, chunk_tokens, LLM_CHUNK_OVERLAP_TOKENS)
+
+
+def summarize_changes(old_content: str, new_content: str) -> tuple[str, float]:
+    """按段落比对新旧正文，返回 (变更内容描述, 变更比例)。变更比例按字符数相对新正文计算。"""
+
+    sections = []
+    changed_chars = 0
+    for block in diff_blocks(old_content, new_content, granularity='paragraph', include_deletes=True):
+        if block.tag == 'insert':
+            sections.append(f"[新增]\n{block.text}")
+        elif block.tag == 'replace':
+            sections.append(f"[修改] 原文：\n{block.old_text}\n[修改] 新文：\n{block.text}")
+        else:
+            sections.append(f"[删除]\n{block.old_text}")
+        changed_chars += max(len(block.text), len(block.old_text))
+
+    ratio = changed_chars / max(len(new_content), 1)
+    return '\n\n'.join(sections), ratio
+
+
+def _incremental_changes(article: dict, previous: Optional[dict]) -> Optional[tuple[str, float]]:
+    """判断能否走增量摘要；可以时返回 (变更内容, 变更比例)，否则返回 None 走全文摘要。"""
+
+    if not INCREMENTAL_SUMMARY_ENABLED or not previous or not has_llm_summary(previous):
+        return None
+
+    old_content = previous.get('content')
+    new_content = article.get('content')
+    if not isinstance(old_content, str) or not isinstance(new_content, str) or not old_content.strip():
+        return None
+
+    changes, ratio = summarize_changes(old_content, new_content)
+    if not changes or ratio > INCREMENTAL_SUMMARY_MAX_CHANGE_RATIO or len(changes) > INCREMENTAL_SUMMARY_MAX_CHARS:
+        return None
+    return changes, ratio
+
+
+def _attach_llm_output(article: dict, llm_output_json: dict) -> dict:
+    llm_result = {
+        'deep_summary': llm_output_json.get('deep_summary', '').strip(),
+        'key_points': llm_output_json.get('key_points', []),
+        'open_question': llm_output_json.get('open_question', '').strip()
+    }
+
+    link = article.get('link') or article.get('url')
+    summary_with_link = llm_result['deep_summary']
+    if link and llm_result['deep_summary']:
+        summary_with_link = f"{llm_result['deep_summary'].rstrip()}\n\n原文链接：{link}"
+
+    llm_result['deep_summary_with_link'] = summary_with_link
+
+    article['llm_result'] = llm_result
+    article['deep_summary'] = llm_result['deep_summary']
+    article['deep_summary_with_link'] = summary_with_link
+    article['key_points'] = llm_result['key_points']
+    article['open_question'] = llm_result['open_question']
+    article['processed_at'] = datetime.now().isoformat()
+    return llm_result
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(tier: str = TIER_LARGE) -> RateLimiter:
+    """返回进程内共享的 RPM/TPM 限速器（每个模型档位一份），线程与协程共用同一份配额。"""
+    if tier not in _rate_limiters:
+        _rate_limiters[tier] = create_tier_limiter(tier)
+    return _rate_limiters[tier]
+
+
+def create_model_router(engine: Optional[AdaptiveLLMEngine] = None) -> ModelRouter:
+    """按 config 构建模型路由，各档位使用进程内共享的限速器；engine 为大模型档位的并发引擎。"""
+    return ModelRouter.from_config(engine, {tier: get_rate_limiter(tier) for tier in (TIER_LARGE, TIER_SMALL)})
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """返回进程内共享的 LLM 结果缓存（首次调用时从磁盘加载）；未启用时返回 None。"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMCache.load()
+    return _llm_cache
+
+
+@dataclass
+class LLMRequest:
+    """单篇文章的一次摘要请求（同步与异步路径共用）。"""
+
+    article: dict
+    title: str
+    user_prompt: str  # map-reduce 模式下为清洗后的全文，仅用于缓存键
+    prompt_version: str = FULL_PROMPT_VERSION
+    incremental: bool = False
+    change_ratio: Optional[float] = None
+    chunks: Optional[list[str]] = None
+    cache_key: Optional[str] = None
+    estimated_tokens: int = 0
+    model: str = AI_MODEL_NAME
+    tier: str = TIER_LARGE
+    escalated: bool = False
+
+    @property
+    def kind(self) -> str:
+        if self.incremental:
+            return 'incremental'
+        return 'map_reduce' if self.chunks else 'full'
+
+    def create_kwargs(self) -> dict:
+        return _chat_kwargs(self.user_prompt, self.model)
+
+
+def _chat_kwargs(user_prompt: str, model: str = AI_MODEL_NAME, history: Sequence[dict] = ()) -> dict:
+    """history 为追问前已有的对话轮次（纠错重问时为原提示词与上次输出）。"""
+
+    return {
+        'model': model,
+        # 固定前缀在前、逐篇内容在后，使服务商的前缀缓存在每次调用中都能命中
+        'messages': [*PROMPT_PREFIX_MESSAGES, *history, {"role": "user", "content": user_prompt}],
+        'response_format': {"type": "json_object"},
+    }
+
+
+def prepare_llm_request(
+    article: dict,
+    previous: Optional[dict] = None,
+    cache: Optional[LLMCache] = None,
+    router: Optional[ModelRouter] = None,
+    priority: Optional[float] = None,
+) -> LLMRequest:
+    """构建提示词：previous 为上一版且变更较小时走增量摘要，否则走全文摘要。
+
+    传入 router 时按篇幅、来源与 priority 选择模型档位，否则使用 AI_MODEL_NAME。
+    """
 
     title = article.get('title', '无标题')
     content = article.get('content', '')
+    incremental = _incremental_changes(article, previous)
+    chunks = None if incremental else _long_document_chunks(content)
+    if incremental:
+        changes, change_ratio = incremental
+        request = LLMRequest(
+            article,
+            title,
+            _build_incremental_prompt(title, previous, changes),
+            INCREMENTAL_PROMPT_VERSION,
+            incremental=True,
+            change_ratio=change_ratio,
+        )
+    elif chunks:
+        request = LLMRequest(
+            article, title, f"{title}\n{clean_text(content)}", f"{MAP_PROMPT_VERSION}+{REDUCE_PROMPT_VERSION}", chunks=chunks
+        )
+    else:
+        request = LLMRequest(article, title, _build_full_prompt(title, content))
+    request.estimated_tokens = estimate_request_tokens(PROMPT_PREFIX_TEXT, request.user_prompt)
+    if router is not None:
+        tier = router.choose(article, request.kind, estimate_tokens(request.user_prompt), priority)
+        request.model, request.tier = tier.model, tier.name
 
-    system_prompt = (
-        "你是一位专注于服务南京大学学生的信息提炼专家。你的任务是阅读给定文章，提取对南大学生最有价值的信息，包括：紧急通知、学术DDL（截止日期）、奖学金/实习/竞赛等资源机遇、校园活动、以及学业与个人发展建议。输出必须严格遵循指定JSON结构，不包含任何额外文本或说明。摘要和要点应基于事实、突出时效性和可操作性，语言简洁清晰。"
-    )
+    if cache is not None:
+        request.cache_key = _request_cache_key(request)
+    return request
 
-    user_prompt = f"""
-文章标题：{title}
-文章内容（已截断）：
-{content[:8000]}
 
-请返回 JSON，字段要求：
-- deep_summary：不少于180字的中文摘要，聚焦关键有效信息。
-- key_points：长度为3的字符串数组，每项20字以内，概述核心要点。
-- open_question：一个引导深入思考的开放性问题。
-"""
+def _request_cache_key(request: LLMRequest) -> str:
+    return make_cache_key(request.user_prompt, PROMPT_PREFIX_VERSION, request.prompt_version, request.model)
+
+
+def _lookup_cached(request: LLMRequest, cache: Optional[LLMCache]) -> Optional[dict]:
+    if cache is None or request.cache_key is None:
+        return None
+    cached_output = cache.get(request.cache_key)
+    if cached_output is None:
+        return None
+    run_metrics.record_cache_hit()
+    llm_result = _finish_llm_request(request, cached_output)
+    llm_result['cached'] = True
+    print(f" [AI] 命中结果缓存: {request.title}")
+    return request.article
+
+
+def _finish_llm_request(request: LLMRequest, llm_output_json: dict) -> dict:
+    llm_result = _attach_llm_output(request.article, llm_output_json)
+    llm_result['model'] = request.model
+    if request.escalated:
+        llm_result['escalated'] = True
+    if request.incremental:
+        llm_result['mode'] = 'incremental'
+        llm_result['change_ratio'] = round(request.change_ratio, 4)
+    elif request.chunks:
+        llm_result['mode'] = 'map_reduce'
+        llm_result['chunks'] = len(request.chunks)
+    return llm_result
+
+
+def _completion_text(completion) -> str:
+    return completion.choices[0].message.content or ''
 
+
+def _accept_output(parser: Callable, text: str) -> dict:
+    """校验（必要时先本地修复）模型输出，返回规范化结果；修复后仍不合格时抛出 OutputValidationError。"""
+
+    output, repairs = parser(text)
+    if repairs:
+        run_metrics.increment('repaired')
+    return output
+
+
+def _complete_llm_request(request: LLMRequest, completion, cache: Optional[LLMCache]) -> dict:
+    """同步路径：校验输出，本地修复失败时追问一次（原提示词与上次输出在前，纠错提示在后）。"""
+
+    limiter = get_rate_limiter()
+    limiter.reconcile(request.estimated_tokens, usage_total_tokens(completion))
+    text = _completion_text(completion)
     try:
-        completion = client.chat.completions.create(
-            model=AI_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"}
+        return _complete_with_output(request, _accept_output(parse_summary_output, text), cache)
+    except OutputValidationError as error:
+        correction = build_correction_prompt(error)
+        history = correction_history(request.user_prompt, text)
+        print(f" [AI] 输出未通过校验（{error}），发送纠错提示: {request.title}")
+        run_metrics.increment('reasked')
+        estimated_tokens = _reask_tokens(history, correction)
+        limiter.acquire(estimated_tokens)
+        started = time.monotonic()
+        completion = client.chat.completions.create(**_chat_kwargs(correction, request.model, history))
+        run_metrics.record_completion(
+            'reask', completion, time.monotonic() - started, _SYNC_RETRIES_UNKNOWN, request.title, request.model
         )
+        limiter.reconcile(estimated_tokens, usage_total_tokens(completion))
+        return _complete_with_output(request, _accept_output(parse_summary_output, _completion_text(completion)), cache)
 
-        llm_output_json = json.loads(completion.choices[0].message.content)
 
-        llm_result = {
-            'deep_summary': llm_output_json.get('deep_summary', '').strip(),
-            'key_points': llm_output_json.get('key_points', []),
-            'open_question': llm_output_json.get('open_question', '').strip()
-        }
+def _reask_tokens(history: Sequence[dict], correction: str) -> int:
+    return estimate_request_tokens(PROMPT_PREFIX_TEXT, '\n'.join([*(turn['content'] for turn in history), correction]))
+
+
+async def _validated_output_async(
+    tier: ModelTier,
+    async_client: AsyncOpenAI,
+    completion,
+    user_prompt: str,
+    estimated_tokens: int,
+    parser: Callable = parse_summary_output,
+    title: Optional[str] = None,
+    reask: bool = True,
+) -> dict:
+    """异步路径的输出校验：本地修复失败且 reask 为真时，在同一档位对 user_prompt 追问一次。"""
+
+    tier.limiter.reconcile(estimated_tokens, usage_total_tokens(completion))
+    text = _completion_text(completion)
+    try:
+        return _accept_output(parser, text)
+    except OutputValidationError as error:
+        if not reask:
+            raise
+        correction = build_correction_prompt(error)
+        history = correction_history(user_prompt, text)
+        print(f" [AI] 输出未通过校验（{error}），发送纠错提示: {title}")
+        run_metrics.increment('reasked')
+        correction_tokens = _reask_tokens(history, correction)
+        completion = await _chat_async(tier, async_client, correction, correction_tokens, 'reask', title, history)
+        tier.limiter.reconcile(correction_tokens, usage_total_tokens(completion))
+        return _accept_output(parser, _completion_text(completion))
+
+
+def _complete_with_output(request: LLMRequest, llm_output_json: dict, cache: Optional[LLMCache]) -> dict:
+    _finish_llm_request(request, llm_output_json)
+    if cache is not None and request.cache_key is not None:
+        cache.put(request.cache_key, llm_output_json)
+
+    if request.incremental:
+        print(f" [AI] 增量更新文章摘要: {request.title}（变更比例 {request.change_ratio:.1%}）")
+    elif request.chunks:
+        print(f" [AI] 成功处理长文档: {request.title}（分 {len(request.chunks)} 段汇总）")
+    else:
+        print(f" [AI] 成功处理文章: {request.title}")
+    return request.article
 
-        link = article.get('link') or article.get('url')
-        summary_with_link = llm_result['deep_summary']
-        if link and llm_result['deep_summary']:
-            summary_with_link = f"{llm_result['deep_summary'].rstrip()}\n\n原文链接：{link}"
 
-        llm_result['deep_summary_with_link'] = summary_with_link
+def _fail_llm_request(request: LLMRequest, error: Exception) -> dict:
+    print(f" [AI] ERROR: 处理文章 '{request.title}' 失败: {error}")
+    article = request.article
+    article.setdefault('llm_result', {})
+    article['llm_result']['error'] = str(error)
+    article['llm_result'].setdefault('deep_summary', '')
+    return article
 
-        article['llm_result'] = llm_result
-        article['deep_summary'] = llm_result['deep_summary']
-        article['deep_summary_with_link'] = summary_with_link
-        article['key_points'] = llm_result['key_points']
-        article['open_question'] = llm_result['open_question']
-        article['processed_at'] = datetime.now().isoformat()
 
-        print(f" [AI] 成功处理文章: {title}")
+def process_with_llm(article: dict, previous: Optional[dict] = None, cache: Optional[LLMCache] = None) -> dict:
+    """调用 AI API 为单篇文章生成结构化摘要（同步版本，批量处理见 process_all_data_with_ai）。
+
+    previous 为该文章上一版（含正文与摘要）时，若变更比例不超过
+    INCREMENTAL_SUMMARY_MAX_CHANGE_RATIO，只把变更段落与原摘要发给模型做增量更新。
+    cache 未指定时使用 get_llm_cache()；提示词相同的输入直接复用缓存结果。
+    """
+
+    cache = cache if cache is not None else get_llm_cache()
+    request = prepare_llm_request(article, previous, cache)
+    if _lookup_cached(request, cache) is not None:
         return article
+    if request.chunks:
+        # 长文档的分段调用需要并发，借用异步路径完成
+        return asyncio.run(_process_single_async(article, previous, cache))
 
+    started = completion = None
+    try:
+        get_rate_limiter().acquire(request.estimated_tokens)
+        started = time.monotonic()
+        completion = client.chat.completions.create(**request.create_kwargs())
+        run_metrics.record_completion(
+            request.kind, completion, time.monotonic() - started, _SYNC_RETRIES_UNKNOWN, request.title, request.model
+        )
+        return _complete_llm_request(request, completion, cache)
     except Exception as e:
-        print(f" [AI] ERROR: 处理文章 '{title}' 失败: {e}")
-        article.setdefault('llm_result', {})
-        article['llm_result']['error'] = str(e)
-        article['llm_result'].setdefault('deep_summary', '')
+        if completion is None:
+            latency = None if started is None else time.monotonic() - started
+            run_metrics.record_failure(request.kind, e, latency, _SYNC_RETRIES_UNKNOWN, request.title, request.model)
+        return _fail_llm_request(request, e)
+
+
+async def process_with_llm_async(
+    article: dict,
+    router: ModelRouter,
+    async_client: AsyncOpenAI,
+    previous: Optional[dict] = None,
+    cache: Optional[LLMCache] = None,
+    priority: Optional[float] = None,
+) -> dict:
+    """process_with_llm 的异步版本：由 router 选择模型档位，先等待该档位的 RPM/TPM 配额，
+    再经由其自适应并发窗口发出。
+
+    输出先在本地校验与修复；小模型的输出仍不合格时升级到大模型，大模型的输出仍不合格时
+    用简短纠错提示重问一次。
+    """
+
+    request = prepare_llm_request(article, previous, cache, router, priority)
+    if _lookup_cached(request, cache) is not None:
         return article
+    router.record_route(request.tier)
+
+    try:
+        if request.chunks:
+            llm_output_json = await _map_reduce_async(request, router.large, async_client, cache)
+            return _complete_with_output(request, llm_output_json, cache)
+
+        tier = router.tier(request.tier)
+        completion = await _chat_async(
+            tier, async_client, request.user_prompt, request.estimated_tokens, request.kind, request.title
+        )
+        try:
+            llm_output_json = await _validated_output_async(
+                tier,
+                async_client,
+                completion,
+                request.user_prompt,
+                request.estimated_tokens,
+                title=request.title,
+                reask=tier is router.large,
+            )
+        except OutputValidationError as error:
+            if tier is router.large:
+                raise
+            # 小模型输出修复后仍不合格：同一提示词升级到大模型
+            router.record_escalation()
+            run_metrics.increment('escalated')
+            print(f" [AI] 小模型输出未通过校验（{error}），升级到 {router.large.model}: {request.title}")
+            request.model, request.tier, request.escalated = router.large.model, TIER_LARGE, True
+            if request.cache_key is not None:
+                # 结果由大模型产出，按大模型写入缓存，避免之后的小模型请求命中大模型结果
+                request.cache_key = _request_cache_key(request)
+            completion = await _chat_async(
+                router.large, async_client, request.user_prompt, request.estimated_tokens, request.kind, request.title
+            )
+            llm_output_json = await _validated_output_async(
+                router.large, async_client, completion, request.user_prompt, request.estimated_tokens, title=request.title
+            )
+        return _complete_with_output(request, llm_output_json, cache)
+    except Exception as e:
+        return _fail_llm_request(request, e)
+
+
+async def _chat_async(
+    tier: ModelTier,
+    async_client: AsyncOpenAI,
+    user_prompt: str,
+    estimated_tokens: int,
+    kind: str = 'full',
+    title: Optional[str] = None,
+    history: Sequence[dict] = (),
+):
+    """经由档位的并发引擎与限速器发出一次对话请求，并把用量、延迟与重试次数计入 run_metrics。"""
+
+    info: dict = {}
+    try:
+        completion = await tier.engine.call(
+            lambda: async_client.chat.completions.create(**_chat_kwargs(user_prompt, tier.model, history)),
+            before_attempt=lambda: tier.limiter.acquire_async(estimated_tokens),
+            info=info,
+        )
+    except Exception as e:
+        retries = max(0, int(info.get('attempts', 1)) - 1)
+        run_metrics.record_failure(kind, e, info.get('latency'), retries, title, tier.model)
+        raise
+    retries = max(0, int(info.get('attempts', 1)) - 1)
+    run_metrics.record_completion(kind, completion, info.get('latency'), retries, title, tier.model)
+    return completion
+
+
+async def _chat_json_async(
+    tier: ModelTier,
+    async_client: AsyncOpenAI,
+    user_prompt: str,
+    prompt_version: str,
+    cache: Optional[LLMCache],
+    kind: str,
+    title: Optional[str] = None,
+) -> dict:
+    """发送一次 JSON 对话请求，结果按提示词写入缓存（用于 map-reduce 的分段与汇总调用）。"""
+
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(user_prompt, PROMPT_PREFIX_VERSION, prompt_version, tier.model)
+        cached_output = cache.get(cache_key)
+        if cached_output is not None:
+            run_metrics.record_cache_hit()
+            return cached_output
+
+    estimated_tokens = estimate_request_tokens(PROMPT_PREFIX_TEXT, user_prompt)
+    completion = await _chat_async(tier, async_client, user_prompt, estimated_tokens, kind, title)
+    parser = parse_map_output if kind == 'map' else parse_summary_output
+    output = await _validated_output_async(tier, async_client, completion, user_prompt, estimated_tokens, parser, title)
+    if cache_key is not None:
+        cache.put(cache_key, output)
+    return output
+
+
+async def _map_reduce_async(
+    request: LLMRequest,
+    tier: ModelTier,
+    async_client: AsyncOpenAI,
+    cache: Optional[LLMCache],
+) -> dict:
+    """长文档：各分段并发摘要（共享并发窗口与配额），再汇总为标准 JSON 结构。"""
+
+    total = len(request.chunks)
+    partials = await asyncio.gather(*(
+        _chat_json_async(
+            tier,
+            async_client,
+            _build_map_prompt(request.title, index, total, chunk),
+            MAP_PROMPT_VERSION,
+            cache,
+            'map',
+            request.title,
+        )
+        for index, chunk in enumerate(request.chunks, 1)
+    ))
+    reduce_prompt = _build_reduce_prompt(request.title, list(partials))
+    return await _chat_json_async(
+        tier, async_client, reduce_prompt, REDUCE_PROMPT_VERSION, cache, 'reduce', request.title
+    )
+
+
+async def _process_single_async(article: dict, previous: Optional[dict], cache: Optional[LLMCache]) -> dict:
+    async_client = create_async_client()
+    try:
+        return await process_with_llm_async(article, create_model_router(), async_client, previous, cache)
+    finally:
+        await async_client.close()
 
 
 # ----------------------------------------------------------------------
-# 核心修正：主处理流程引入并发
+# 离线批处理（见 llm_batch.py）
 # ----------------------------------------------------------------------
-def process_all_data_with_ai(unique_articles: list) -> list:
+def build_batch_requests(
+    articles: list,
+    previous_versions: Optional[dict[str, dict]] = None,
+    key_func: Optional[Callable[[dict], str]] = None,
+) -> tuple[list, list, list]:
+    """为批处理构建请求，返回 (批处理条目, 需实时处理的文章, 命中缓存已完成的文章)。
+
+    批处理条目为 (article_key, 请求 body, 缓存键)；长文档需要多轮 map-reduce 调用，留给实时处理。
     """
-    使用线程池并发调用 LLM API，处理去重后的所有文章。
-    """
-    processed_list = []
 
-    print(f" [AI] 启动并发处理 {len(unique_articles)} 篇文章...")
+    previous_versions = previous_versions or {}
+    key_func = key_func or _default_article_key
+    cache = get_llm_cache()
+
+    entries, online, cached = [], [], []
+    for article in articles:
+        key = key_func(article)
+        request = prepare_llm_request(article, previous_versions.get(key), cache)
+        if _lookup_cached(request, cache) is not None:
+            cached.append(article)
+        elif request.chunks:
+            online.append(article)
+        else:
+            entries.append((key, request.create_kwargs(), request.cache_key))
+    return entries, online, cached
 
-    # 创建线程池
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_LLM_WORKERS) as executor:
 
-        # 提交所有任务给线程池
-        # executor.map 适用于将一个函数应用于列表中的所有元素
-        futures = {
-            executor.submit(process_with_llm, item): item
-            for item in unique_articles
-        }
+def apply_batch_output(article: dict, completion_body: dict, cache_key: Optional[str] = None) -> dict:
+    """把批处理输出中的 chat completion 写回文章；解析失败时按失败处理。"""
 
-        # 迭代已完成的任务，并打印进度
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-            article_item = futures[future]
+    # 批处理同样按用量计费，解析失败也要计入
+    record = run_metrics.record_completion('batch', completion_body, title=article.get('title'), model=AI_MODEL_NAME)
+    try:
+        llm_output_json = _accept_output(parse_summary_output, completion_body['choices'][0]['message']['content'])
+    except (KeyError, IndexError, TypeError, OutputValidationError) as e:
+        record.ok, record.error = False, str(e)
+        article.setdefault('llm_result', {})
+        article['llm_result']['error'] = f"批处理结果无法解析: {e}"
+        article['llm_result'].setdefault('deep_summary', '')
+        return article
 
-            try:
-                # 获取任务结果
-                result = future.result()
-                processed_list.append(result)
+    llm_result = _attach_llm_output(article, llm_output_json)
+    llm_result['mode'] = 'batch'
+    cache = get_llm_cache()
+    if cache is not None and cache_key:
+        cache.put(cache_key, llm_output_json)
+    return article
 
-                # 打印实时进度
-                print(f" [进度] 已完成 {i + 1}/{len(unique_articles)} 篇文章。")
 
-            except Exception as e:
-                # 如果单个任务失败，捕获异常，主流程继续
-                print(f" [严重] 任务失败，跳过文章 '{article_item.get('title')}'。错误: {e}")
-                processed_list.append(article_item)  # 即使失败，也保留原始数据
+# ----------------------------------------------------------------------
+# 主处理流程：asyncio + AIMD 自适应并发
+# ----------------------------------------------------------------------
+def create_async_client() -> AsyncOpenAI:
+    # 限流重试由 AdaptiveLLMEngine 负责，关闭 SDK 自带重试，使 429 能及时反馈到并发窗口
+    return AsyncOpenAI(api_key=AI_API_KEY, base_url=AI_BASE_URL, max_retries=0)
+
+
+async def _process_all_async(
+    unique_articles: list,
+    previous_versions: dict[str, dict],
+    key_func: Callable[[dict], str],
+    router: ModelRouter,
+    cache: Optional[LLMCache],
+    on_result: Optional[Callable[[dict], None]],
+    priorities: dict[str, float],
+) -> list:
+    processed_list = []
+    total = len(unique_articles)
+    async_client = create_async_client()
 
-    return processed_list
+    async def _run(item: dict) -> dict:
+        key = key_func(item)
+        try:
+            return await process_with_llm_async(
+                item, router, async_client, previous_versions.get(key), cache, priorities.get(key)
+            )
+        except Exception as e:
+            # 如果单个任务失败，捕获异常，主流程继续
+            print(f" [严重] 任务失败，跳过文章 '{item.get('title')}'。错误: {e}")
+            return item  # 即使失败，也保留原始数据
 
+    # 按传入顺序（即调度优先级）创建任务：先创建的任务先进入并发窗口的等待队列
+    tasks = [asyncio.ensure_future(_run(item)) for item in unique_articles]
+    try:
+        for i, task in enumerate(asyncio.as_completed(tasks)):
+            result = await task
+            processed_list.append(result)
+            if on_result is not None:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f" [AI] 警告: 写入结果检查点失败 '{result.get('title')}': {e}")
+            # 打印实时进度
+            print(f" [进度] 已完成 {i + 1}/{total} 篇文章（并发窗口 {router.large.engine.concurrency.limit:.1f}）。")
+    finally:
+        await async_client.close()
 
-#
-# (process_article_with_ai 和 process_all_data_with_ai 保持不变)
+    return processed_list
 
-# ----------------------------------------------------------------------
-# 辅助函数：SimHash 去重
-# ----------------------------------------------------------------------
 
-def get_text_features(s):
+def process_all_data_with_ai(
+    unique_articles: list,
+    previous_versions: Optional[dict[str, dict]] = None,
+    key_func: Optional[Callable[[dict], str]] = None,
+    engine: Optional[AdaptiveLLMEngine] = None,
+    on_result: Optional[Callable[[dict], None]] = None,
+    priorities: Optional[dict[str, float]] = None,
+    router: Optional[ModelRouter] = None,
+) -> list:
     """
-    Simhash 辅助函数：将文本分词并处理为特征列表。
-    这里使用简单的正则分词，你可以根据需要使用更专业的中文分词库如 jieba。
+    以 asyncio 并发调用 LLM API，处理去重后的所有文章。
+
+    并发数由 AdaptiveLLMEngine 按 AIMD 调整（LLM_MIN_CONCURRENCY ~ LLM_MAX_CONCURRENCY）。
+    previous_versions 为 key -> 上一版文章（key 由 key_func 计算），
+    用于对已有摘要的更新文档做增量摘要。
+    on_result 在每篇文章完成时立即回调（用于写检查点），而不是等整批结束。
+    priorities 为 key -> 调度优先级，供模型路由判断；router 缺省时按 config 构建（engine 作为大模型档位）。
+    每次调用的用量与延迟计入 llm_metrics.run_metrics，由调用方在运行开始时 reset。
     """
-    width = 3
-    s = s.lower()
-    s = re.sub(r'[^\w]+', '', s)  # 去除非字母数字字符
+    previous_versions = previous_versions or {}
+    key_func = key_func or _default_article_key
+    router = router or create_model_router(engine)
+    cache = get_llm_cache()
+    prompt_stats.reset()
+
+    print(
+        f" [AI] 启动并发处理 {len(unique_articles)} 篇文章"
+        f"（初始并发 {router.large.engine.concurrency.limit:.0f}）..."
+    )
+    processed_list = asyncio.run(
+        _process_all_async(unique_articles, previous_versions, key_func, router, cache, on_result, priorities or {})
+    )
 
-    # 使用滑动窗口生成 n-gram 特征
-    return [s[i:i + width] for i in range(max(len(s) - width + 1, 1))]
+    router_stats = router.stats()
+    for tier_name, stats in router_stats['tiers'].items():
+        print(
+            f" [AI] 并发窗口（{router.tier(tier_name).model}）: 最终 {stats['limit']}，峰值 {stats['peak_limit']}，"
+            f"限流 {stats['throttled']} 次，降窗 {stats['decreases']} 次。"
+        )
+    if router.small is not None:
+        print(
+            f" [AI] 模型路由: 小模型 {router_stats['routed'][TIER_SMALL]} 篇，"
+            f"大模型 {router_stats['routed'][TIER_LARGE]} 篇，校验失败升级 {router_stats['escalations']} 篇。"
+        )
+    if prompt_stats.truncated:
+        print(
+            f" [AI] 提示词节选: {prompt_stats.truncated}/{prompt_stats.articles} 篇超出预算，"
+            f"正文约 {prompt_stats.original_tokens} token，实际发送 {prompt_stats.used_tokens} token，"
+            f"节省 {prompt_stats.saved_tokens} token。"
+        )
+    if prompt_stats.markup_saved_tokens:
+        print(f" [AI] HTML 转纯文本: 节省 {prompt_stats.markup_saved_tokens} token。")
+    for tier_name in router_stats['tiers']:
+        limiter = router.tier(tier_name).limiter
+        if limiter.waited_seconds:
+            print(f" [AI] 配额限速（{router.tier(tier_name).model}）: 累计等待 {limiter.waited_seconds:.1f} 秒。")
+    if cache is not None:
+        cache.save()
+        stats = cache.stats()
+        print(f" [AI] 结果缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，共 {stats['entries']} 条。")
+    print(f" [AI] 用量统计: {format_summary(run_metrics.summary())}")
 
+    return processed_list
 
 
 # ----------------------------------------------------------------------
@@ -18,6 +18,7 @@ from config import (
     WECHAT_API_PASSWORD,
 )
 from urllib.parse import unquote
+from llm_metrics import load_run_reports
 
 # 延迟导入耗时/有副作用的流程，避免仅导入服务时即初始化 LLM 客户端
 
@@ -537,6 +538,18 @@ def ops_wechat_reload(
 
 
 
+# --------- 运营工具：LLM 用量、延迟与费用报告 ---------
+@app.get("/ops/llm/metrics", dependencies=[Depends(verify_token)])
+def ops_llm_metrics(
+    runs: int = Query(default=1, ge=1, le=100, description="返回最近几次运行的报告"),
+) -> JSONResponse:
+    """返回 main 写入的 LLM 运行报告（调用次数、token、估算费用、延迟 p50/p95/p99 等）。"""
+    reports = load_run_reports(limit=runs)
+    if not reports:
+        return fail(404, "no llm run report yet")
+    return ok(reports[0] if runs == 1 else reports, meta={"count": len(reports)})
+
+
 @app.get("/api/articles")
 def get_articles() -> JSONResponse:
     """获取处理后的文章数据"""
@@ -33,6 +33,19 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
+def _env_float(name: str, default: float) -> float:
+    """解析浮点数环境变量，无法解析时返回默认值。"""
+
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        cleaned = value.split('#', 1)[0].strip()
+        return float(cleaned)
+    except (TypeError, ValueError):
+        return default
+
+
 def _env_str(name: str, default: Optional[str] = None, *, strip: bool = True) -> Optional[str]:
     value = os.getenv(name)
     if value is None:
@@ -49,17 +62,118 @@ AI_API_KEY = os.getenv('AI_API_KEY')  # 从环境变量获取
 AI_BASE_URL = os.getenv('AI_BASE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
 AI_MODEL_NAME = os.getenv('AI_MODEL_NAME', 'qwen-max')
 
+# 增量摘要：已有摘要的文档更新时，只发送变更段落与原摘要；
+# 变更比例（变更字符数 / 新正文字符数）超过阈值或变更内容过长时回退全文摘要
+INCREMENTAL_SUMMARY_ENABLED = _env_flag('INCREMENTAL_SUMMARY_ENABLED', 'true')
+INCREMENTAL_SUMMARY_MAX_CHANGE_RATIO = _env_float('INCREMENTAL_SUMMARY_MAX_CHANGE_RATIO', 0.3)
+INCREMENTAL_SUMMARY_MAX_CHARS = _env_int('INCREMENTAL_SUMMARY_MAX_CHARS', 6000)
+
+# 提示词正文的 token 预算（本地近似计数，含标题）；超出时按导语、关键句、原文顺序节选
+LLM_PROMPT_TOKEN_BUDGET = _env_int('LLM_PROMPT_TOKEN_BUDGET', 4000)
+# 导语（开头句子）最多占用的预算比例
+LLM_PROMPT_LEAD_RATIO = _env_float('LLM_PROMPT_LEAD_RATIO', 0.3)
+
+# 长文档 map-reduce：清洗后正文超过 LLM_LONG_DOC_TOKENS 时切成相互重叠的块并发摘要，再汇总（0 表示关闭）
+LLM_LONG_DOC_TOKENS = _env_int('LLM_LONG_DOC_TOKENS', 8000)
+LLM_CHUNK_TOKENS = _env_int('LLM_CHUNK_TOKENS', 3000)
+LLM_CHUNK_OVERLAP_TOKENS = _env_int('LLM_CHUNK_OVERLAP_TOKENS', 200)
+# 分块数上限：超出时按比例放大块尺寸
+LLM_MAX_CHUNKS = _env_int('LLM_MAX_CHUNKS', 16)
+
+# LLM 自适应并发（AIMD）：健康时每完成一个窗口的请求并发 +1，遇到 429/5xx/超时乘以退避系数
+LLM_MIN_CONCURRENCY = _env_int('LLM_MIN_CONCURRENCY', 1)
+LLM_MAX_CONCURRENCY = _env_int('LLM_MAX_CONCURRENCY', 32)
+LLM_INITIAL_CONCURRENCY = _env_int('LLM_INITIAL_CONCURRENCY', 5)
+LLM_BACKOFF_FACTOR = _env_float('LLM_BACKOFF_FACTOR', 0.5)
+# 单次延迟超过历史最低延迟的倍数、或近期错误率超过阈值时停止增加并发
+LLM_LATENCY_TOLERANCE = _env_float('LLM_LATENCY_TOLERANCE', 2.0)
+LLM_ERROR_RATE_THRESHOLD = _env_float('LLM_ERROR_RATE_THRESHOLD', 0.1)
+# 单篇文章被限流时的最大尝试次数（含首次）
+LLM_MAX_ATTEMPTS = _env_int('LLM_MAX_ATTEMPTS', 4)
+
+# LLM 服务商配额：每分钟请求数与每分钟 token 数（0 表示不限制），发送前按估算 token 预订
+LLM_RPM_LIMIT = _env_int('LLM_RPM_LIMIT', 600)
+LLM_TPM_LIMIT = _env_int('LLM_TPM_LIMIT', 1000000)
+# 估算请求 token 时为模型输出预留的 token 数
+LLM_EXPECTED_COMPLETION_TOKENS = _env_int('LLM_EXPECTED_COMPLETION_TOKENS', 800)
+
+# LLM 失败重试队列：指数退避（秒）并带抖动，累计失败达到上限后转入死信
+LLM_RETRY_MAX_ATTEMPTS = _env_int('LLM_RETRY_MAX_ATTEMPTS', 5)
+LLM_RETRY_BASE_DELAY = _env_int('LLM_RETRY_BASE_DELAY', 600)
+LLM_RETRY_MAX_DELAY = _env_int('LLM_RETRY_MAX_DELAY', 86400)
+
+# LLM 结果检查点日志：每写入 N 条结果 fsync 一次
+LLM_JOURNAL_FSYNC_EVERY = _env_int('LLM_JOURNAL_FSYNC_EVERY', 10)
+
+# 离线批处理：积压文章数达到阈值时改为提交 Batch API，结果在后续运行中收取
+LLM_BATCH_ENABLED = _env_flag('LLM_BATCH_ENABLED', 'false')
+LLM_BATCH_MIN_ARTICLES = _env_int('LLM_BATCH_MIN_ARTICLES', 50)
+# 批处理后端："openai"（OpenAI 兼容 Batch API）或 "local"（本地目录替身，用于离线联调）
+LLM_BATCH_BACKEND = _env_str('LLM_BATCH_BACKEND', 'openai')
+LLM_BATCH_COMPLETION_WINDOW = _env_str('LLM_BATCH_COMPLETION_WINDOW', '24h')
+LLM_BATCH_DIR = _env_str('LLM_BATCH_DIR', 'llm_batches')
+
+# LLM 优先级调度：按时效、来源权重与关键词排序，单次运行的篇数/估算 token 上限（0 表示不限），超出部分延后到下次运行
+LLM_MAX_ARTICLES_PER_RUN = _env_int('LLM_MAX_ARTICLES_PER_RUN', 0)
+LLM_MAX_TOKENS_PER_RUN = _env_int('LLM_MAX_TOKENS_PER_RUN', 0)
+LLM_PRIORITY_HALF_LIFE_HOURS = _env_float('LLM_PRIORITY_HALF_LIFE_HOURS', 72.0)
+# 来源权重：逗号分隔的 名称=权重，名称匹配公众号名（source）或平台（platform）
+LLM_SOURCE_WEIGHTS = _env_str('LLM_SOURCE_WEIGHTS', '微信公众号=1.0,Yuque=0.8')
+
+# LLM 用量与费用统计：单价为每百万 token 的价格（0 表示不估算），批处理按比例折算
+LLM_PRICE_INPUT_PER_MTOK = _env_float('LLM_PRICE_INPUT_PER_MTOK', 0.0)
+LLM_PRICE_CACHED_INPUT_PER_MTOK = _env_float('LLM_PRICE_CACHED_INPUT_PER_MTOK', 0.0)
+LLM_PRICE_OUTPUT_PER_MTOK = _env_float('LLM_PRICE_OUTPUT_PER_MTOK', 0.0)
+LLM_BATCH_PRICE_RATIO = _env_float('LLM_BATCH_PRICE_RATIO', 0.5)
+# 每次运行的统计报告目录，保留最近 N 份（0 表示不清理）
+LLM_REPORT_DIR = _env_str('LLM_REPORT_DIR', 'llm_reports')
+LLM_REPORT_KEEP = _env_int('LLM_REPORT_KEEP', 30)
+# 按模型单独定价：逗号分隔的 模型=输入/缓存输入/输出（每百万 token），未列出的模型使用上面的默认单价
+LLM_MODEL_PRICES = _env_str('LLM_MODEL_PRICES', '')
+
+# 模型分档路由：配置小模型后，短篇全文摘要交给小模型，JSON 校验失败时升级到 AI_MODEL_NAME
+LLM_SMALL_MODEL_NAME = _env_str('LLM_SMALL_MODEL_NAME', '')  # 留空表示不启用路由
+LLM_SMALL_MODEL_MAX_TOKENS = _env_int('LLM_SMALL_MODEL_MAX_TOKENS', 1200)
+LLM_SMALL_MODEL_MAX_CONCURRENCY = _env_int('LLM_SMALL_MODEL_MAX_CONCURRENCY', 64)
+LLM_SMALL_MODEL_RPM_LIMIT = _env_int('LLM_SMALL_MODEL_RPM_LIMIT', 1200)
+LLM_SMALL_MODEL_TPM_LIMIT = _env_int('LLM_SMALL_MODEL_TPM_LIMIT', 2000000)
+# 始终使用大模型的来源（公众号名或平台，逗号分隔）与优先级阈值（0 表示不按优先级分流）
+LLM_ROUTING_LARGE_SOURCES = _env_str('LLM_ROUTING_LARGE_SOURCES', '')
+LLM_ROUTING_PRIORITY_THRESHOLD = _env_float('LLM_ROUTING_PRIORITY_THRESHOLD', 0.0)
+
+# LLM 输出校验：deep_summary 的字数范围（超出上限时本地按句截断，不足下限时纠错重问）
+# 下限同时写入提示词（“不少于 N 字”），提示词与校验使用同一数值
+LLM_SUMMARY_MIN_CHARS = _env_int('LLM_SUMMARY_MIN_CHARS', 180)
+LLM_SUMMARY_MAX_CHARS = _env_int('LLM_SUMMARY_MAX_CHARS', 1500)
+
+# LLM 结果缓存：按（规范化提示词、提示词版本、模型）寻址，相同输入只计费一次
+LLM_CACHE_ENABLED = _env_flag('LLM_CACHE_ENABLED', 'true')
+LLM_CACHE_FILE = _env_str('LLM_CACHE_FILE', 'llm_cache.json')
+LLM_CACHE_MAX_ENTRIES = _env_int('LLM_CACHE_MAX_ENTRIES', 5000)  # 0 表示不限
+LLM_CACHE_MAX_AGE_DAYS = _env_int('LLM_CACHE_MAX_AGE_DAYS', 90)  # 0 表示永不过期
+
 # --- Yuque Configuration ---
 YUQUE_TOKEN = os.getenv('YUQUE_TOKEN')  # 从环境变量获取
 YUQUE_GROUP = os.getenv('YUQUE_GROUP', 'ph25ri')
 YUQUE_BOOK = os.getenv('YUQUE_BOOK', 'ua1c3q')
 # 语雀 API Base URL
 YUQUE_BASE_URL = "https://www.yuque.com/api/v2"
+# 语雀增量检测：变化文档正文的并发拉取数与单请求超时（秒）
+YUQUE_FETCH_CONCURRENCY = _env_int('YUQUE_FETCH_CONCURRENCY', 8)
+YUQUE_FETCH_TIMEOUT = _env_int('YUQUE_FETCH_TIMEOUT', 30)
+# 是否在 yuque_bodies/ 中按正文哈希保留文档正文（供差异比对使用）
+YUQUE_KEEP_BODIES = _env_flag('YUQUE_KEEP_BODIES', 'true')
 
 # --- WeChat Configuration ---
 # 微信 RSS Feed URL (假设你的服务运行在 localhost:8001)
 WECHAT_RSS_URL = _env_str('WECHAT_RSS_URL', "http://localhost:8001/feed/all.rss")
 
+# Feed 条件请求：持久化 ETag/Last-Modified 与正文哈希，未变化时跳过解析与接口增强
+WECHAT_FEED_CONDITIONAL_GET = _env_flag('WECHAT_FEED_CONDITIONAL_GET', 'true')
+WECHAT_FEED_STATE_FILE = _env_str('WECHAT_FEED_STATE_FILE', 'wechat_feed_state.json')
+# Feed 按发布时间倒序时，连续 N 条不晚于上次游标即停止读取（0 表示总是读完整个 Feed）
+WECHAT_FEED_EARLY_STOP_AFTER = _env_int('WECHAT_FEED_EARLY_STOP_AFTER', 3)
+
 # 是否在抓取前主动触发 We-MP-RSS 刷新
 WECHAT_FORCE_REFRESH = _env_flag('WECHAT_FORCE_REFRESH', 'false')
 
@@ -74,17 +188,32 @@ WECHAT_API_VERIFY_SSL = _env_flag('WECHAT_API_VERIFY_SSL', 'false')
 WECHAT_API_PAGE_SIZE = _env_int('WECHAT_API_PAGE_SIZE', 100)
 WECHAT_API_MAX_PAGES = _env_int('WECHAT_API_MAX_PAGES', 0)
 WECHAT_API_INCLUDE_CONTENT_FOR_NEW = _env_flag('WECHAT_API_INCLUDE_CONTENT_FOR_NEW', 'true')
+# 持久化文章索引：平时增量翻页直到整页均为已知文章，每隔 N 小时全量重同步一次（0 表示每次全量）
+WECHAT_API_INDEX_FILE = _env_str('WECHAT_API_INDEX_FILE', 'wechat_api_index.json')
+WECHAT_API_FULL_SYNC_HOURS = _env_float('WECHAT_API_FULL_SYNC_HOURS', 24.0)
+# 全量同步时并发请求的页数上限（1 表示逐页请求）
+WECHAT_API_PAGE_CONCURRENCY = _env_int('WECHAT_API_PAGE_CONCURRENCY', 4)
 
 # --- De-duplication/SimHash Configuration ---
 # SimHash 汉明距离阈值：用于判断两篇文章是否重复
 # 阈值 4 意味着 128 位签名中最多有 4 位不同，被认为是相似文章。
 SIMHASH_THRESHOLD = 15
 
+# SimHash 构建时 token 哈希的 LRU 缓存容量（条目数）
+SIMHASH_TOKEN_CACHE_SIZE = _env_int('SIMHASH_TOKEN_CACHE_SIZE', 65536)
+
+# 去重引擎："simhash"（默认，jieba 分词 + SimHash）或 "minhash"（字符 3-gram + MinHash LSH）
+DEDUP_ENGINE = _env_str('DEDUP_ENGINE', 'simhash')
+# MinHash 置换数与 LSH 分带数（置换数需为分带数的整数倍），以及判重的估计 Jaccard 阈值
+MINHASH_NUM_PERM = _env_int('MINHASH_NUM_PERM', 128)
+MINHASH_BANDS = _env_int('MINHASH_BANDS', 32)
+MINHASH_THRESHOLD = _env_float('MINHASH_THRESHOLD', 0.7)
+
 # --- WeChat Fetcher Switches & Limits ---
 # 选择抓取实现：默认使用 We-MP-RSS 适配器（"wmr"）。预留："httpx"、"mock" 等。
 WECHAT_FETCHER_IMPL = _env_str('WECHAT_FETCHER_IMPL', 'wmr')
 
-# 抓取限速与并发（用于未来内置实现；当前适配器不强制使用）
+# 接口文章正文的并发拉取：并发数、每秒发起请求上限（0 表示不限）与单请求超时（秒）
 WECHAT_FETCH_CONCURRENCY = _env_int('WECHAT_FETCH_CONCURRENCY', 8)
 WECHAT_FETCH_QPS = _env_int('WECHAT_FETCH_QPS', 5)
 WECHAT_FETCH_TIMEOUT = _env_int('WECHAT_FETCH_TIMEOUT', 30)
\ No newline at end of file
@@ -0,0 +1,269 @@
+# dedup_engines.py
+"""可插拔的近重复检测引擎。
+
+filter_duplicates 通过 :func:`create_dedup_engine` 选择实现（config.DEDUP_ENGINE）：
+
+- ``simhash``：jieba 分词 + 128 位 SimHash，按汉明距离判重（默认，历史行为）。
+- ``minhash``：字符 3-gram shingle + MinHash 签名，LSH 分桶后按估计 Jaccard 判重。
+
+引擎只负责“指纹”和“索引”两件事：``fingerprint`` 把正文变为指纹，
+``encode``/``decode`` 用于持久化（见 dup_clusters.py），``new_index`` 返回一个
+支持 ``add``/``query`` 的近邻索引。两个实现的速度与召回对比见
+``scripts/bench_dedup.py``。
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import (
+    DEDUP_ENGINE,
+    MINHASH_BANDS,
+    MINHASH_NUM_PERM,
+    MINHASH_THRESHOLD,
+    SIMHASH_THRESHOLD,
+)
+from simhash_utils import SIMHASH_F_BITS, build_simhash
+
+# MinHash 使用的梅森素数，保证 (a * h + b) 在 uint64 内不溢出
+_MERSENNE_PRIME = (1 << 31) - 1
+_MINHASH_SEED = 20251019
+
+
+def get_text_features(s):
+    """
+    将文本处理为字符 3-gram shingle 特征列表（MinHash 引擎的输入）。
+    这里使用简单的正则清洗，不依赖分词。
+    """
+    width = 3
+    s = s.lower()
+    s = re.sub(r'[^\w]+', '', s)  # 去除非字母数字字符
+
+    # 使用滑动窗口生成 n-gram 特征
+    return [s[i:i + width] for i in range(max(len(s) - width + 1, 1))]
+
+
+class DedupIndex(ABC):
+    """近邻索引：登记指纹并查询首个近重复项。"""
+
+    @abstractmethod
+    def add(self, key: str, fingerprint: Any) -> None:
+        """登记一条指纹。"""
+
+    @abstractmethod
+    def query(self, fingerprint: Any) -> Optional[str]:
+        """返回首个判定为近重复的 key，未命中返回 None。"""
+
+
+class DedupEngine(ABC):
+    """去重引擎契约。"""
+
+    name: str = ''
+
+    @abstractmethod
+    def fingerprint(self, text: str) -> Any:
+        """为正文生成指纹。"""
+
+    @abstractmethod
+    def encode(self, fingerprint: Any) -> str:
+        """将指纹编码为可写入 JSON 的字符串。"""
+
+    @abstractmethod
+    def decode(self, value: str) -> Any:
+        """从字符串还原指纹。"""
+
+    @abstractmethod
+    def new_index(self) -> DedupIndex:
+        """创建一个空的近邻索引。"""
+
+    @abstractmethod
+    def is_near_duplicate(self, left: Any, right: Any) -> bool:
+        """直接比较两条指纹是否在判重阈值内（不经过索引分桶）。"""
+
+
+# ----------------------------------------------------------------------
+# SimHash
+# ----------------------------------------------------------------------
+class _SimHashIndex(DedupIndex):
+    """按鸽巢原理分块的 SimHash 索引。
+
+    汉明距离不超过 threshold 时，把 128 位切成 threshold + 1 段，至少有一段完全相同，
+    因此只需比对至少一段相同的候选，而不是全表扫描。
+    """
+
+    def __init__(self, threshold: int) -> None:
+        self._threshold = threshold
+        blocks = min(max(threshold + 1, 1), SIMHASH_F_BITS)
+        bounds = [round(i * SIMHASH_F_BITS / blocks) for i in range(blocks + 1)]
+        self._segments = [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(blocks)]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._segments]
+        self._keys: List[str] = []
+        self._values: List[int] = []
+
+    def _segment_values(self, value: int):
+        for index, (offset, width) in enumerate(self._segments):
+            yield index, (value >> offset) & ((1 << width) - 1)
+
+    def add(self, key: str, fingerprint: int) -> None:
+        position = len(self._keys)
+        self._keys.append(key)
+        self._values.append(fingerprint)
+        for index, segment in self._segment_values(fingerprint):
+            self._buckets[index].setdefault(segment, []).append(position)
+
+    def query(self, fingerprint: int) -> Optional[str]:
+        candidates: Set[int] = set()
+        for index, segment in self._segment_values(fingerprint):
+            candidates.update(self._buckets[index].get(segment, ()))
+
+        # 按登记顺序比对，保持“先到者为 canonical”的语义
+        for position in sorted(candidates):
+            if (fingerprint ^ self._values[position]).bit_count() <= self._threshold:
+                return self._keys[position]
+        return None
+
+
+class SimHashEngine(DedupEngine):
+    name = 'simhash'
+
+    def __init__(self, threshold: int = SIMHASH_THRESHOLD) -> None:
+        self.threshold = threshold
+
+    def fingerprint(self, text: str) -> int:
+        return build_simhash(text).value
+
+    def encode(self, fingerprint: int) -> str:
+        return format(fingerprint, 'x')
+
+    def decode(self, value: str) -> int:
+        return int(value, 16)
+
+    def new_index(self) -> DedupIndex:
+        return _SimHashIndex(self.threshold)
+
+    def is_near_duplicate(self, left: int, right: int) -> bool:
+        return (left ^ right).bit_count() <= self.threshold
+
+
+# ----------------------------------------------------------------------
+# MinHash + LSH
+# ----------------------------------------------------------------------
+class _MinHashLSHIndex(DedupIndex):
+    """LSH 分桶索引：任意一个 band 完全相同即为候选，再按估计 Jaccard 确认。"""
+
+    def __init__(self, bands: int, rows: int, threshold: float) -> None:
+        self._bands = bands
+        self._rows = rows
+        self._threshold = threshold
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._keys: List[str] = []
+        self._signatures: List[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self._bands):
+            start = band * self._rows
+            yield band, signature[start:start + self._rows].tobytes()
+
+    def add(self, key: str, fingerprint: np.ndarray) -> None:
+        position = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(fingerprint)
+        for band, bucket in self._band_keys(fingerprint):
+            self._buckets[band].setdefault(bucket, []).append(position)
+
+    def query(self, fingerprint: np.ndarray) -> Optional[str]:
+        candidates: Set[int] = set()
+        for band, bucket in self._band_keys(fingerprint):
+            candidates.update(self._buckets[band].get(bucket, ()))
+
+        for position in sorted(candidates):
+            similarity = float(np.mean(self._signatures[position] == fingerprint))
+            if similarity >= self._threshold:
+                return self._keys[position]
+        return None
+
+
+class MinHashLSHEngine(DedupEngine):
+    name = 'minhash'
+
+    def __init__(
+        self,
+        num_perm: int = MINHASH_NUM_PERM,
+        bands: int = MINHASH_BANDS,
+        threshold: float = MINHASH_THRESHOLD,
+    ) -> None:
+        if num_perm <= 0 or bands <= 0 or num_perm % bands:
+            raise ValueError('MINHASH_NUM_PERM 必须是 MINHASH_BANDS 的正整数倍')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(_MINHASH_SEED)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def fingerprint(self, text: str) -> np.ndarray:
+        shingles = set(get_text_features(text or ''))
+        hashes = np.fromiter(
+            (zlib.crc32(item.encode('utf-8')) % _MERSENNE_PRIME for item in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (num_perm, n) 的置换矩阵，逐行取最小值即为签名
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def encode(self, fingerprint: np.ndarray) -> str:
+        return fingerprint.astype('>u4').tobytes().hex()
+
+    def decode(self, value: str) -> np.ndarray:
+        return np.frombuffer(bytes.fromhex(value), dtype='>u4').astype(np.uint32)
+
+    def new_index(self) -> DedupIndex:
+        return _MinHashLSHIndex(self.bands, self.rows, self.threshold)
+
+    def is_near_duplicate(self, left: np.ndarray, right: np.ndarray) -> bool:
+        if left.shape != right.shape:
+            return False
+        return float(np.mean(left == right)) >= self.threshold
+
+
+_ENGINES = {
+    SimHashEngine.name: SimHashEngine,
+    MinHashLSHEngine.name: MinHashLSHEngine,
+}
+
+
+def create_dedup_engine(name: Optional[str] = None, *, simhash_threshold: int = SIMHASH_THRESHOLD) -> DedupEngine:
+    """按名称创建去重引擎；未知名称回退 SimHash。"""
+
+    engine_name = (name or DEDUP_ENGINE or SimHashEngine.name).strip().lower()
+    match engine_name:
+        case 'minhash' | 'minhash-lsh' | 'lsh':
+            return MinHashLSHEngine()
+        case 'simhash' | 'default':
+            return SimHashEngine(simhash_threshold)
+        case _:
+            print(f"警告: 未知的去重引擎 {engine_name}，回退 SimHash。")
+            return SimHashEngine(simhash_threshold)
+
+
+def available_engines() -> Tuple[str, ...]:
+    return tuple(_ENGINES)
+
+
+__all__ = [
+    'DedupEngine',
+    'DedupIndex',
+    'MinHashLSHEngine',
+    'SimHashEngine',
+    'available_engines',
+    'create_dedup_engine',
+    'get_text_features',
+]
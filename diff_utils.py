@@ -1,4 +1,235 @@
-import difflib
+"""行/段落级差异比对。
+
+旧实现直接对整篇文档的行列表运行 ``difflib.SequenceMatcher``，遇到大量重复行或空行的
+长文档时接近平方复杂度。这里改为：
+
+1. 把每一行（或段落）映射为整数，后续比较只做整数比较；
+2. 去掉公共前缀/后缀；
+3. patience 预处理：以“在新旧两侧都只出现一次”的行为锚点，取最长递增子序列后分段递归；
+4. 锚点之间剩下的小片段再用 Myers O(ND) 算法求最短编辑脚本，代价超过上限时整段视为替换。
+
+对外保持 :func:`find_diff` 的接口与返回值不变，另提供返回位置信息的 :func:`diff_blocks`。
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# Myers 算法允许的最大编辑代价，超过后该片段整体视为替换，避免退化为平方耗时
+MYERS_MAX_COST = 1000
+
+
+@dataclass
+class DiffBlock:
+    """一个差异块。位置均为行（或段落）下标，区间左闭右开。"""
+
+    tag: str  # 'insert' | 'replace' | 'delete'
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+    text: str = ""  # 新文档中对应的内容
+    old_text: str = ""  # 旧文档中被替换/删除的内容
+
+
+def _split_units(text, granularity):
+    if not text:
+        return []
+    if granularity == 'paragraph':
+        paragraphs = []
+        current = []
+        for line in text.splitlines():
+            if line.strip():
+                current.append(line)
+            elif current:
+                paragraphs.append("\n".join(current))
+                current = []
+        if current:
+            paragraphs.append("\n".join(current))
+        return paragraphs
+    return text.splitlines()
+
+
+def _intern(old_units, new_units):
+    """把文本单元映射为整数 ID，相同内容共享同一个 ID。"""
+    table: Dict[str, int] = {}
+    old_ids = [table.setdefault(unit, len(table)) for unit in old_units]
+    new_ids = [table.setdefault(unit, len(table)) for unit in new_units]
+    return old_ids, new_ids
+
+
+def _unique_anchors(a, a0, a1, b, b0, b1) -> List[Tuple[int, int]]:
+    """patience 锚点：两侧各只出现一次的单元，按旧文顺序取新文位置的最长递增子序列。"""
+    count_a = Counter(a[a0:a1])
+    count_b = Counter(b[b0:b1])
+    position_b = {}
+    for j in range(b0, b1):
+        if count_b[b[j]] == 1:
+            position_b[b[j]] = j
+
+    candidates = [
+        (i, position_b[a[i]])
+        for i in range(a0, a1)
+        if count_a[a[i]] == 1 and a[i] in position_b
+    ]
+    if not candidates:
+        return []
+
+    # patience sorting 求最长递增子序列
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(candidates)
+    for index, (_, j) in enumerate(candidates):
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[pile] = j
+            tail_index[pile] = index
+        previous[index] = tail_index[pile - 1] if pile > 0 else -1
+
+    anchors = []
+    index = tail_index[-1]
+    while index != -1:
+        anchors.append(candidates[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _myers(a, a0, a1, b, b0, b1, max_cost=MYERS_MAX_COST):
+    """Myers 最短编辑脚本，返回匹配的 (i, j) 列表；代价超过 max_cost 时返回空列表。"""
+    n, m = a1 - a0, b1 - b0
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, max_cost) + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m, a0, b0)
+    return []
+
+
+def _myers_backtrack(trace, n, m, a0, b0):
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v.get(k - 1, -1) < v.get(k + 1, -1)):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((a0 + x, b0 + y))
+        if d > 0:
+            x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def _match_units(a: Sequence[int], b: Sequence[int]) -> List[Tuple[int, int]]:
+    """返回新旧序列中相互匹配的下标对（单调递增）。"""
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            matches.append((a0, b0))
+            a0 += 1
+            b0 += 1
+        while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+            matches.append((a1, b1))
+        if a0 == a1 or b0 == b1:
+            continue
+
+        anchors = _unique_anchors(a, a0, a1, b, b0, b1)
+        if anchors:
+            prev_a, prev_b = a0, b0
+            for i, j in anchors:
+                stack.append((prev_a, i, prev_b, j))
+                matches.append((i, j))
+                prev_a, prev_b = i + 1, j + 1
+            stack.append((prev_a, a1, prev_b, b1))
+        else:
+            matches.extend(_myers(a, a0, a1, b, b0, b1))
+
+    matches.sort()
+    return matches
+
+
+def diff_opcodes(old_units, new_units):
+    """与 SequenceMatcher.get_opcodes 格式一致的操作码列表。"""
+    a, b = _intern(old_units, new_units)
+    opcodes = []
+    i = j = 0
+    for match_i, match_j in _match_units(a, b) + [(len(a), len(b))]:
+        if i < match_i and j < match_j:
+            opcodes.append(('replace', i, match_i, j, match_j))
+        elif i < match_i:
+            opcodes.append(('delete', i, match_i, j, j))
+        elif j < match_j:
+            opcodes.append(('insert', i, i, j, match_j))
+
+        if match_i < len(a):
+            if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == match_i:
+                tag, s1, _, s2, _ = opcodes[-1]
+                opcodes[-1] = (tag, s1, match_i + 1, s2, match_j + 1)
+            else:
+                opcodes.append(('equal', match_i, match_i + 1, match_j, match_j + 1))
+        i, j = match_i + 1, match_j + 1
+    return opcodes
+
+
+def diff_blocks(old_text, new_text, granularity='line', include_deletes=False):
+    """
+    比较新旧文本，返回新增与修改的差异块（含位置）。
+
+    参数:
+    old_text (str): 旧文档的文本内容。
+    new_text (str): 新文档的文本内容。
+    granularity (str): 'line' 按行比对，'paragraph' 按空行分隔的段落比对。
+    include_deletes (bool): 是否同时返回删除块。
+
+    返回:
+    list[DiffBlock]: 按新文档顺序排列的差异块。
+    """
+    separator = "\n\n" if granularity == 'paragraph' else "\n"
+    old_units = _split_units(old_text, granularity)
+    new_units = _split_units(new_text, granularity)
+
+    blocks = []
+    for tag, a_start, a_end, b_start, b_end in diff_opcodes(old_units, new_units):
+        if tag == 'equal' or (tag == 'delete' and not include_deletes):
+            continue
+        blocks.append(DiffBlock(
+            tag=tag,
+            old_start=a_start,
+            old_end=a_end,
+            new_start=b_start,
+            new_end=b_end,
+            text=separator.join(new_units[b_start:b_end]),
+            old_text=separator.join(old_units[a_start:a_end]),
+        ))
+    return blocks
 
 
 def find_diff(old_text, new_text):
@@ -16,29 +247,8 @@ def find_diff(old_text, new_text):
     if not old_text:
         return new_text
 
-    # 将文本按行分割，以便进行行级比对
-    old_lines = old_text.splitlines()
-    new_lines = new_text.splitlines()
-
-    # 创建一个 SequenceMatcher 对象
-    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
-
-    diff_output = []
-    # 遍历操作码，找出差异
-    for opcode, a_start, a_end, b_start, b_end in matcher.get_opcodes():
-        # 'insert' 操作表示新文本中新增的内容
-        if opcode == 'insert':
-            inserted_lines = new_lines[b_start:b_end]
-            diff_output.append("\n".join(inserted_lines))
-
-        # 'replace' 操作表示新旧文本中的修改内容
-        elif opcode == 'replace':
-            # 只取新文本中被修改的部分
-            replaced_lines = new_lines[b_start:b_end]
-            diff_output.append("\n".join(replaced_lines))
-
-    # 使用换行符连接所有差异内容，并返回
-    return "\n".join(diff_output)
+    # 'insert' 为新增内容，'replace' 只取新文本中被修改的部分
+    return "\n".join(block.text for block in diff_blocks(old_text, new_text))
 
 
 # --- 运行示例，帮助你测试代码是否正常工作 ---
@@ -59,4 +269,4 @@ if __name__ == "__main__":
     diff = find_diff(old_doc, new_doc)
 
     print("--- 检测到的差异内容 ---")
-    print(diff)
\ No newline at end of file
+    print(diff)
@@ -0,0 +1,149 @@
+# dup_clusters.py
+"""持久化的近重复簇（并查集）。
+
+filter_duplicates 每次运行只在本批文章内比对 SimHash，跨运行的转载/重发无法识别，
+被过滤的文章也与已有摘要失去关联。本模块用并查集把所有判定为近重复的文章
+归入同一簇，簇根即 canonical 成员；同时保存每篇唯一文章的指纹，
+供下一次运行与历史文章比对。数据以 JSON 形式落盘，格式：
+
+    {
+        "parent": {"<article_key>": "<parent_key>", ...},
+        "engine": "simhash",
+        "fingerprints": {"<article_key>": "<encoded fingerprint>", ...}
+    }
+
+指纹的编码由去重引擎决定（见 dedup_engines.py），切换引擎后旧指纹不再可比，会被丢弃。
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DUP_CLUSTER_FILE = 'dup_clusters.json'
+
+
+class DuplicateClusters:
+    """基于并查集的近重复簇，簇根即 canonical 文章的 key。"""
+
+    def __init__(
+        self,
+        parent: Optional[Dict[str, str]] = None,
+        fingerprints: Optional[Dict[str, str]] = None,
+        path: str = DUP_CLUSTER_FILE,
+        engine: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.engine = engine
+        self._parent: Dict[str, str] = dict(parent or {})
+        self._fingerprints: Dict[str, str] = dict(fingerprints or {})
+        # 本次运行内新建立的匹配关系（key -> 命中的文章 key），不落盘
+        self.recent_matches: Dict[str, str] = {}
+
+    # ------------------------------------------------------------------
+    # 持久化
+
+    @classmethod
+    def load(cls, path: str = DUP_CLUSTER_FILE) -> 'DuplicateClusters':
+        file_path = Path(path)
+        if not file_path.exists():
+            return cls(path=path)
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析重复簇文件 {path}，将重新建立。")
+            return cls(path=path)
+
+        if not isinstance(data, dict):
+            return cls(path=path)
+        parent = data.get('parent') if isinstance(data.get('parent'), dict) else {}
+        fingerprints = data.get('fingerprints') if isinstance(data.get('fingerprints'), dict) else {}
+        # 旧版文件未记录引擎，其指纹均为 SimHash
+        engine = data.get('engine') or 'simhash'
+        return cls(parent=parent, fingerprints=fingerprints, path=path, engine=engine)
+
+    def save(self) -> None:
+        # 保存前压缩路径，使文件中每个成员直接指向簇根
+        for key in list(self._parent):
+            self.find(key)
+        payload = {'parent': self._parent, 'engine': self.engine, 'fingerprints': self._fingerprints}
+        with Path(self.path).open('w', encoding='utf-8') as handle:
+            json.dump(payload, handle, ensure_ascii=False, indent=2)
+
+    # ------------------------------------------------------------------
+    # 并查集
+
+    def find(self, key: str) -> str:
+        """返回 key 所在簇的根；未登记的 key 自成一簇。"""
+
+        root = key
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+
+        # 路径压缩
+        node = key
+        while node != root:
+            next_node = self._parent[node]
+            self._parent[node] = root
+            node = next_node
+
+        return root
+
+    def union(self, key: str, canonical_key: str) -> str:
+        """把 key 所在簇并入 canonical_key 所在簇，返回合并后的簇根。"""
+
+        self._parent.setdefault(canonical_key, canonical_key)
+        self._parent.setdefault(key, key)
+        root = self.find(canonical_key)
+        other = self.find(key)
+        if other != root:
+            self._parent[other] = root
+        return root
+
+    def canonical(self, key: str) -> str:
+        return self.find(key)
+
+    def groups(self) -> Dict[str, List[str]]:
+        """返回 簇根 -> 成员列表（簇根排在首位）。"""
+
+        grouped: Dict[str, List[str]] = {}
+        for key in list(self._parent):
+            root = self.find(key)
+            members = grouped.setdefault(root, [root])
+            if key != root:
+                members.append(key)
+        return grouped
+
+    # ------------------------------------------------------------------
+    # 指纹
+
+    def bind_engine(self, engine_name: str) -> None:
+        """声明指纹所属的去重引擎；与已保存的引擎不一致时清空旧指纹（簇关系保留）。"""
+
+        if self.engine and self.engine != engine_name and self._fingerprints:
+            print(f" [去重] 去重引擎由 {self.engine} 切换为 {engine_name}，历史指纹将重新积累。")
+            self._fingerprints = {}
+        self.engine = engine_name
+
+    def set_fingerprint(self, key: str, encoded: str) -> None:
+        self._parent.setdefault(key, key)
+        self._fingerprints[key] = encoded
+
+    def fingerprint(self, key: str) -> Optional[str]:
+        """返回 key 的已编码指纹；被过滤的重复文章没有指纹。"""
+
+        return self._fingerprints.get(key)
+
+    def iter_fingerprints(self) -> Iterator[Tuple[str, str]]:
+        yield from self._fingerprints.items()
+
+    def record_match(self, key: str, matched_key: str) -> str:
+        """登记一次本轮判定的近重复匹配，并合并两者所在簇。"""
+
+        self.recent_matches[key] = matched_key
+        return self.union(key, matched_key)
+
+
+__all__ = ['DUP_CLUSTER_FILE', 'DuplicateClusters']
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
 
 class IWeChatFetcher(ABC):
@@ -13,9 +14,18 @@ class IWeChatFetcher(ABC):
     """
 
     @abstractmethod
-    def list_articles(self) -> List[Dict[str, Any]]:
+    def list_articles(
+        self,
+        since: Optional[datetime] = None,
+        deferred_saves: Optional[List[Callable[[], None]]] = None,
+    ) -> List[Dict[str, Any]]:
         """列出可用于处理的文章列表（包含必要正文）。
 
+        参数：
+            - since: 上次已处理到的发布时间游标；实现应尽早丢弃不晚于该时间的文章，
+              避免对旧文章做增强与抓取。None 表示返回全部文章。
+            - deferred_saves: 传入时，实现不应立即持久化抓取状态（如 Feed 校验值），而是把保存
+              操作追加到该列表，由调用方在知识库写入成功后执行。None 表示立即保存。
         返回：
             - List[dict]: 与现有 `fetch_articles_from_rss()` 相同结构的字典列表。
         可能抛出：
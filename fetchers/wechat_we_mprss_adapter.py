@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
 from .i_wechat_fetcher import IWeChatFetcher
 
@@ -12,10 +13,14 @@ class WechatWeMPRSSAdapter(IWeChatFetcher):
     以最小改动接入接口抽象。
     """
 
-    def list_articles(self) -> List[Dict[str, Any]]:
+    def list_articles(
+        self,
+        since: Optional[datetime] = None,
+        deferred_saves: Optional[List[Callable[[], None]]] = None,
+    ) -> List[Dict[str, Any]]:
         from wechat_pubaccount_fetcher import fetch_articles_from_rss
 
-        return fetch_articles_from_rss()
+        return fetch_articles_from_rss(since=since, deferred_saves=deferred_saves)
 
 
 __all__ = ["WechatWeMPRSSAdapter"]
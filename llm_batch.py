@@ -0,0 +1,354 @@
+# llm_batch.py
+"""离线批处理（Batch API）模式。
+
+夜间积压的非紧急文章不必逐篇以实时价格调用：把请求序列化为 OpenAI 兼容的批处理 JSONL，
+每行一条：
+
+    {"custom_id": "<id>", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+
+上传并提交后即可结束本次运行，不保持任何连接；后续运行轮询批次状态，完成后下载输出文件，
+按 ``custom_id`` 把结果写回知识库。批次信息保存在 ``llm_batch_state.json``：
+
+    {
+        "batch_id": "...",
+        "backend": "openai" | "local",
+        "submitted_at": 1700000000.0,
+        "status": "validating" | "in_progress" | "completed" | ...,
+        "requests": {"<custom_id>": {"key": "<article_key>", "cache_key": "..."}}
+    }
+
+后端可插拔：:class:`OpenAIBatchBackend` 调用服务商的 files/batches 接口；
+:class:`LocalBatchBackend` 是基于本地目录的替身，首次查询状态时用 responder 逐行生成
+响应并写出输出文件，便于离线测试整条链路。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from config import LLM_BATCH_BACKEND, LLM_BATCH_COMPLETION_WINDOW, LLM_BATCH_DIR
+
+BATCH_STATE_FILE = 'llm_batch_state.json'
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# 批次的终止状态（与 OpenAI Batch API 一致）
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+def make_custom_id(article_key: str) -> str:
+    """article key 可能是很长的 URL，custom_id 使用其哈希。"""
+    return hashlib.sha1(article_key.encode('utf-8')).hexdigest()
+
+
+class BatchBackend(ABC):
+    name: str = ''
+
+    @abstractmethod
+    def upload_file(self, path: Path) -> str:
+        """上传批处理输入文件，返回文件 ID。"""
+
+    @abstractmethod
+    def create_batch(self, input_file_id: str) -> str:
+        """创建批次，返回批次 ID。"""
+
+    @abstractmethod
+    def retrieve_batch(self, batch_id: str) -> dict:
+        """返回 {"status": ..., "output_file_id": ..., "error_file_id": ...}。"""
+
+    @abstractmethod
+    def download_file(self, file_id: str) -> str:
+        """下载输出/错误文件内容。"""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI 兼容的 Batch API（DashScope 兼容模式同样支持）。"""
+
+    name = 'openai'
+
+    def __init__(self, client, completion_window: str = LLM_BATCH_COMPLETION_WINDOW) -> None:
+        self._client = client
+        self._completion_window = completion_window
+
+    def upload_file(self, path: Path) -> str:
+        with open(path, 'rb') as handle:
+            return self._client.files.create(file=handle, purpose='batch').id
+
+    def create_batch(self, input_file_id: str) -> str:
+        batch = self._client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self._completion_window,
+        )
+        return batch.id
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        batch = self._client.batches.retrieve(batch_id)
+        return {
+            'status': batch.status,
+            'output_file_id': batch.output_file_id,
+            'error_file_id': batch.error_file_id,
+        }
+
+    def download_file(self, file_id: str) -> str:
+        return self._client.files.content(file_id).text
+
+
+def _stub_responder(body: dict) -> dict:
+    """本地替身的默认响应：取提示词中的正文开头作为摘要，仅用于离线联调。"""
+    prompt = body['messages'][-1]['content']
+    lines = [line.strip() for line in prompt.splitlines() if line.strip()]
+    points = (lines[1:4] + ['（无）'] * 3)[:3]
+    content = json.dumps({
+        'deep_summary': f"【本地批处理替身】{''.join(lines[1:])[:200]}",
+        'key_points': [point[:20] for point in points],
+        'open_question': '（本地替身不生成问题）',
+    }, ensure_ascii=False)
+    return {
+        'object': 'chat.completion',
+        'model': body.get('model'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+    }
+
+
+class LocalBatchBackend(BatchBackend):
+    """基于本地目录的批处理替身：首次查询状态时同步“执行”整个批次。"""
+
+    name = 'local'
+
+    def __init__(self, root: str = LLM_BATCH_DIR, responder: Callable[[dict], dict] = _stub_responder) -> None:
+        self.root = Path(root)
+        self._responder = responder
+
+    def _file(self, file_id: str) -> Path:
+        return self.root / 'files' / f'{file_id}.jsonl'
+
+    def _batch(self, batch_id: str) -> Path:
+        return self.root / 'batches' / f'{batch_id}.json'
+
+    def upload_file(self, path: Path) -> str:
+        file_id = f'file-{uuid.uuid4().hex}'
+        target = self._file(file_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(Path(path).read_text(encoding='utf-8'), encoding='utf-8')
+        return file_id
+
+    def create_batch(self, input_file_id: str) -> str:
+        batch_id = f'batch-{uuid.uuid4().hex}'
+        target = self._batch(batch_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps({'status': 'validating', 'input_file_id': input_file_id}), encoding='utf-8')
+        return batch_id
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        path = self._batch(batch_id)
+        batch = json.loads(path.read_text(encoding='utf-8'))
+        if batch['status'] not in TERMINAL_STATUSES:
+            output_lines = []
+            for line in self._file(batch['input_file_id']).read_text(encoding='utf-8').splitlines():
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    response = {'status_code': 200, 'body': self._responder(request['body'])}
+                    error = None
+                except Exception as exc:  # 替身中模拟单条请求失败
+                    response = None
+                    error = {'code': 'local_error', 'message': str(exc)}
+                output_lines.append(json.dumps(
+                    {'id': f'req-{uuid.uuid4().hex}', 'custom_id': request['custom_id'], 'response': response, 'error': error},
+                    ensure_ascii=False,
+                ))
+            output_id = f'file-{uuid.uuid4().hex}'
+            self._file(output_id).write_text('\n'.join(output_lines) + '\n', encoding='utf-8')
+            batch.update(status='completed', output_file_id=output_id, error_file_id=None)
+            path.write_text(json.dumps(batch), encoding='utf-8')
+        return {'status': batch['status'], 'output_file_id': batch.get('output_file_id'), 'error_file_id': batch.get('error_file_id')}
+
+    def download_file(self, file_id: str) -> str:
+        return self._file(file_id).read_text(encoding='utf-8')
+
+
+def create_batch_backend(name: Optional[str] = None, client=None) -> BatchBackend:
+    backend = (name or LLM_BATCH_BACKEND or 'openai').strip().lower()
+    if backend == 'local':
+        return LocalBatchBackend()
+    if client is None:
+        raise ValueError('openai 批处理后端需要提供 OpenAI 客户端')
+    return OpenAIBatchBackend(client)
+
+
+# ----------------------------------------------------------------------
+# 批次状态
+# ----------------------------------------------------------------------
+class BatchJob:
+    """一个已提交批次的持久化状态。"""
+
+    def __init__(self, data: dict, path: str = BATCH_STATE_FILE) -> None:
+        self.path = path
+        self.data = data
+
+    @property
+    def batch_id(self) -> str:
+        return self.data['batch_id']
+
+    @property
+    def status(self) -> str:
+        return self.data.get('status', 'validating')
+
+    @property
+    def requests(self) -> Dict[str, dict]:
+        return self.data.get('requests', {})
+
+    def article_keys(self) -> Dict[str, str]:
+        """article key -> custom_id。"""
+        return {entry['key']: custom_id for custom_id, entry in self.requests.items()}
+
+    @classmethod
+    def load(cls, path: str = BATCH_STATE_FILE) -> Optional['BatchJob']:
+        file_path = Path(path)
+        if not file_path.exists():
+            return None
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析批处理状态文件 {path}，忽略。")
+            return None
+        return cls(data, path) if isinstance(data, dict) and data.get('batch_id') else None
+
+    def save(self) -> None:
+        with Path(self.path).open('w', encoding='utf-8') as handle:
+            json.dump(self.data, handle, ensure_ascii=False, indent=2)
+
+    def clear(self) -> None:
+        Path(self.path).unlink(missing_ok=True)
+
+
+def submit_batch(
+    entries: Iterable[Tuple[str, dict, Optional[str]]],
+    backend: BatchBackend,
+    state_path: str = BATCH_STATE_FILE,
+) -> BatchJob:
+    """提交批次。entries 为 (article_key, 请求 body, 缓存键) 序列。"""
+
+    requests: Dict[str, dict] = {}
+    lines = []
+    for article_key, body, cache_key in entries:
+        custom_id = make_custom_id(article_key)
+        requests[custom_id] = {'key': article_key, 'cache_key': cache_key}
+        lines.append(json.dumps(
+            {'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': body},
+            ensure_ascii=False,
+        ))
+
+    input_dir = Path(LLM_BATCH_DIR)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    input_path = input_dir / f'input-{int(time.time())}.jsonl'
+    input_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    file_id = backend.upload_file(input_path)
+    batch_id = backend.create_batch(file_id)
+    job = BatchJob({
+        'batch_id': batch_id,
+        'backend': backend.name,
+        'input_file': str(input_path),
+        'input_file_id': file_id,
+        'submitted_at': time.time(),
+        'status': 'validating',
+        'requests': requests,
+    }, state_path)
+    job.save()
+    return job
+
+
+def poll_batch(job: BatchJob, backend: BatchBackend) -> dict:
+    """查询一次批次状态并写回状态文件。"""
+    info = backend.retrieve_batch(job.batch_id)
+    job.data.update(status=info['status'], output_file_id=info.get('output_file_id'), error_file_id=info.get('error_file_id'))
+    job.save()
+    return info
+
+
+def wait_for_batch(job: BatchJob, backend: BatchBackend, interval: float = 60.0, timeout: Optional[float] = None) -> str:
+    """轮询直至批次进入终止状态或超时，返回最后的状态。"""
+    started = time.monotonic()
+    while True:
+        status = poll_batch(job, backend)['status']
+        if status in TERMINAL_STATUSES:
+            return status
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return status
+        time.sleep(interval)
+
+
+def parse_batch_output(text: str) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """解析输出/错误文件，返回 (custom_id -> chat completion body, custom_id -> 错误信息)。"""
+
+    results: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    for line in (text or '').splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        custom_id = record.get('custom_id')
+        if not custom_id:
+            continue
+        response = record.get('response') or {}
+        if record.get('error') or response.get('status_code') != 200:
+            error = record.get('error') or response.get('body') or {}
+            errors[custom_id] = error.get('message') if isinstance(error, dict) else str(error)
+        else:
+            results[custom_id] = response.get('body') or {}
+    return results, errors
+
+
+def fetch_batch_results(job: BatchJob, backend: BatchBackend) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """下载已完成批次的输出，返回 (article key -> completion body, article key -> 错误)。
+
+    未出现在输出中的请求也计为错误，交由调用方改走实时调用。
+    """
+
+    results: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    for field in ('output_file_id', 'error_file_id'):
+        file_id = job.data.get(field)
+        if file_id:
+            file_results, file_errors = parse_batch_output(backend.download_file(file_id))
+            results.update(file_results)
+            errors.update(file_errors)
+
+    by_key: Dict[str, dict] = {}
+    error_by_key: Dict[str, str] = {}
+    for custom_id, entry in job.requests.items():
+        if custom_id in results:
+            by_key[entry['key']] = results[custom_id]
+        else:
+            error_by_key[entry['key']] = errors.get(custom_id, 'missing from batch output')
+    return by_key, error_by_key
+
+
+__all__ = [
+    'BATCH_STATE_FILE',
+    'BatchBackend',
+    'BatchJob',
+    'LocalBatchBackend',
+    'OpenAIBatchBackend',
+    'TERMINAL_STATUSES',
+    'create_batch_backend',
+    'fetch_batch_results',
+    'make_custom_id',
+    'parse_batch_output',
+    'poll_batch',
+    'submit_batch',
+    'wait_for_batch',
+]
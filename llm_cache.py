@@ -0,0 +1,162 @@
+# llm_cache.py
+"""按内容寻址的 LLM 结果缓存。
+
+split_articles_for_processing 只在文章 key（slug/id/link/url/title）一致时复用摘要，
+链接带上追踪参数、文章转到其他公众号、语雀 slug 改名后都会重新计费。
+本缓存放在 process_with_llm 之前，键为：
+
+    sha256(规范化后的提示词文本, 系统提示词版本, 用户提示词模板版本, 模型名)
+
+与文章 key 无关，同样的输入无论从哪个 key 进来都只计费一次。数据以 JSON 落盘：
+
+    {
+        "entries": {
+            "<cache_key>": {"result": {...}, "created_at": 1700000000.0, "last_used": 1700000000.0},
+            ...
+        }
+    }
+
+淘汰策略：超过 max_age_days 的条目在加载与保存时丢弃；条目数超过 max_entries 时
+按最近使用时间淘汰最旧的条目。条目在内存中按最近使用顺序保存在 OrderedDict 里，
+命中与写入时移到末尾，淘汰时从头部弹出，不必每次写入都排序。hits/misses 计数仅统计本次运行。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import LLM_CACHE_FILE, LLM_CACHE_MAX_AGE_DAYS, LLM_CACHE_MAX_ENTRIES
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """折叠空白并去除首尾空白，使仅有排版差异的输入落到同一缓存键。"""
+    return _WHITESPACE_RE.sub(' ', text or '').strip()
+
+
+def make_cache_key(text: str, system_prompt_version: str, user_prompt_version: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (normalize_text(text), system_prompt_version, user_prompt_version, model):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """线程安全的 LLM 结果缓存。"""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_FILE,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_age_days: int = LLM_CACHE_MAX_AGE_DAYS,
+        entries: Optional[Dict[str, dict]] = None,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days > 0 else 0
+        # 按 last_used 从旧到新排列，之后由 get/put 维护顺序
+        self._entries: 'OrderedDict[str, dict]' = OrderedDict(
+            sorted((entries or {}).items(), key=lambda item: item[1].get('last_used', 0))
+        )
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._expire()
+
+    @classmethod
+    def load(cls, path: str = LLM_CACHE_FILE, **kwargs) -> 'LLMCache':
+        file_path = Path(path)
+        if not file_path.exists():
+            return cls(path=path, **kwargs)
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析 LLM 缓存文件 {path}，将重新建立。")
+            return cls(path=path, **kwargs)
+
+        entries = data.get('entries') if isinstance(data, dict) else None
+        return cls(path=path, entries=entries if isinstance(entries, dict) else {}, **kwargs)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._expire()
+            self._evict()
+            payload = {'entries': self._entries}
+            self._dirty = False
+        with Path(self.path).open('w', encoding='utf-8') as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is None or self._is_expired(entry, now):
+                self.misses += 1
+                return None
+            entry['last_used'] = now
+            self._entries.move_to_end(key)
+            self._dirty = True
+            self.hits += 1
+            return dict(entry['result'])
+
+    def put(self, key: str, result: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {'result': result, 'created_at': now, 'last_used': now}
+            self._entries.move_to_end(key)
+            self._dirty = True
+            if self.max_entries > 0 and len(self._entries) > self.max_entries:
+                self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+        }
+
+    # ------------------------------------------------------------------
+
+    def _is_expired(self, entry: dict, now: float) -> bool:
+        return bool(self.max_age_seconds) and now - entry.get('created_at', 0) > self.max_age_seconds
+
+    def _expire(self) -> None:
+        if not self.max_age_seconds:
+            return
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._dirty = True
+
+    def _evict(self) -> None:
+        overflow = len(self._entries) - self.max_entries
+        if self.max_entries <= 0 or overflow <= 0:
+            return
+        for _ in range(overflow):
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+
+__all__ = ['LLMCache', 'make_cache_key', 'normalize_text']
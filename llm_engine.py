@@ -0,0 +1,214 @@
+# llm_engine.py
+"""基于 asyncio 的 LLM 调用引擎，按 AIMD 自适应调整并发。
+
+旧实现用固定 5 个线程调用 LLM：有余量时闲置，配额紧张时又持续撞上 429。
+这里把“同时在途的请求数”当作拥塞窗口：
+
+- 加性增（additive increase）：请求成功、延迟未明显劣化且近期错误率健康时，
+  每完成约一个窗口的请求，窗口 +1，直至 LLM_MAX_CONCURRENCY；
+- 乘性减（multiplicative decrease）：遇到 429 / 5xx / 超时，窗口乘以
+  LLM_BACKOFF_FACTOR，不低于 LLM_MIN_CONCURRENCY。同一批并发请求几乎同时失败时，
+  一个延迟周期内只减一次，避免窗口瞬间塌缩。
+
+被限流的请求由引擎退避后重试（优先遵循 Retry-After），其余异常原样抛给调用方。
+引擎本身不关心请求内容，调用方通过 :meth:`AdaptiveLLMEngine.call` 传入协程工厂。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config import (
+    LLM_BACKOFF_FACTOR,
+    LLM_ERROR_RATE_THRESHOLD,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_LATENCY_TOLERANCE,
+    LLM_MAX_ATTEMPTS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+)
+
+# 统计错误率的滑动窗口大小（最近 N 次请求）
+_OUTCOME_WINDOW = 50
+# 限流重试的退避基数与上限（秒）
+_RETRY_BASE_DELAY = 1.0
+_RETRY_MAX_DELAY = 60.0
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """429、5xx、超时与连接错误视为拥塞信号。"""
+
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or type(exc).__name__ in {
+        'APITimeoutError',
+        'APIConnectionError',
+    }
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(float(headers.get('retry-after')), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrency:
+    """AIMD 并发窗口。"""
+
+    def __init__(
+        self,
+        initial: int = LLM_INITIAL_CONCURRENCY,
+        minimum: int = LLM_MIN_CONCURRENCY,
+        maximum: int = LLM_MAX_CONCURRENCY,
+        backoff_factor: float = LLM_BACKOFF_FACTOR,
+        latency_tolerance: float = LLM_LATENCY_TOLERANCE,
+        error_rate_threshold: float = LLM_ERROR_RATE_THRESHOLD,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.decreases = 0
+        # Condition 绑定创建时的事件循环；引擎可能跨多次 asyncio.run 复用，按循环惰性创建
+        self._condition: Optional[asyncio.Condition] = None
+        self._condition_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outcomes: Deque[bool] = deque(maxlen=_OUTCOME_WINDOW)
+        self._latency_ewma: Optional[float] = None
+        self._latency_floor: Optional[float] = None
+        self._last_decrease = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        self._outcomes.append(True)
+        self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+        self._latency_floor = latency if self._latency_floor is None else min(self._latency_floor, latency)
+
+        latency_ok = latency <= self._latency_floor * self.latency_tolerance
+        if latency_ok and self.error_rate <= self.error_rate_threshold:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def on_throttle(self) -> None:
+        self._outcomes.append(False)
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.backoff_factor)
+        self.decreases += 1
+
+    def on_error(self) -> None:
+        self._outcomes.append(False)
+
+
+class AdaptiveLLMEngine:
+    """在自适应并发窗口内执行 LLM 请求。"""
+
+    def __init__(
+        self,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_attempts = max(1, max_attempts)
+        self._sleep = sleep
+        self.throttled = 0
+
+    async def call(
+        self,
+        request_factory: Callable[[], Awaitable[Any]],
+        before_attempt: Optional[Callable[[], Awaitable[None]]] = None,
+        info: Optional[Dict[str, float]] = None,
+    ) -> Any:
+        """执行一次请求；被限流时调整窗口并退避重试，最终失败则抛出最后一次异常。
+
+        before_attempt 在每次尝试占用并发窗口之前执行（例如等待 RPM/TPM 配额），
+        其等待时间不计入延迟统计。info 不为空时写入 ``attempts`` 与最后一次尝试的 ``latency``（秒）。
+        """
+
+        for attempt in range(1, self.max_attempts + 1):
+            if before_attempt is not None:
+                await before_attempt()
+            await self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                result = await request_factory()
+            except Exception as exc:
+                if info is not None:
+                    info.update(attempts=attempt, latency=time.monotonic() - started)
+                if not is_throttle_error(exc):
+                    self.concurrency.on_error()
+                    raise
+                self.throttled += 1
+                self.concurrency.on_throttle()
+                if attempt >= self.max_attempts:
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.5)
+            else:
+                latency = time.monotonic() - started
+                if info is not None:
+                    info.update(attempts=attempt, latency=latency)
+                self.concurrency.on_success(latency)
+                return result
+            finally:
+                await self.concurrency.release()
+
+            await self._sleep(delay)
+
+        raise RuntimeError('unreachable')  # pragma: no cover
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'limit': round(self.concurrency.limit, 2),
+            'peak_limit': round(self.concurrency.peak_limit, 2),
+            'decreases': self.concurrency.decreases,
+            'throttled': self.throttled,
+            'error_rate': round(self.concurrency.error_rate, 3),
+        }
+
+
+__all__ = ['AdaptiveConcurrency', 'AdaptiveLLMEngine', 'is_throttle_error']
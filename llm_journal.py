@@ -0,0 +1,106 @@
+# llm_journal.py
+"""LLM 结果的增量检查点日志。
+
+process_all_data_with_ai 在整批完成后才返回，run_full_pipeline 随后才写知识库；
+一次 300 篇的运行若在第 290 篇崩溃，已付费的结果全部丢失。
+
+本模块把每篇成功的摘要在完成时立即追加到 JSONL 日志，每 LLM_JOURNAL_FSYNC_EVERY
+条 fsync 一次（关闭时再 fsync 一次）。一行一条记录：
+
+    {"key": "<article_key>", "content_hash": "<sha1>", "article": {...}, "ts": 1700000000.0}
+
+下次运行时 :meth:`LLMJournal.recover` 读出日志中的结果，main 对正文哈希一致的文章
+直接复用、跳过 LLM；知识库成功写盘后调用 :meth:`LLMJournal.clear` 清空日志。
+崩溃时最后一行可能只写了一半，读取时忽略无法解析的行。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import LLM_JOURNAL_FSYNC_EVERY
+
+LLM_JOURNAL_FILE = 'llm_journal.jsonl'
+
+
+def content_hash(article: dict) -> str:
+    content = article.get('content') or ''
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class LLMJournal:
+    """追加写入、批量 fsync 的 LLM 结果日志。"""
+
+    def __init__(self, path: str = LLM_JOURNAL_FILE, fsync_every: int = LLM_JOURNAL_FSYNC_EVERY) -> None:
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self._handle = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self.appended = 0
+
+    def recover(self) -> Dict[str, dict]:
+        """读取日志中已完成的结果：key -> 记录（同一 key 以最后一条为准）。"""
+
+        file_path = Path(self.path)
+        if not file_path.exists():
+            return {}
+
+        records: Dict[str, dict] = {}
+        with file_path.open('r', encoding='utf-8') as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 崩溃时未写完的尾行
+                if isinstance(record, dict) and record.get('key') and isinstance(record.get('article'), dict):
+                    records[record['key']] = record
+        return records
+
+    def append(self, key: str, article: dict) -> None:
+        record = {'key': key, 'content_hash': content_hash(article), 'article': article, 'ts': time.time()}
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._handle is None:
+                self._handle = open(self.path, 'a', encoding='utf-8')
+            self._handle.write(line)
+            self._handle.flush()
+            self.appended += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                os.fsync(self._handle.fileno())
+                self._unsynced = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is None:
+                return
+            if self._unsynced:
+                os.fsync(self._handle.fileno())
+                self._unsynced = 0
+            self._handle.close()
+            self._handle = None
+
+    def clear(self) -> None:
+        """结果已写入知识库后清空日志。"""
+        self.close()
+        Path(self.path).unlink(missing_ok=True)
+
+    def __enter__(self) -> 'LLMJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> Optional[bool]:
+        self.close()
+        return None
+
+
+__all__ = ['LLM_JOURNAL_FILE', 'LLMJournal', 'content_hash']
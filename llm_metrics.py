@@ -0,0 +1,347 @@
+# llm_metrics.py
+"""LLM 调用的用量、延迟与费用统计。
+
+每次 LLM 调用（全文/增量摘要、map-reduce 的分段与汇总、批处理结果）记录一条
+:class:`CallRecord`：模型、输入/输出/缓存命中 token、延迟、重试次数与是否成功。
+:data:`run_metrics` 汇总单次运行的记录：
+
+- token 合计与按 LLM_PRICE_* 估算的费用（批处理按 LLM_BATCH_PRICE_RATIO 折算）；
+- 延迟的 p50/p95/p99 与分桶直方图；
+- 最慢的若干篇文章，便于排查；
+- 按调用类型（full/incremental/map/reduce/batch）与按模型分组的次数、token 与费用
+  （模型单价可由 LLM_MODEL_PRICES 单独指定）。
+
+main 在运行结束时调用 :func:`write_run_report` 写入 LLM_REPORT_DIR 下的 JSON 报告，
+api_server 的 ``/ops/llm/metrics`` 读取最近的报告。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import (
+    LLM_BATCH_PRICE_RATIO,
+    LLM_MODEL_PRICES,
+    LLM_PRICE_CACHED_INPUT_PER_MTOK,
+    LLM_PRICE_INPUT_PER_MTOK,
+    LLM_PRICE_OUTPUT_PER_MTOK,
+    LLM_REPORT_DIR,
+    LLM_REPORT_KEEP,
+)
+
+LATEST_REPORT_NAME = 'latest.json'
+# 延迟直方图的分桶上界（秒），最后一个桶收纳其余
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+_SLOWEST_LIMIT = 10
+
+
+def parse_model_prices(value: Optional[str]) -> Dict[str, tuple]:
+    """解析 ``模型=输入/缓存输入/输出`` 列表，返回 模型 -> (输入, 缓存输入, 输出) 单价。"""
+
+    prices: Dict[str, tuple] = {}
+    for item in (value or '').split(','):
+        name, _, spec = item.partition('=')
+        parts = spec.split('/')
+        if not name.strip() or len(parts) != 3:
+            continue
+        try:
+            prices[name.strip()] = tuple(float(part) for part in parts)
+        except ValueError:
+            continue
+    return prices
+
+
+_MODEL_PRICES = parse_model_prices(LLM_MODEL_PRICES)
+_DEFAULT_PRICES = (LLM_PRICE_INPUT_PER_MTOK, LLM_PRICE_CACHED_INPUT_PER_MTOK, LLM_PRICE_OUTPUT_PER_MTOK)
+
+
+@dataclass
+class CallRecord:
+    kind: str
+    model: Optional[str] = None
+    title: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency: Optional[float] = None  # 秒；批处理结果没有单次延迟
+    retries: Optional[int] = 0  # None 表示未知：同步客户端由 SDK 在内部重试，无法观测
+    ok: bool = True
+    error: Optional[str] = None
+
+    @property
+    def cost(self) -> float:
+        input_price, cached_price, output_price = _MODEL_PRICES.get(self.model or '', _DEFAULT_PRICES)
+        uncached = max(0, self.prompt_tokens - self.cached_tokens)
+        cost = (
+            uncached * input_price + self.cached_tokens * cached_price + self.completion_tokens * output_price
+        ) / 1_000_000
+        return cost * LLM_BATCH_PRICE_RATIO if self.kind == 'batch' else cost
+
+
+def _field(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _as_int(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def usage_breakdown(usage: Any) -> Dict[str, int]:
+    """从 SDK 对象或批处理输出的 dict 中取出 (输入, 输出, 缓存命中) token。
+
+    缓存命中兼容 OpenAI 的 ``prompt_tokens_details.cached_tokens`` 与 DeepSeek 的 ``prompt_cache_hit_tokens``。
+    """
+
+    cached = _field(_field(usage, 'prompt_tokens_details'), 'cached_tokens')
+    if not isinstance(cached, int):
+        cached = _field(usage, 'prompt_cache_hit_tokens')
+    return {
+        'prompt_tokens': _as_int(_field(usage, 'prompt_tokens')),
+        'completion_tokens': _as_int(_field(usage, 'completion_tokens')),
+        'cached_tokens': _as_int(cached),
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """最近秩法百分位数，sorted_values 需已升序。"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_histogram(latencies: List[float]) -> Dict[str, int]:
+    histogram = {f"<={bound}s": 0 for bound in LATENCY_BUCKETS}
+    histogram[f">{LATENCY_BUCKETS[-1]}s"] = 0
+    for value in latencies:
+        for bound in LATENCY_BUCKETS:
+            if value <= bound:
+                histogram[f"<={bound}s"] += 1
+                break
+        else:
+            histogram[f">{LATENCY_BUCKETS[-1]}s"] += 1
+    return histogram
+
+
+class LLMMetrics:
+    """线程安全的单次运行 LLM 调用统计。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records: List[CallRecord] = []
+            self.cache_hits = 0
+            self.events: Dict[str, int] = {}
+            self.started_at = datetime.now()
+
+    def record(self, record: CallRecord) -> CallRecord:
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def record_completion(
+        self,
+        kind: str,
+        completion: Any,
+        latency: Optional[float] = None,
+        retries: Optional[int] = 0,
+        title: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> CallRecord:
+        """记录一次成功调用；completion 为 SDK 返回对象或批处理输出中的 body（dict）。"""
+
+        reported_model = _field(completion, 'model')
+        return self.record(CallRecord(
+            kind=kind,
+            model=reported_model if isinstance(reported_model, str) and reported_model else model,
+            title=title,
+            latency=latency,
+            retries=retries,
+            **usage_breakdown(_field(completion, 'usage')),
+        ))
+
+    def record_failure(
+        self,
+        kind: str,
+        error: Exception,
+        latency: Optional[float] = None,
+        retries: Optional[int] = 0,
+        title: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> CallRecord:
+        return self.record(CallRecord(
+            kind=kind, model=model, title=title, latency=latency, retries=retries, ok=False, error=str(error)
+        ))
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    def increment(self, event: str) -> None:
+        """记录非调用类事件，例如本地修复（repaired）、纠错重问（reasked）、模型升级（escalated）。"""
+        with self._lock:
+            self.events[event] = self.events.get(event, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self.records)
+            cache_hits = self.cache_hits
+            events = dict(self.events)
+            started_at = self.started_at
+
+        latencies = sorted(record.latency for record in records if record.latency is not None)
+        prompt_tokens = sum(record.prompt_tokens for record in records)
+        cached_tokens = sum(record.cached_tokens for record in records)
+        by_kind: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            group = by_kind.setdefault(record.kind, {'calls': 0, 'failed': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+            group['calls'] += 1
+            group['failed'] += int(not record.ok)
+            group['prompt_tokens'] += record.prompt_tokens
+            group['completion_tokens'] += record.completion_tokens
+
+        by_model: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            group = by_model.setdefault(record.model or 'unknown', {
+                'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost': 0.0, '_latencies': [],
+            })
+            group['calls'] += 1
+            group['prompt_tokens'] += record.prompt_tokens
+            group['completion_tokens'] += record.completion_tokens
+            group['cost'] += record.cost
+            if record.latency is not None:
+                group['_latencies'].append(record.latency)
+        for group in by_model.values():
+            model_latencies = group.pop('_latencies')
+            group['cost'] = round(group['cost'], 6)
+            group['mean_latency'] = round(sum(model_latencies) / len(model_latencies), 3) if model_latencies else None
+
+        slowest = sorted((record for record in records if record.latency is not None), key=lambda r: r.latency, reverse=True)
+        return {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'calls': len(records),
+            'failed': sum(1 for record in records if not record.ok),
+            'retries': sum(record.retries for record in records if record.retries is not None),
+            'retries_unknown': sum(1 for record in records if record.retries is None),
+            'cache_hits': cache_hits,
+            'events': events,
+            'models': sorted({record.model for record in records if record.model}),
+            'tokens': {
+                'prompt': prompt_tokens,
+                'completion': sum(record.completion_tokens for record in records),
+                'cached': cached_tokens,
+                # 服务商前缀缓存命中的输入占比，用于验证固定提示词前缀的效果
+                'cached_ratio': round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            },
+            'cost': round(sum(record.cost for record in records), 6),
+            'latency': {
+                'count': len(latencies),
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                'p50': percentile(latencies, 0.50),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else None,
+                'histogram': latency_histogram(latencies),
+            },
+            'by_kind': by_kind,
+            'by_model': by_model,
+            'slowest': [
+                {'title': record.title, 'kind': record.kind, 'latency': round(record.latency, 3), 'retries': record.retries}
+                for record in slowest[:_SLOWEST_LIMIT]
+            ],
+        }
+
+
+run_metrics = LLMMetrics()
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    latency = summary['latency']
+    tokens = summary['tokens']
+
+    def _seconds(value: Optional[float]) -> str:
+        return '-' if value is None else f"{value:.1f}s"
+
+    retries = f"重试 {summary['retries']}"
+    if summary.get('retries_unknown'):
+        retries += f"，另有 {summary['retries_unknown']} 次调用重试数未知"
+    return (
+        f"调用 {summary['calls']} 次（失败 {summary['failed']}，{retries}），"
+        f"输入 {tokens['prompt']} token（前缀缓存命中 {tokens['cached']}，{tokens['cached_ratio']:.0%}），输出 {tokens['completion']} token，"
+        f"估算费用 {summary['cost']:.4f}；延迟 p50 {_seconds(latency['p50'])} / "
+        f"p95 {_seconds(latency['p95'])} / p99 {_seconds(latency['p99'])}。"
+    )
+
+
+def write_run_report(
+    metrics: Optional[LLMMetrics] = None,
+    report_dir: str = LLM_REPORT_DIR,
+    keep: int = LLM_REPORT_KEEP,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """写入本次运行的报告（同时更新 latest.json），只保留最近 keep 份。"""
+
+    summary = (metrics or run_metrics).summary()
+    if extra:
+        summary.update(extra)
+    directory = Path(report_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(summary, ensure_ascii=False, indent=2)
+    # 文件名带微秒与补零序号：同一时刻的多次运行互不覆盖，且按文件名排序即按写入先后排序
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    sequence = 0
+    while True:
+        path = directory / f"run-{stamp}-{sequence:03d}.json"
+        try:
+            with path.open('x', encoding='utf-8') as handle:
+                handle.write(payload)
+            break
+        except FileExistsError:
+            sequence += 1
+    (directory / LATEST_REPORT_NAME).write_text(payload, encoding='utf-8')
+
+    if keep > 0:
+        for stale in sorted(directory.glob('run-*.json'))[:-keep]:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def load_run_reports(report_dir: str = LLM_REPORT_DIR, limit: int = 1) -> List[Dict[str, Any]]:
+    """读取最近 limit 份运行报告（新的在前），无法解析的文件跳过。"""
+
+    reports: List[Dict[str, Any]] = []
+    for path in sorted(Path(report_dir).glob('run-*.json'), reverse=True):
+        if len(reports) >= limit:
+            break
+        try:
+            reports.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return reports
+
+
+__all__ = [
+    'CallRecord',
+    'LLMMetrics',
+    'format_summary',
+    'latency_histogram',
+    'load_run_reports',
+    'percentile',
+    'run_metrics',
+    'usage_breakdown',
+    'write_run_report',
+]
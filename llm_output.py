@@ -0,0 +1,243 @@
+# llm_output.py
+"""LLM 输出的结构校验与本地修复。
+
+旧实现对模型输出直接 ``json.loads``，任何异常都算作整篇失败；解析成功时又不检查字段，
+任意长度的 key_points、任意篇幅的 deep_summary 都会写入知识库。
+
+本模块在本地完成两步：
+
+1. 修复常见的格式缺陷，不再花钱重新调用：
+   - 包裹在 Markdown 代码块（```json ... ```）中，或 JSON 前后带有说明文字；
+   - 对象/数组末尾多余的逗号；
+   - 输出被截断：补全未闭合的字符串与括号；
+   - key_points 给成换行分隔的字符串、条数多于 3 条，deep_summary 超出上限（按句截断）。
+2. 严格校验字段：deep_summary 长度在 LLM_SUMMARY_MIN_CHARS ~ LLM_SUMMARY_MAX_CHARS 之间，
+   key_points 恰为 KEY_POINTS_COUNT 条且每条不超过 KEY_POINT_MAX_CHARS 字，open_question 非空。
+   ai_processer 的提示词由同样的常量生成，提示词要求与校验标准不会各自漂移。
+
+修复后仍不合格时抛出 :class:`OutputValidationError`，由 ai_processer 以追问的方式重问一次：
+原提示词与上次输出作为前两轮对话，再追加 :func:`build_correction_prompt` 生成的简短纠错提示。
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Callable, List, Tuple
+
+from config import LLM_SUMMARY_MAX_CHARS, LLM_SUMMARY_MIN_CHARS
+
+KEY_POINTS_COUNT = 3
+KEY_POINT_MAX_CHARS = 20
+_MAX_ECHO_CHARS = 3000  # 追问时回放的上次输出上限
+
+_CODE_FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+_BULLET_RE = re.compile(r'^\s*(?:[-*•·]|\d+[.、)）]|[（(]\d+[)）])\s*')
+_SENTENCE_END_RE = re.compile(r'[。！？!?；;]')
+
+
+class OutputValidationError(ValueError):
+    """模型输出修复后仍不符合要求；problems 为逐条的问题描述。"""
+
+    def __init__(self, problems: List[str]) -> None:
+        super().__init__('；'.join(problems))
+        self.problems = problems
+
+
+def strip_code_fence(text: str) -> str:
+    match = _CODE_FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+def repair_json_text(text: str) -> str:
+    """尽力把模型输出修成合法 JSON：去掉代码块与前后文字、多余逗号，补全截断处。"""
+
+    text = strip_code_fence(text or '')
+    start = text.find('{')
+    if start < 0:
+        return text.strip()
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escaped = False
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break  # 顶层对象结束，忽略其后的说明文字
+            continue
+        out.append(char)
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    if ''.join(out).rstrip().endswith(':'):
+        out.append('""')
+    while stack:
+        out.append(stack.pop())
+    return ''.join(out)
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ',':
+        del out[index:]
+
+
+def load_json_object(text: str) -> Tuple[dict, List[str]]:
+    """解析 JSON 对象，失败时先本地修复再解析，返回 (对象, 已做的修复)。"""
+
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value, []
+    except (TypeError, json.JSONDecodeError):
+        pass
+
+    repaired = repair_json_text(text or '')
+    try:
+        value = json.loads(repaired)
+    except json.JSONDecodeError as exc:
+        raise OutputValidationError([f"输出不是合法的 JSON（{exc.msg}）"]) from exc
+    if not isinstance(value, dict):
+        raise OutputValidationError(['输出应为 JSON 对象'])
+    return value, ['json']
+
+
+def _as_string_list(value) -> Tuple[list, bool]:
+    """把换行/分号分隔的字符串拆成列表，返回 (列表, 是否做过转换)。"""
+
+    if isinstance(value, str):
+        items = [_BULLET_RE.sub('', line).strip() for line in re.split(r'[\n；;]', value)]
+        return [item for item in items if item], True
+    if isinstance(value, list):
+        items = [str(item).strip() for item in value if item is not None and str(item).strip()]
+        return items, len(items) != len(value) or any(not isinstance(item, str) for item in value)
+    return [], False
+
+
+def _trim_summary(summary: str) -> str:
+    """超出上限时在上限内最后一个句末标点处截断。"""
+
+    head = summary[:LLM_SUMMARY_MAX_CHARS]
+    ends = [match.end() for match in _SENTENCE_END_RE.finditer(head)]
+    return head[:ends[-1]] if ends else head
+
+
+def validate_summary(output: dict) -> Tuple[dict, List[str]]:
+    """校验并规范化摘要输出，返回 (规范化结果, 已做的修复)；不合格时抛出 OutputValidationError。"""
+
+    repairs: List[str] = []
+    problems: List[str] = []
+
+    summary = output.get('deep_summary')
+    if not isinstance(summary, str) or not summary.strip():
+        problems.append('缺少 deep_summary 字段或内容为空')
+        summary = ''
+    summary = summary.strip()
+    if summary and len(summary) < LLM_SUMMARY_MIN_CHARS:
+        problems.append(f"deep_summary 过短（{len(summary)} 字，至少 {LLM_SUMMARY_MIN_CHARS} 字）")
+    elif len(summary) > LLM_SUMMARY_MAX_CHARS:
+        summary = _trim_summary(summary)
+        repairs.append('summary_trimmed')
+
+    key_points, converted = _as_string_list(output.get('key_points'))
+    if converted:
+        repairs.append('key_points')
+    if len(key_points) > KEY_POINTS_COUNT:
+        key_points = key_points[:KEY_POINTS_COUNT]
+        repairs.append('key_points_truncated')
+    if len(key_points) < KEY_POINTS_COUNT:
+        problems.append(f"key_points 应为 {KEY_POINTS_COUNT} 条字符串，实际 {len(key_points)} 条")
+    too_long = [point for point in key_points if len(point) > KEY_POINT_MAX_CHARS]
+    if too_long:
+        problems.append(f"key_points 每条不超过 {KEY_POINT_MAX_CHARS} 字，当前有 {len(too_long)} 条过长")
+
+    question = output.get('open_question')
+    if not isinstance(question, str) or not question.strip():
+        problems.append('缺少 open_question 字段或内容为空')
+        question = ''
+
+    if problems:
+        raise OutputValidationError(problems)
+    return {'deep_summary': summary, 'key_points': key_points, 'open_question': question.strip()}, repairs
+
+
+def validate_map_output(output: dict) -> Tuple[dict, List[str]]:
+    """校验 map-reduce 分段输出 ``{"summary": ..., "facts": [...]}``。"""
+
+    summary = output.get('summary')
+    if not isinstance(summary, str) or not summary.strip():
+        raise OutputValidationError(['缺少 summary 字段或内容为空'])
+    facts, converted = _as_string_list(output.get('facts'))
+    return {'summary': summary.strip(), 'facts': facts}, ['facts'] if converted else []
+
+
+def parse_output(text: str, validator: Callable[[dict], Tuple[dict, List[str]]]) -> Tuple[dict, List[str]]:
+    output, repairs = load_json_object(text)
+    normalized, more_repairs = validator(output)
+    return normalized, repairs + more_repairs
+
+
+def parse_summary_output(text: str) -> Tuple[dict, List[str]]:
+    return parse_output(text, validate_summary)
+
+
+def parse_map_output(text: str) -> Tuple[dict, List[str]]:
+    return parse_output(text, validate_map_output)
+
+
+def build_correction_prompt(error: OutputValidationError) -> str:
+    """本地修复失败时的简短纠错提示，作为追问发送（上次输出已在对话中，不再回显）。"""
+
+    problems = '\n'.join(f"- {problem}" for problem in error.problems)
+    return f"""你上一次的输出不符合要求：
+{problems}
+
+请在保持原有信息的前提下修正上述问题，只返回修正后的完整 JSON，不要附加任何说明。"""
+
+
+def correction_history(user_prompt: str, previous_output: str) -> List[dict]:
+    """追问前的两轮对话：原提示词与模型上次的输出。"""
+
+    return [
+        {"role": "user", "content": user_prompt},
+        {"role": "assistant", "content": (previous_output or '')[:_MAX_ECHO_CHARS]},
+    ]
+
+
+__all__ = [
+    'KEY_POINTS_COUNT',
+    'KEY_POINT_MAX_CHARS',
+    'OutputValidationError',
+    'build_correction_prompt',
+    'correction_history',
+    'load_json_object',
+    'parse_map_output',
+    'parse_output',
+    'parse_summary_output',
+    'repair_json_text',
+    'strip_code_fence',
+    'validate_map_output',
+    'validate_summary',
+]
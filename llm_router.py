@@ -0,0 +1,147 @@
+# llm_router.py
+"""按篇幅、来源与优先级为摘要请求选择模型档位。
+
+公众号的大量短通知交给 AI_MODEL_NAME（默认 qwen-max）既慢又贵，小模型同样胜任。
+配置 LLM_SMALL_MODEL_NAME 后启用两档路由：
+
+- small：全文摘要的提示词正文不超过 LLM_SMALL_MODEL_MAX_TOKENS，来源不在
+  LLM_ROUTING_LARGE_SOURCES 中，且优先级低于 LLM_ROUTING_PRIORITY_THRESHOLD（0 表示不按优先级分流）；
+- large：其余请求，包括增量摘要与长文档 map-reduce（需要结合原摘要或跨段汇总）。
+
+每个档位拥有独立的 AIMD 并发窗口（:class:`llm_engine.AdaptiveLLMEngine`）与 RPM/TPM 限速器，
+互不挤占配额。小模型的输出未通过 JSON 校验时，ai_processer 用同一提示词升级到 large 重试一次，
+:meth:`ModelRouter.record_escalation` 记录升级次数。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from config import (
+    AI_MODEL_NAME,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_ROUTING_LARGE_SOURCES,
+    LLM_ROUTING_PRIORITY_THRESHOLD,
+    LLM_SMALL_MODEL_MAX_CONCURRENCY,
+    LLM_SMALL_MODEL_MAX_TOKENS,
+    LLM_SMALL_MODEL_NAME,
+    LLM_SMALL_MODEL_RPM_LIMIT,
+    LLM_SMALL_MODEL_TPM_LIMIT,
+)
+from llm_engine import AdaptiveConcurrency, AdaptiveLLMEngine
+from rate_limiter import RateLimiter
+
+TIER_LARGE = 'large'
+TIER_SMALL = 'small'
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model: str
+    engine: AdaptiveLLMEngine
+    limiter: RateLimiter
+
+
+def create_tier_limiter(tier: str) -> RateLimiter:
+    if tier == TIER_SMALL:
+        return RateLimiter(LLM_SMALL_MODEL_RPM_LIMIT, LLM_SMALL_MODEL_TPM_LIMIT)
+    return RateLimiter()
+
+
+def _parse_sources(value: Optional[str]) -> frozenset:
+    return frozenset(item.strip().lower() for item in (value or '').split(',') if item.strip())
+
+
+class ModelRouter:
+    """把摘要请求分配到 small/large 档位；未配置小模型时全部走 large。"""
+
+    def __init__(
+        self,
+        large: ModelTier,
+        small: Optional[ModelTier] = None,
+        small_max_tokens: int = LLM_SMALL_MODEL_MAX_TOKENS,
+        large_sources: Optional[str] = LLM_ROUTING_LARGE_SOURCES,
+        priority_threshold: float = LLM_ROUTING_PRIORITY_THRESHOLD,
+    ) -> None:
+        self.large = large
+        self.small = small
+        self.small_max_tokens = small_max_tokens
+        self.large_sources = _parse_sources(large_sources)
+        self.priority_threshold = priority_threshold
+        self._lock = threading.Lock()
+        self.routed: Dict[str, int] = {TIER_LARGE: 0, TIER_SMALL: 0}
+        self.escalations = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        large_engine: Optional[AdaptiveLLMEngine] = None,
+        limiters: Optional[Dict[str, RateLimiter]] = None,
+    ) -> 'ModelRouter':
+        """按 config 构建路由；limiters 为档位 -> 进程内共享的限速器（缺省时新建）。"""
+
+        limiters = limiters or {}
+        large = ModelTier(
+            TIER_LARGE,
+            AI_MODEL_NAME,
+            large_engine or AdaptiveLLMEngine(),
+            limiters.get(TIER_LARGE) or create_tier_limiter(TIER_LARGE),
+        )
+        small = None
+        if LLM_SMALL_MODEL_NAME:
+            small = ModelTier(
+                TIER_SMALL,
+                LLM_SMALL_MODEL_NAME,
+                AdaptiveLLMEngine(AdaptiveConcurrency(
+                    initial=LLM_INITIAL_CONCURRENCY, maximum=LLM_SMALL_MODEL_MAX_CONCURRENCY
+                )),
+                limiters.get(TIER_SMALL) or create_tier_limiter(TIER_SMALL),
+            )
+        return cls(large, small)
+
+    def tier(self, name: str) -> ModelTier:
+        return self.small if name == TIER_SMALL and self.small is not None else self.large
+
+    def choose(self, article: dict, kind: str, payload_tokens: int, priority: Optional[float] = None) -> ModelTier:
+        """kind 为 LLMRequest.kind；payload_tokens 为逐篇内容（不含固定前缀）的估算 token 数。
+
+        只做选择，不计数：命中缓存的请求不会发出，实际发送时由调用方调用 record_route。
+        """
+
+        tier = self.large
+        if (
+            self.small is not None
+            and kind == 'full'
+            and payload_tokens <= self.small_max_tokens
+            and not self._is_large_source(article)
+            and not (self.priority_threshold > 0 and priority is not None and priority >= self.priority_threshold)
+        ):
+            tier = self.small
+        return tier
+
+    def record_route(self, tier_name: str) -> None:
+        with self._lock:
+            self.routed[tier_name] += 1
+
+    def _is_large_source(self, article: dict) -> bool:
+        for field in ('source', 'platform'):
+            value = article.get(field)
+            if isinstance(value, str) and value.strip().lower() in self.large_sources:
+                return True
+        return False
+
+    def record_escalation(self) -> None:
+        with self._lock:
+            self.escalations += 1
+
+    def stats(self) -> Dict[str, object]:
+        tiers = {TIER_LARGE: self.large.engine.stats()}
+        if self.small is not None:
+            tiers[TIER_SMALL] = self.small.engine.stats()
+        return {'routed': dict(self.routed), 'escalations': self.escalations, 'tiers': tiers}
+
+
+__all__ = ['ModelRouter', 'ModelTier', 'TIER_LARGE', 'TIER_SMALL', 'create_tier_limiter']
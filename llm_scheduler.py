@@ -0,0 +1,150 @@
+# llm_scheduler.py
+"""按优先级排序待摘要文章，并执行单次运行的数量/token 上限。
+
+积压 400 篇时，带截止日期的新通知不应排在重新同步的旧文档后面，花费也需要封顶。
+每篇文章的优先级分数为：
+
+    score = 来源权重 × (时效分 + 关键词分)
+
+- 时效分：按发布时间指数衰减，每过 LLM_PRIORITY_HALF_LIFE_HOURS 小时减半，缺失时间记 0.25；
+- 关键词分：标题/正文开头命中“截止、DDL、报名”等信号词的加分，上限 1.5；
+- 来源权重：LLM_SOURCE_WEIGHTS（如 ``微信公众号=1.0,Yuque=0.8``），先按 source（公众号名）
+  再按 platform 匹配，未配置时为 1.0。
+
+:func:`schedule_articles` 按分数从高到低挑选，超出 LLM_MAX_ARTICLES_PER_RUN 或
+LLM_MAX_TOKENS_PER_RUN（估算值）的文章延后到下次运行（由 main 写入重试队列）。
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_LONG_DOC_TOKENS,
+    LLM_MAX_ARTICLES_PER_RUN,
+    LLM_MAX_TOKENS_PER_RUN,
+    LLM_PRIORITY_HALF_LIFE_HOURS,
+    LLM_PROMPT_TOKEN_BUDGET,
+    LLM_SOURCE_WEIGHTS,
+)
+from prompt_builder import clean_text
+from rate_limiter import estimate_tokens
+
+_PRIORITY_KEYWORDS = re.compile(r'截止|截至|DDL|deadline|报名|申请|招募|紧急|通知|考试|选课|奖学金|实习|讲座', re.IGNORECASE)
+# 只在正文开头查找信号词，避免长文档因篇幅占优
+_CONTENT_SCAN_CHARS = 500
+_UNKNOWN_RECENCY = 0.25
+_MAX_KEYWORD_SCORE = 1.5
+
+
+def parse_source_weights(value: Optional[str]) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for item in (value or '').split(','):
+        name, _, weight = item.partition('=')
+        try:
+            weights[name.strip().lower()] = float(weight)
+        except ValueError:
+            continue
+    return weights
+
+
+_SOURCE_WEIGHTS = parse_source_weights(LLM_SOURCE_WEIGHTS)
+
+
+def source_weight(article: dict, weights: Optional[Dict[str, float]] = None) -> float:
+    weights = _SOURCE_WEIGHTS if weights is None else weights
+    for field in ('source', 'platform'):
+        value = article.get(field)
+        if isinstance(value, str) and value.strip().lower() in weights:
+            return weights[value.strip().lower()]
+    return 1.0
+
+
+def keyword_score(article: dict) -> float:
+    title_hits = set(_PRIORITY_KEYWORDS.findall(article.get('title') or ''))
+    content_hits = set(_PRIORITY_KEYWORDS.findall((article.get('content') or '')[:_CONTENT_SCAN_CHARS])) - title_hits
+    return min(_MAX_KEYWORD_SCORE, 0.5 * len(title_hits) + 0.25 * len(content_hits))
+
+
+def utc_now() -> datetime:
+    """当前 UTC 时间（不带时区，与 published_at 的约定一致）；替代已弃用的 datetime.utcnow()。"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def recency_score(published: Optional[datetime], now: datetime) -> float:
+    if published is None:
+        return _UNKNOWN_RECENCY
+    age_hours = max(0.0, (now - published).total_seconds() / 3600)
+    return 0.5 ** (age_hours / max(LLM_PRIORITY_HALF_LIFE_HOURS, 1))
+
+
+def priority_score(
+    article: dict,
+    now: datetime,
+    published_at: Callable[[dict], Optional[datetime]],
+    weights: Optional[Dict[str, float]] = None,
+) -> float:
+    return source_weight(article, weights) * (recency_score(published_at(article), now) + keyword_score(article))
+
+
+def estimate_article_tokens(article: dict) -> int:
+    """估算一篇文章的摘要花费：节选后的提示词（长文档按全文）加上预期输出。"""
+
+    tokens = estimate_tokens(clean_text(article.get('content') or ''))
+    if not LLM_LONG_DOC_TOKENS or tokens <= LLM_LONG_DOC_TOKENS:
+        tokens = min(tokens, LLM_PROMPT_TOKEN_BUDGET)
+    return tokens + LLM_EXPECTED_COMPLETION_TOKENS
+
+
+def schedule_articles(
+    articles: List[dict],
+    published_at: Callable[[dict], Optional[datetime]],
+    now: Optional[datetime] = None,
+    max_articles: int = LLM_MAX_ARTICLES_PER_RUN,
+    max_tokens: int = LLM_MAX_TOKENS_PER_RUN,
+    weights: Optional[Dict[str, float]] = None,
+    first: Sequence[dict] = (),
+) -> Tuple[List[dict], List[dict]]:
+    """返回 (按优先级排序的本轮文章, 延后到下次运行的文章)。上限为 0 表示不限制。
+
+    published_at 把文章映射为不带时区的 UTC 时间（与 main._parse_datetime 一致）。
+    first 中的文章（到期的重试）先占用篇数与 token 名额，articles 只分配剩余名额。
+    """
+
+    now = now or utc_now()
+
+    def _rank(items: Sequence[dict]) -> List[dict]:
+        return sorted(items, key=lambda article: priority_score(article, now, published_at, weights), reverse=True)
+
+    ranked = _rank(first) + _rank(articles)
+
+    selected: List[dict] = []
+    deferred: List[dict] = []
+    spent = 0
+    for article in ranked:
+        if max_articles > 0 and len(selected) >= max_articles:
+            deferred.append(article)
+            continue
+        cost = estimate_article_tokens(article)
+        # 至少处理一篇，避免单篇超出预算的文章永远被延后
+        if max_tokens > 0 and selected and spent + cost > max_tokens:
+            deferred.append(article)
+            continue
+        selected.append(article)
+        spent += cost
+    return selected, deferred
+
+
+__all__ = [
+    'estimate_article_tokens',
+    'keyword_score',
+    'parse_source_weights',
+    'priority_score',
+    'recency_score',
+    'schedule_articles',
+    'source_weight',
+    'utc_now',
+]
@@ -2,16 +2,42 @@
 
 from fetchers.wechat_fetcher_factory import create_wechat_fetcher
 from yuque_fetcher import fetch_all_yuque_docs
-from ai_processer import process_all_data_with_ai, filter_duplicates
+from ai_processer import (
+    PROMPT_PREFIX_VERSION,
+    apply_batch_output,
+    build_batch_requests,
+    client as llm_client,
+    filter_duplicates,
+    get_llm_cache,
+    has_llm_summary,
+    inherit_cluster_summary,
+    process_all_data_with_ai,
+)
+from dup_clusters import DUP_CLUSTER_FILE, DuplicateClusters
+from dedup_engines import DedupEngine, create_dedup_engine
+from retry_queue import RETRY_QUEUE_FILE, RetryQueue
+from llm_journal import LLM_JOURNAL_FILE, LLMJournal, content_hash
+from llm_scheduler import priority_score, schedule_articles, utc_now
+from llm_metrics import run_metrics, write_run_report
+from llm_batch import (
+    BATCH_STATE_FILE,
+    TERMINAL_STATUSES,
+    BatchBackend,
+    BatchJob,
+    create_batch_backend,
+    fetch_batch_results,
+    poll_batch,
+    submit_batch,
+)
 from logger import setup_logger
 import json
 import hashlib
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from concurrent.futures import ThreadPoolExecutor
 # --- 修正 3: 引入配置 ---
-from config import YUQUE_TOKEN, YUQUE_GROUP, YUQUE_BOOK
+from config import YUQUE_TOKEN, YUQUE_GROUP, YUQUE_BOOK, LLM_BATCH_ENABLED, LLM_BATCH_MIN_ARTICLES
 from yuque_summarizer import save_data
 
 
@@ -90,6 +116,26 @@ def _update_last_published_time(state: dict, source: str, value: datetime) -> No
     _save_fetch_state(state)
 
 
+def commit_fetch_cursors(
+    pending_cursors: Dict[str, datetime],
+    deferred_saves: Sequence[Callable[[], None]] = (),
+) -> None:
+    """知识库写入成功后再推进发布时间游标，并执行抓取器推迟的状态保存（如 Feed 校验值）。
+
+    抓取器会丢弃游标之前的文章、跳过校验值未变的 Feed；若在摘要完成前就保存这些状态，
+    运行中途崩溃后这些文章不会再被抓到。
+    """
+
+    if pending_cursors:
+        state = _load_fetch_state()
+        for source, value in pending_cursors.items():
+            previous = _get_last_published_time(state, source)
+            if previous is None or _normalize_datetime(value) > previous:
+                _update_last_published_time(state, source, value)
+    for save in deferred_saves:
+        save()
+
+
 def _is_wechat_article(article: dict) -> bool:
     if not isinstance(article, dict):
         return False
@@ -233,6 +279,228 @@ def split_articles_for_processing(
     return articles_for_ai, reused_articles
 
 
+def _decode_cluster_fingerprint(clusters: DuplicateClusters, engine: DedupEngine, key: str):
+    encoded = clusters.fingerprint(key)
+    if not encoded:
+        return None
+    try:
+        return engine.decode(encoded)
+    except ValueError:
+        return None
+
+
+def inherit_cluster_summaries(
+    articles_for_ai: List[dict],
+    known_articles: List[dict],
+    clusters: DuplicateClusters,
+    engine: Optional[DedupEngine] = None,
+) -> Tuple[List[dict], Dict[str, dict]]:
+    """为本轮与已有摘要文章近重复的文章直接继承摘要，返回 (仍需 LLM 的文章, 继承结果)。
+
+    并查集的簇是传递的（A~B、B~C 并不意味着 A~C），因此只从本轮直接命中的文章，
+    或指纹与本文直接落在阈值内的簇成员继承；其余情况重新调用 LLM。
+    """
+
+    if not clusters.recent_matches:
+        return articles_for_ai, {}
+
+    engine = engine or create_dedup_engine(clusters.engine)
+    summary_map = {
+        build_article_key(item): item for item in known_articles if has_llm_summary(item)
+    }
+    groups = clusters.groups()
+
+    remaining: List[dict] = []
+    inherited: Dict[str, dict] = {}
+    for article in articles_for_ai:
+        key = build_article_key(article)
+        source = None
+        if key in clusters.recent_matches:
+            direct_match = clusters.recent_matches[key]
+            if direct_match in summary_map:
+                source = summary_map[direct_match]
+            else:
+                fingerprint = _decode_cluster_fingerprint(clusters, engine, key)
+                for member in groups.get(clusters.find(key), []):
+                    if fingerprint is None:
+                        break
+                    if member == key or member not in summary_map:
+                        continue
+                    member_fingerprint = _decode_cluster_fingerprint(clusters, engine, member)
+                    if member_fingerprint is not None and engine.is_near_duplicate(fingerprint, member_fingerprint):
+                        source = summary_map[member]
+                        break
+
+        if source is None:
+            remaining.append(article)
+            continue
+
+        inherited_article = inherit_cluster_summary(article, source)
+        inherited_article['_summary_inherited_from'] = build_article_key(source)
+        inherited[key] = inherited_article
+
+    return remaining, inherited
+
+
+def _article_published_at(article: dict) -> datetime | None:
+    for field in ('published_at', 'published_time', 'updated_at', 'created_at'):
+        value = _parse_datetime(article.get(field))
+        if value is not None:
+            return value
+    return None
+
+
+def defer_over_budget(
+    retry_queue: RetryQueue,
+    articles_for_ai: List[dict],
+    reused_articles: Dict[str, dict],
+    previous_versions: Dict[str, dict],
+) -> Tuple[List[dict], int]:
+    """按优先级排序本轮文章，超出单次运行上限的写入重试队列，返回 (待处理文章, 延后篇数)。
+
+    到期的重试先占用名额，新文章只分配剩余名额。延后的文章先按原样（保留旧摘要）写入知识库，
+    下次运行由 take_due_retries 取回。
+    """
+
+    due_keys = set(retry_queue.due())
+    retries: List[dict] = []
+    fresh: List[dict] = []
+    for article in articles_for_ai:
+        (retries if build_article_key(article) in due_keys else fresh).append(article)
+    selected, deferred = schedule_articles(fresh, _article_published_at, first=retries)
+    for article in deferred:
+        key = build_article_key(article)
+        retry_queue.defer(key, article)
+        previous = previous_versions.get(key)
+        reused_articles[key] = merge_article_with_existing(article, previous) if previous else article
+    return selected, len(deferred)
+
+
+def take_due_retries(
+    retry_queue: RetryQueue,
+    articles_for_ai: List[dict],
+    reused_articles: Dict[str, dict],
+) -> Tuple[List[dict], int]:
+    """把重试队列中已到期的文章排在本轮 LLM 处理的最前面，返回 (待处理文章, 重试篇数)。"""
+
+    pending_keys = {build_article_key(item) for item in articles_for_ai}
+    retries: List[dict] = []
+    for key, snapshot in retry_queue.due().items():
+        if key in pending_keys:
+            continue  # 本轮本就要重新处理（例如内容已更新）
+        # 优先使用本轮抓取合并后的版本，文章已不在数据源中时退回队列快照
+        retries.append(reused_articles.pop(key, None) or snapshot)
+    return retries + articles_for_ai, len(retries)
+
+
+def resume_from_journal(
+    journal_records: Dict[str, dict],
+    articles_for_ai: List[dict],
+) -> Tuple[List[dict], Dict[str, dict]]:
+    """复用上次中断运行已写入日志的结果（正文未变时），返回 (仍需 LLM 的文章, 复用结果)。
+
+    日志中的文章若本轮没有再出现（例如游标已越过、抓取器不再返回），同样作为复用结果并入知识库，
+    避免清空日志时丢掉已付费的摘要；本轮出现但正文已变化的记录视为过期。
+    """
+
+    if not journal_records:
+        return articles_for_ai, {}
+
+    remaining: List[dict] = []
+    resumed: Dict[str, dict] = {}
+    seen_keys = set()
+    for article in articles_for_ai:
+        key = build_article_key(article)
+        seen_keys.add(key)
+        record = journal_records.get(key)
+        if record and record.get('content_hash') == content_hash(article) and has_llm_summary(record['article']):
+            resumed[key] = merge_article_with_existing(article, record['article'])
+        else:
+            remaining.append(article)
+
+    for key, record in journal_records.items():
+        if key not in seen_keys and has_llm_summary(record['article']):
+            resumed[key] = record['article']
+    return remaining, resumed
+
+
+def collect_batch_results(
+    job: BatchJob,
+    backend: BatchBackend,
+    articles_for_ai: List[dict],
+    reused_articles: Dict[str, dict],
+) -> Tuple[List[dict], List[dict], bool]:
+    """查询在途批次，完成时把结果写回文章。返回 (待实时处理的文章, 批处理完成的文章, 批次是否仍在途)。
+
+    提交批次时文章已按原样写入知识库，因此本轮会出现在 reused_articles 中；
+    若文章出现在 articles_for_ai 中，说明提交后正文又有变化，批处理结果已过期，不再采用。
+    """
+
+    status = poll_batch(job, backend)['status']
+    if status not in TERMINAL_STATUSES:
+        return articles_for_ai, [], True
+
+    if status == 'completed':
+        results, errors = fetch_batch_results(job, backend)
+    else:
+        results, errors = {}, {key: f"批次状态 {status}" for key in job.article_keys()}
+
+    ingested: List[dict] = []
+    fallback: List[dict] = []
+    for key, custom_id in job.article_keys().items():
+        article = reused_articles.get(key)
+        if article is None:
+            continue
+        if key in results:
+            ingested.append(apply_batch_output(article, results[key], job.requests[custom_id].get('cache_key')))
+        else:
+            # 批处理失败的文章本轮改走实时调用
+            fallback.append(reused_articles.pop(key))
+            print(f" [批处理] '{article.get('title')}' 未返回结果（{errors.get(key)}），改为实时处理。")
+
+    job.clear()
+    return fallback + articles_for_ai, ingested, False
+
+
+def submit_llm_batch(
+    backend: BatchBackend,
+    articles_for_ai: List[dict],
+    reused_articles: Dict[str, dict],
+    previous_versions: Dict[str, dict],
+) -> Tuple[List[dict], List[dict]]:
+    """把积压文章提交为离线批次，返回 (仍需实时处理的文章, 命中缓存已完成的文章)。
+
+    已提交的文章先按原样（保留旧摘要）写入知识库，结果在之后的运行中由 collect_batch_results 收取。
+    """
+
+    entries, online, cached = build_batch_requests(articles_for_ai, previous_versions, build_article_key)
+    if entries:
+        job = submit_batch(entries, backend, BATCH_STATE_FILE)
+        batched_keys = {key for key, _, _ in entries}
+        for article in articles_for_ai:
+            key = build_article_key(article)
+            if key in batched_keys:
+                previous = previous_versions.get(key)
+                reused_articles[key] = merge_article_with_existing(article, previous) if previous else article
+        print(f" [批处理] 已提交批次 {job.batch_id}，共 {len(entries)} 篇，结果将在后续运行中收取。")
+    return online, cached
+
+
+def update_retry_queue(retry_queue: RetryQueue, processed_articles: List[dict]) -> Tuple[int, int]:
+    """按本轮 LLM 结果更新重试队列，返回 (成功出队数, 失败入队数)。"""
+
+    recovered = failed = 0
+    for article in processed_articles:
+        key = build_article_key(article)
+        error = (article.get('llm_result') or {}).get('error')
+        if error:
+            retry_queue.record_failure(key, article, str(error))
+            failed += 1
+        elif retry_queue.record_success(key):
+            recovered += 1
+    return recovered, failed
+
+
 def combine_processed_articles(
     ordered_articles: List[dict],
     processed_articles: List[dict],
@@ -263,7 +531,17 @@ def combine_processed_articles(
 
 # 移除硬编码的语雀配置
 
-def run_data_aggregation():
+def run_data_aggregation(
+    pending_cursors: Optional[Dict[str, datetime]] = None,
+    deferred_saves: Optional[List[Callable[[], None]]] = None,
+):
+    """抓取并汇集微信与语雀内容。
+
+    传入 pending_cursors 时新的发布时间游标只写入该字典，由调用方在知识库落盘后
+    通过 commit_fetch_cursors 持久化；不传时立即保存（单独调试抓取时使用）。deferred_saves
+    同理收集抓取器推迟的状态保存操作。
+    """
+
     print("--- 启动信息聚合任务 ---")
 
     fetch_state = _load_fetch_state()
@@ -273,7 +551,8 @@ def run_data_aggregation():
     with ThreadPoolExecutor(max_workers=2) as executor:
         # 通过工厂创建实现（当前默认仍为 We-MP-RSS 适配器，行为不变）
         wechat_fetcher = create_wechat_fetcher()
-        future_wechat = executor.submit(wechat_fetcher.list_articles)
+        # 把上次的发布时间游标下推给抓取器，旧文章在解析阶段即被丢弃
+        future_wechat = executor.submit(wechat_fetcher.list_articles, last_wechat_timestamp, deferred_saves)
         future_yuque = executor.submit(
             fetch_all_yuque_docs,
             YUQUE_TOKEN,
@@ -302,7 +581,10 @@ def run_data_aggregation():
     if latest_wechat_timestamp and (
         last_wechat_timestamp is None or latest_wechat_timestamp > last_wechat_timestamp
     ):
-        _update_last_published_time(fetch_state, 'wechat', latest_wechat_timestamp)
+        if pending_cursors is None:
+            _update_last_published_time(fetch_state, 'wechat', latest_wechat_timestamp)
+        else:
+            pending_cursors['wechat'] = latest_wechat_timestamp
 
     if last_wechat_timestamp:
         print(
@@ -375,28 +657,138 @@ def run_data_aggregation():
 def run_full_pipeline():
     print("--- 启动信息聚合与 AI 智能处理管道 ---")
 
-    # 1. 数据接出与汇集
-    all_raw_data = run_data_aggregation()
-
-    # 2. 本地数据去重 (SimHash)
-    unique_data, filtered_out = filter_duplicates(all_raw_data)  # 使用 ai_processer 中的修正函数
+    # 1. 数据接出与汇集（发布时间游标待知识库写入成功后再推进）
+    pending_cursors: Dict[str, datetime] = {}
+    deferred_saves: List[Callable[[], None]] = []
+    all_raw_data = run_data_aggregation(pending_cursors, deferred_saves)
+
+    # 2. 本地数据去重 (SimHash)，并把近重复关系写入持久化的重复簇
+    clusters = DuplicateClusters.load(DUP_CLUSTER_FILE)
+    unique_data, filtered_out = filter_duplicates(
+        all_raw_data,
+        clusters=clusters,
+        key_func=build_article_key,
+    )
     print(f" [总结] 原始数据 {len(all_raw_data)} 篇，SimHash 去重后保留 {len(unique_data)} 篇，过滤 {len(filtered_out)} 篇。")
 
     # 3. 复用历史结果并决定是否调用 AI
     existing_processed_data = load_existing_knowledge_base(FINAL_DATA_FILE)
     articles_for_ai, reused_articles = split_articles_for_processing(unique_data, existing_processed_data)
 
+    # 与已有摘要同簇的文章直接继承摘要，不再调用 LLM
+    articles_for_ai, inherited_articles = inherit_cluster_summaries(
+        articles_for_ai,
+        existing_processed_data + list(reused_articles.values()),
+        clusters,
+    )
+    reused_articles.update(inherited_articles)
+    if inherited_articles:
+        print(f" [去重] {len(inherited_articles)} 篇文章继承同簇已有摘要，跳过 LLM。")
+
+    # 先排入到期的失败重试，再处理新文章
+    retry_queue = RetryQueue.load(RETRY_QUEUE_FILE)
+    articles_for_ai, retry_count = take_due_retries(retry_queue, articles_for_ai, reused_articles)
+    if retry_count:
+        print(f" [重试] {retry_count} 篇此前摘要失败的文章到期，优先重新处理。")
+
+    # 上次运行中断前已完成的摘要直接从日志恢复
+    journal = LLMJournal(LLM_JOURNAL_FILE)
+    articles_for_ai, resumed_articles = resume_from_journal(journal.recover(), articles_for_ai)
+    reused_articles.update(resumed_articles)
+    if resumed_articles:
+        print(f" [检查点] 从上次中断的运行中恢复 {len(resumed_articles)} 篇已完成的摘要。")
+
+    # 本轮 LLM 调用的用量与延迟统计，结束时写入运行报告
+    run_metrics.reset()
+
+    # 离线批处理：先收取在途批次的结果
+    processed_articles: List[dict] = []
+    batch_job = BatchJob.load(BATCH_STATE_FILE)
+    batch_backend = None
+    if batch_job is not None or LLM_BATCH_ENABLED:
+        batch_backend = create_batch_backend(batch_job.data.get('backend') if batch_job else None, client=llm_client)
+    if batch_job is not None:
+        articles_for_ai, batch_articles, batch_in_flight = collect_batch_results(
+            batch_job, batch_backend, articles_for_ai, reused_articles
+        )
+        processed_articles.extend(batch_articles)
+        if batch_in_flight:
+            print(f" [批处理] 批次 {batch_job.batch_id} 仍在处理中（{batch_job.status}）。")
+        else:
+            print(f" [批处理] 批次 {batch_job.batch_id} 已结束，收取 {len(batch_articles)} 篇结果。")
+            batch_job = None
+
+    # 已有摘要的更新文档交给增量摘要：只发送变更段落与原摘要
+    existing_key_map = {build_article_key(item): item for item in existing_processed_data}
+    previous_versions = {
+        key: existing_key_map[key]
+        for key in (build_article_key(item) for item in articles_for_ai)
+        if key in existing_key_map
+    }
+
+    # 积压较多且没有在途批次时，改为提交离线批次（批处理价格，不占用连接）
+    if LLM_BATCH_ENABLED and batch_job is None and len(articles_for_ai) >= LLM_BATCH_MIN_ARTICLES:
+        articles_for_ai, cached_articles = submit_llm_batch(
+            batch_backend, articles_for_ai, reused_articles, previous_versions
+        )
+        processed_articles.extend(cached_articles)
+
+    # 按时效、来源与关键词排序，超出单次运行篇数/token 上限的文章延后到下次运行
+    articles_for_ai, deferred_count = defer_over_budget(
+        retry_queue, articles_for_ai, reused_articles, previous_versions
+    )
+    if deferred_count:
+        print(f" [调度] 超出本轮运行上限，{deferred_count} 篇文章延后到下次运行。")
+    # 优先级同时用于模型路由（高于 LLM_ROUTING_PRIORITY_THRESHOLD 的文章交给大模型）
+    scored_at = utc_now()
+    llm_priorities = {
+        build_article_key(item): priority_score(item, scored_at, _article_published_at) for item in articles_for_ai
+    }
+
     print(
         f"\n--- LLM 处理准备: 需重新处理 {len(articles_for_ai)} 篇，复用 {len(reused_articles)} 篇历史摘要 ---"
     )
 
-    processed_articles = []
     if articles_for_ai:
         print("--- 启动 LLM 深度处理 (注意：这会消耗您的 API 额度) ---")
-        processed_articles = process_all_data_with_ai(articles_for_ai)
+
+        def _checkpoint(article: dict) -> None:
+            # 每篇成功的摘要完成即写入日志，崩溃后可从此处恢复
+            if has_llm_summary(article):
+                journal.append(build_article_key(article), article)
+
+        with journal:
+            processed_articles.extend(process_all_data_with_ai(
+                articles_for_ai,
+                previous_versions=previous_versions,
+                key_func=build_article_key,
+                on_result=_checkpoint,
+                priorities=llm_priorities,
+            ))
     else:
         print("--- 未检测到新增或更新的文章，跳过 LLM 调用 ---")
 
+    if processed_articles or resumed_articles or deferred_count:
+        recovered, failed = update_retry_queue(retry_queue, processed_articles + list(resumed_articles.values()))
+        print(
+            f" [重试] 恢复 {recovered} 篇，新增/仍失败 {failed} 篇；"
+            f"队列中待重试 {retry_queue.pending_count()} 篇，死信 {len(retry_queue.dead_letters())} 篇。"
+        )
+        retry_queue.save()
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        llm_cache.save()  # 批处理收取的结果同样写入缓存
+
+    report_path = write_run_report(extra={
+        'prompt_prefix_version': PROMPT_PREFIX_VERSION,
+        'articles': {
+            'processed': len(processed_articles),
+            'resumed': len(resumed_articles),
+            'deferred': deferred_count,
+        },
+    })
+    print(f" [统计] LLM 用量与延迟报告已写入 {report_path}。")
+
     final_processed_data = combine_processed_articles(unique_data, processed_articles, reused_articles)
 
     existing_key_map = {build_article_key(item): item for item in existing_processed_data}
@@ -407,7 +799,11 @@ def run_full_pipeline():
             final_keys.add(key)
 
     # 4. 存储最终结果
-    save_data(FINAL_DATA_FILE, final_processed_data)
+    if save_data(FINAL_DATA_FILE, final_processed_data):
+        # 结果已落入知识库，再推进游标并清空检查点日志
+        commit_fetch_cursors(pending_cursors, deferred_saves)
+        journal.clear()
+    clusters.save()
     if filtered_out:
         save_data('filtered_articles.json', filtered_out)
     else:
@@ -0,0 +1,259 @@
+# prompt_builder.py
+"""按 token 预算挑选送入 LLM 的正文内容。
+
+旧实现直接截取 ``content[:8000]``：HTML 正文大半预算耗在标签上，长文又会丢掉
+常常写着截止日期的结尾。这里改为：
+
+1. HTML 先转为纯文本；
+2. 用 :func:`rate_limiter.estimate_tokens` 的本地近似计数衡量长度，未超出
+   LLM_PROMPT_TOKEN_BUDGET 时原样送出；
+3. 超出时按句切分（无标点的超长段落硬切成片段），依次挑选：开头若干句（导语，占预算的 LLM_PROMPT_LEAD_RATIO）、
+   含日期/截止/金额等关键信息的句子，最后按原文顺序补满剩余预算；
+4. 选中的句子按原文顺序拼接，不连续处以“……”标出。
+
+每次构建都会计入 :data:`prompt_stats`，便于在运行结束时报告节省的 token。只有第 3 步的节选
+才算截断（truncated）；HTML 转纯文本省下的 token 单独记为 markup_saved_tokens。
+
+超长文档（见 ai_processer 的 map-reduce 模式）改用 :func:`split_chunks` 切成相互重叠的块，
+分别摘要后再汇总，而不是节选。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from config import LLM_PROMPT_LEAD_RATIO, LLM_PROMPT_TOKEN_BUDGET
+from rate_limiter import estimate_tokens
+
+_HTML_RE = re.compile(r'<(p|div|br|span|section|img|table|h[1-6]|li)\b', re.IGNORECASE)
+# 句末标点；英文句点只在其后为空白或行尾时断句，避免切开小数、网址与缩写
+_SENTENCE_RE = re.compile(r'(?:[^。！？!?；;.\n]|\.(?!\s|$))+(?:[。！？!?；;]+|\.+)?')
+# 日期、时间、截止/报名等时效词与金额：这些句子对南大学生最有用，优先保留
+_KEY_SENTENCE_RE = re.compile(
+    r'(\d{4}\s*[年./-]\s*\d{1,2}|\d{1,2}\s*月\s*\d{1,2}\s*[日号]|\d{1,2}[:：]\d{2}'
+    r'|截止|截至|ddl|deadline|报名|申请|提交|之前|前往|地点|时间'
+    r'|\d+(\.\d+)?\s*(万元|元|块|rmb|￥)|[￥¥$]\s*\d|奖金|奖学金|补贴|资助)',
+    re.IGNORECASE,
+)
+GAP_MARKER = '……'
+
+
+@dataclass
+class PromptContent:
+    text: str
+    original_tokens: int
+    used_tokens: int
+    truncated: bool = False
+    text_tokens: int = 0  # HTML 转纯文本后、节选前的 token 数
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.used_tokens)
+
+    @property
+    def markup_saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.text_tokens)
+
+
+class PromptBudgetStats:
+    """线程安全的提示词 token 统计（单次运行）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.articles = 0
+        self.truncated = 0
+        self.original_tokens = 0
+        self.used_tokens = 0
+        self.markup_saved_tokens = 0
+
+    def record(self, content: PromptContent) -> None:
+        with self._lock:
+            self.articles += 1
+            self.truncated += int(content.truncated)
+            self.original_tokens += content.original_tokens
+            self.used_tokens += content.used_tokens
+            self.markup_saved_tokens += content.markup_saved_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.used_tokens)
+
+
+prompt_stats = PromptBudgetStats()
+
+
+def html_to_text(content: str) -> str:
+    """正文为 HTML 时提取纯文本（块级元素之间换行），否则原样返回。"""
+
+    if not content or not _HTML_RE.search(content):
+        return content or ''
+    soup = BeautifulSoup(content, 'html.parser')
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+    return soup.get_text('\n')
+
+
+def _normalize_lines(text: str) -> List[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _hard_split(sentence: str, max_tokens: int) -> List[str]:
+    """把超过 max_tokens 的单句（无标点的长段、英文长句等）按字符硬切成不超过上限的片段。"""
+
+    pieces: List[str] = []
+    rest = sentence
+    while estimate_tokens(rest) > max_tokens:
+        size = max(1, len(rest) * max_tokens // estimate_tokens(rest))
+        while size > 1 and estimate_tokens(rest[:size]) > max_tokens:
+            size = max(1, size * 9 // 10)
+        pieces.append(rest[:size])
+        rest = rest[size:]
+    if rest:
+        pieces.append(rest)
+    return pieces
+
+
+def _split_units(lines: List[str], max_unit_tokens: int = 0) -> List[tuple]:
+    """切分为 (段落序号, 句子) 列表；max_unit_tokens 大于 0 时超长的句子硬切为多个片段。"""
+    units = []
+    for paragraph_index, line in enumerate(lines):
+        for sentence in _SENTENCE_RE.findall(line):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if max_unit_tokens > 0 and estimate_tokens(sentence) > max_unit_tokens:
+                units.extend((paragraph_index, piece) for piece in _hard_split(sentence, max_unit_tokens))
+            else:
+                units.append((paragraph_index, sentence))
+    return units
+
+
+def clean_text(content: str) -> str:
+    """HTML 转纯文本并去掉空行。"""
+    return '\n'.join(_normalize_lines(html_to_text(content)))
+
+
+def split_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """按句把正文切成约 chunk_tokens 的块，相邻块重叠约 overlap_tokens，保留段落换行。"""
+
+    units = _split_units(_normalize_lines(text), max(1, chunk_tokens))
+    costs = [estimate_tokens(sentence) for _, sentence in units]
+    chunks: List[str] = []
+    start = 0
+    while start < len(units):
+        end = start
+        used = 0
+        while end < len(units) and (end == start or used + costs[end] <= chunk_tokens):
+            used += costs[end]
+            end += 1
+        chunks.append(_join_units(units[start:end]))
+        if end >= len(units):
+            break
+        # 下一块从末尾若干句开始，使跨块的句子上下文不丢失
+        next_start = end
+        overlap = 0
+        while next_start - 1 > start and overlap + costs[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += costs[next_start]
+        start = next_start
+    return chunks
+
+
+def _join_units(units: List[tuple]) -> str:
+    parts: List[str] = []
+    current_paragraph = None
+    for paragraph_index, sentence in units:
+        if paragraph_index == current_paragraph:
+            parts[-1] += sentence
+        else:
+            parts.append(sentence)
+            current_paragraph = paragraph_index
+    return '\n'.join(parts)
+
+
+def select_content(title: str, content: str, budget: int = LLM_PROMPT_TOKEN_BUDGET) -> PromptContent:
+    """在 token 预算内挑选正文（标题另计入预算），返回选中的文本与 token 统计。"""
+
+    lines = _normalize_lines(html_to_text(content))
+    text = '\n'.join(lines)
+    original_tokens = estimate_tokens(content or '')
+    budget = max(0, budget - estimate_tokens(title or ''))
+
+    text_tokens = estimate_tokens(text)
+    if text_tokens <= budget:
+        result = PromptContent(text, original_tokens, text_tokens, text_tokens=text_tokens)
+        prompt_stats.record(result)
+        return result
+
+    # 单句不超过预算的四分之一：超长的无标点段落硬切成片段，而不是因放不下被整句丢弃
+    units = _split_units(lines, max(1, budget // 4))
+    costs = [estimate_tokens(sentence) for _, sentence in units]
+    selected = [False] * len(units)
+    remaining = budget
+
+    def _take(index: int) -> bool:
+        nonlocal remaining
+        if selected[index] or costs[index] > remaining:
+            return False
+        selected[index] = True
+        remaining -= costs[index]
+        return True
+
+    # 1. 导语：开头的句子，直到用完导语预算
+    lead_budget = int(budget * LLM_PROMPT_LEAD_RATIO)
+    for index in range(len(units)):
+        if budget - remaining + costs[index] > lead_budget or not _take(index):
+            break
+    # 2. 含日期、截止时间、金额等关键信息的句子
+    for index, (_, sentence) in enumerate(units):
+        if _KEY_SENTENCE_RE.search(sentence):
+            _take(index)
+    # 3. 剩余预算按原文顺序补齐
+    for index in range(len(units)):
+        if remaining <= 0:
+            break
+        _take(index)
+
+    paragraphs: List[str] = []
+    current_paragraph = None
+    previous_index = -1
+    for index, (paragraph_index, sentence) in enumerate(units):
+        if not selected[index]:
+            continue
+        if previous_index != index - 1 and paragraphs:
+            paragraphs.append(GAP_MARKER)
+            current_paragraph = None
+        if paragraph_index == current_paragraph:
+            paragraphs[-1] += sentence
+        else:
+            paragraphs.append(sentence)
+            current_paragraph = paragraph_index
+        previous_index = index
+    if previous_index != len(units) - 1:
+        paragraphs.append(GAP_MARKER)
+
+    result = PromptContent(
+        '\n'.join(paragraphs), original_tokens, budget - remaining, truncated=True, text_tokens=text_tokens
+    )
+    prompt_stats.record(result)
+    return result
+
+
+__all__ = [
+    'GAP_MARKER',
+    'PromptBudgetStats',
+    'PromptContent',
+    'clean_text',
+    'html_to_text',
+    'prompt_stats',
+    'select_content',
+    'split_chunks',
+]
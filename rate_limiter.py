@@ -0,0 +1,130 @@
+# rate_limiter.py
+"""LLM 调用的 RPM / TPM 令牌桶限速器。
+
+DashScope 等服务商同时限制每分钟请求数（RPM）与每分钟 token 数（TPM）。
+大批量回填时不加节制地发请求，会在中途集中撞上 429 并浪费重试。
+
+:class:`RateLimiter` 维护两个令牌桶，每个桶的容量为一分钟的配额、按配额匀速回填：
+
+1. 发送前按 :func:`estimate_tokens` 估算本次请求的 token（提示词 + 预期输出），
+   先从两个桶中“预订”，余额为负时调用方等待到余额回正再发送；
+2. 请求完成后用 ``completion.usage.total_tokens`` 调用 :meth:`RateLimiter.reconcile`
+   修正估算偏差（多退少补）。
+
+预订在锁内完成、等待在锁外进行，因此同一个实例可以同时供线程（:meth:`acquire`）
+与 asyncio 协程（:meth:`acquire_async`）使用，先预订者先发送。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from config import LLM_EXPECTED_COMPLETION_TOKENS, LLM_RPM_LIMIT, LLM_TPM_LIMIT
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中日韩字符约 1 token/字，其余字符约 4 字符/token。"""
+
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: int, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float) -> float:
+        """扣除 amount（可透支），返回余额回正所需的秒数。"""
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level) / self.rate
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """同时约束 RPM 与 TPM 的令牌桶限速器，limit 为 0 表示不限制对应维度。"""
+
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        now = clock()
+        self._requests: Optional[_TokenBucket] = _TokenBucket(rpm, now) if rpm > 0 else None
+        self._tokens: Optional[_TokenBucket] = _TokenBucket(tpm, now) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def reserve(self, tokens: int) -> float:
+        """预订一次请求与 tokens 个 token，返回发送前需等待的秒数。"""
+
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            if self._requests is not None:
+                self._requests.refill(now)
+                wait = max(wait, self._requests.take(1))
+            if self._tokens is not None:
+                self._tokens.refill(now)
+                wait = max(wait, self._tokens.take(tokens))
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated: int, actual: Optional[int]) -> None:
+        """用服务端返回的实际用量修正预订时的估算值。"""
+
+        if self._tokens is None or actual is None:
+            return
+        with self._lock:
+            self._tokens.refill(self._clock())
+            delta = actual - estimated
+            if delta > 0:
+                self._tokens.take(delta)
+            else:
+                self._tokens.give(-delta)
+
+
+def estimate_request_tokens(*texts: str, completion_tokens: int = LLM_EXPECTED_COMPLETION_TOKENS) -> int:
+    """估算一次对话请求的总 token：各段提示词之和加上预期输出长度。"""
+    return sum(estimate_tokens(text) for text in texts) + completion_tokens
+
+
+def usage_total_tokens(completion) -> Optional[int]:
+    usage = getattr(completion, 'usage', None)
+    total = getattr(usage, 'total_tokens', None)
+    return total if isinstance(total, int) else None
+
+
+__all__ = ['RateLimiter', 'estimate_request_tokens', 'estimate_tokens', 'usage_total_tokens']
@@ -0,0 +1,153 @@
+# retry_queue.py
+"""LLM 摘要失败的持久化重试队列。
+
+process_with_llm 失败时只在 ``llm_result['error']`` 中记录错误，文章随后照常写入知识库；
+微信文章的 article_changed 恒为 False，失败的摘要因此再也不会被重新处理。
+
+本队列以文章 key 记录每次失败，按指数退避（带随机抖动）安排下一次尝试：
+
+    delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** (attempts - 1)) * U(0.5, 1.5)
+
+每次运行开始时，main 先取出到期条目并入本轮 LLM 处理，再处理新文章；成功后出队，
+累计失败 LLM_RETRY_MAX_ATTEMPTS 次的条目转入 dead 状态（死信），不再自动重试，
+直到文章内容变化后被重新处理并成功。
+
+超出单次运行上限而被调度器延后的文章通过 :meth:`RetryQueue.defer` 入队：立即到期、
+不计入失败次数，因此不会转入死信。数据以 JSON 落盘：
+
+    {
+        "entries": {
+            "<article_key>": {
+                "article": {...},            # 不含 LLM 字段的文章快照
+                "attempts": 2,
+                "state": "pending" | "dead",
+                "next_attempt_at": 1700000000.0,
+                "first_failed_at": 1700000000.0,
+                "last_error": "...",
+                "deferred": true             # 仅因运行上限延后，尚未失败过
+            }
+        }
+    }
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_ATTEMPTS, LLM_RETRY_MAX_DELAY
+
+RETRY_QUEUE_FILE = 'llm_retry_queue.json'
+
+STATE_PENDING = 'pending'
+STATE_DEAD = 'dead'
+
+# 入队快照中剔除的 LLM 输出字段
+_LLM_FIELDS = ('llm_result', 'deep_summary', 'deep_summary_with_link', 'key_points', 'open_question', 'processed_at')
+
+
+class RetryQueue:
+    """按文章 key 记录 LLM 失败、安排指数退避重试的持久化队列。"""
+
+    def __init__(
+        self,
+        entries: Optional[Dict[str, dict]] = None,
+        path: str = RETRY_QUEUE_FILE,
+        max_attempts: int = LLM_RETRY_MAX_ATTEMPTS,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._entries: Dict[str, dict] = dict(entries or {})
+
+    @classmethod
+    def load(cls, path: str = RETRY_QUEUE_FILE, **kwargs) -> 'RetryQueue':
+        file_path = Path(path)
+        if not file_path.exists():
+            return cls(path=path, **kwargs)
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析重试队列文件 {path}，将重新建立。")
+            return cls(path=path, **kwargs)
+
+        entries = data.get('entries') if isinstance(data, dict) else None
+        return cls(entries=entries if isinstance(entries, dict) else {}, path=path, **kwargs)
+
+    def save(self) -> None:
+        with Path(self.path).open('w', encoding='utf-8') as handle:
+            json.dump({'entries': self._entries}, handle, ensure_ascii=False, indent=2)
+
+    # ------------------------------------------------------------------
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._entries.get(key)
+
+    def due(self) -> Dict[str, dict]:
+        """返回已到重试时间的 pending 条目（key -> 文章快照），最早失败的排在前面。"""
+
+        now = self._clock()
+        ready = [
+            (entry.get('first_failed_at', 0), key, entry)
+            for key, entry in self._entries.items()
+            if entry.get('state') == STATE_PENDING and entry.get('next_attempt_at', 0) <= now
+        ]
+        ready.sort(key=lambda item: item[0])
+        return {key: dict(entry.get('article') or {}) for _, key, entry in ready}
+
+    def dead_letters(self) -> List[str]:
+        return [key for key, entry in self._entries.items() if entry.get('state') == STATE_DEAD]
+
+    def pending_count(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.get('state') == STATE_PENDING)
+
+    def record_failure(self, key: str, article: dict, error: str) -> dict:
+        now = self._clock()
+        entry = self._entries.get(key) or {'attempts': 0, 'first_failed_at': now}
+        entry['attempts'] = entry.get('attempts', 0) + 1
+        entry.pop('deferred', None)
+        entry['last_error'] = error
+        entry['article'] = {field: value for field, value in article.items() if field not in _LLM_FIELDS}
+
+        if entry['attempts'] >= self.max_attempts:
+            entry['state'] = STATE_DEAD
+            entry.pop('next_attempt_at', None)
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (entry['attempts'] - 1))
+            entry['state'] = STATE_PENDING
+            entry['next_attempt_at'] = now + delay * random.uniform(0.5, 1.5)
+
+        self._entries[key] = entry
+        return entry
+
+    def defer(self, key: str, article: dict) -> dict:
+        """记录因运行上限延后的文章：不增加失败次数，下次运行即到期（仍在退避中的失败文章保持原到期时间）。"""
+
+        now = self._clock()
+        entry = self._entries.get(key) or {'attempts': 0, 'first_failed_at': now, 'deferred': True}
+        entry['article'] = {field: value for field, value in article.items() if field not in _LLM_FIELDS}
+        entry['state'] = STATE_PENDING
+        entry['next_attempt_at'] = max(entry.get('next_attempt_at') or now, now)
+        self._entries[key] = entry
+        return entry
+
+    def record_success(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+
+__all__ = ['RETRY_QUEUE_FILE', 'RetryQueue', 'STATE_DEAD', 'STATE_PENDING']
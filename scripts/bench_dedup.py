@@ -0,0 +1,180 @@
+"""对比各去重引擎的吞吐、内存、准确率与召回率。
+
+用法::
+
+    python scripts/bench_dedup.py                       # 使用合成语料
+    python scripts/bench_dedup.py --corpus corpus.jsonl # 使用带标注的语料
+    python scripts/bench_dedup.py --engines simhash minhash --docs 500
+
+标注语料为 JSONL，每行 ``{"id": ..., "text": ..., "group": ...}``，
+group 相同的文档互为近重复。未提供时，优先以 final_knowledge_base.json 中的正文为种子，
+否则用内置词表合成正文，并为每篇种子生成若干句级/字级扰动后的近重复副本。
+
+评估方式与 filter_duplicates 一致：按顺序逐篇查询索引，未命中则加入索引。
+- precision：判为重复的文档中，命中文档确属同组的比例；
+- recall：本应判为重复（前面已有同组文档）的文档中，被正确判重的比例。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from dedup_engines import available_engines, create_dedup_engine  # noqa: E402
+from simhash_utils import get_tokens  # noqa: E402
+
+_VOCAB = (
+    '南京大学 学生 通知 报名 截止 时间 奖学金 申请 材料 提交 学院 活动 讲座 实习 竞赛 '
+    '招聘 宣讲 校园 图书馆 课程 考试 成绩 选课 教务 研究生 本科生 导师 科研 项目 '
+    '志愿者 社团 体育 比赛 心理 健康 安全 宿舍 食堂 交流 出国 访学 论文 答辩 毕业 '
+    '就业 指导 创新 创业 基金 评审 公示 结果 名单 地点 仙林 鼓楼 苏州 校区 欢迎 参加'
+).split()
+
+
+def _synthetic_text(rng: random.Random, sentences: int = 12) -> str:
+    parts = []
+    for _ in range(sentences):
+        words = rng.sample(_VOCAB, rng.randint(6, 12))
+        parts.append(''.join(words) + '。')
+    return ''.join(parts)
+
+
+def _mutate(text: str, rng: random.Random, rate: float) -> str:
+    sentences = [s for s in text.split('。') if s]
+    mutated = []
+    for sentence in sentences:
+        roll = rng.random()
+        if roll < rate / 3:
+            continue  # 删除句子
+        if roll < rate * 2 / 3:
+            sentence = ''.join(rng.sample(_VOCAB, rng.randint(6, 12)))  # 替换句子
+        mutated.append(sentence)
+        if rng.random() < rate / 3:
+            mutated.append(''.join(rng.sample(_VOCAB, rng.randint(6, 12))))  # 插入句子
+    result = '。'.join(mutated) + '。'
+    # 少量字级噪声：模拟转载时的标点、空白与错别字差异
+    chars = list(result)
+    for _ in range(max(1, len(chars) // 200)):
+        position = rng.randrange(len(chars))
+        chars[position] = rng.choice('，、 ')
+    return ''.join(chars)
+
+
+def _seed_texts(limit: int, rng: random.Random) -> list[str]:
+    kb_path = ROOT / 'final_knowledge_base.json'
+    seeds: list[str] = []
+    if kb_path.exists():
+        try:
+            articles = json.loads(kb_path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            articles = []
+        for article in articles if isinstance(articles, list) else []:
+            content = article.get('content') if isinstance(article, dict) else None
+            if isinstance(content, str) and len(content) >= 200:
+                seeds.append(content)
+            if len(seeds) >= limit:
+                break
+    while len(seeds) < limit:
+        seeds.append(_synthetic_text(rng))
+    return seeds
+
+
+def build_corpus(docs: int, variants: int, rate: float, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    bases = _seed_texts(max(1, docs // (variants + 1)), rng)
+    corpus: list[dict] = []
+    for group, base in enumerate(bases):
+        corpus.append({'id': f'{group}-0', 'text': base, 'group': group})
+        for index in range(1, variants + 1):
+            corpus.append({'id': f'{group}-{index}', 'text': _mutate(base, rng, rate), 'group': group})
+    rng.shuffle(corpus)
+    return corpus
+
+
+def load_corpus(path: str) -> list[dict]:
+    corpus = []
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                corpus.append(json.loads(line))
+    return corpus
+
+
+def evaluate(engine_name: str, corpus: list[dict]) -> dict:
+    engine = create_dedup_engine(engine_name)
+    group_of = {str(doc['id']): doc['group'] for doc in corpus}
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = engine.new_index()
+    predicted: dict[str, str] = {}
+    for doc in corpus:
+        key = str(doc['id'])
+        fingerprint = engine.fingerprint(doc['text'])
+        match = index.query(fingerprint)
+        if match is None:
+            index.add(key, fingerprint)
+        else:
+            predicted[key] = match
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seen_groups: set = set()
+    expected = 0
+    for doc in corpus:
+        if doc['group'] in seen_groups:
+            expected += 1
+        seen_groups.add(doc['group'])
+
+    correct = sum(1 for key, match in predicted.items() if group_of[key] == group_of[match])
+    precision = correct / len(predicted) if predicted else 1.0
+    recall = correct / expected if expected else 1.0
+
+    return {
+        'engine': engine.name,
+        'docs': len(corpus),
+        'docs_per_sec': len(corpus) / elapsed if elapsed else float('inf'),
+        'peak_mb': peak / (1024 * 1024),
+        'precision': precision,
+        'recall': recall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='去重引擎对比基准')
+    parser.add_argument('--corpus', help='带 group 标注的 JSONL 语料')
+    parser.add_argument('--engines', nargs='+', default=list(available_engines()))
+    parser.add_argument('--docs', type=int, default=600, help='合成语料的文档总数')
+    parser.add_argument('--variants', type=int, default=2, help='每篇种子生成的近重复副本数')
+    parser.add_argument('--rate', type=float, default=0.15, help='近重复副本的句级扰动比例')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.docs, args.variants, args.rate, args.seed)
+
+    # 预热 jieba 词典，避免把加载时间计入 SimHash 引擎
+    get_tokens('预热分词词典')
+
+    print(f"语料: {len(corpus)} 篇，组数 {len({doc['group'] for doc in corpus})}\n")
+    print(f"{'engine':<10}{'docs/s':>12}{'peak MB':>10}{'precision':>11}{'recall':>9}")
+    for name in args.engines:
+        result = evaluate(name, corpus)
+        print(
+            f"{result['engine']:<10}{result['docs_per_sec']:>12.1f}{result['peak_mb']:>10.2f}"
+            f"{result['precision']:>11.3f}{result['recall']:>9.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
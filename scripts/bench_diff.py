@@ -0,0 +1,96 @@
+"""find_diff 基准：对比旧版 difflib.SequenceMatcher 实现与整数化 patience/Myers 实现。
+
+用法::
+
+    python scripts/bench_diff.py --lines 10000 --edits 50
+
+合成文档模拟语雀长文：大量空行、重复的分隔线/表格行，以及分散在全文的修改、插入与删除。
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from diff_utils import find_diff  # noqa: E402
+
+_REPEATED = ['', '', '---', '| --- | --- |', '> 注意事项', '']
+
+
+def legacy_find_diff(old_text, new_text):
+    """改造前的实现，仅供对比。"""
+    if not old_text:
+        return new_text
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    diff_output = []
+    for opcode, _, _, b_start, b_end in matcher.get_opcodes():
+        if opcode in ('insert', 'replace'):
+            diff_output.append("\n".join(new_lines[b_start:b_end]))
+    return "\n".join(diff_output)
+
+
+def build_documents(lines: int, edits: int, seed: int) -> tuple[str, str]:
+    rng = random.Random(seed)
+    old_lines = []
+    for index in range(lines):
+        if rng.random() < 0.35:
+            old_lines.append(rng.choice(_REPEATED))
+        else:
+            old_lines.append(f"第 {index} 行：关于{rng.choice(['选课', '奖学金', '实习', '讲座'])}的说明 {rng.randint(0, 99)}")
+
+    new_lines = list(old_lines)
+    for _ in range(edits):
+        position = rng.randrange(len(new_lines))
+        roll = rng.random()
+        if roll < 0.4:
+            new_lines[position] = new_lines[position] + '（已更新）'
+        elif roll < 0.7:
+            new_lines.insert(position, f"新增内容 {rng.randint(0, 10 ** 6)}")
+        elif roll < 0.85:
+            new_lines.insert(position, rng.choice(_REPEATED))
+        else:
+            del new_lines[position]
+    return "\n".join(old_lines), "\n".join(new_lines)
+
+
+def _timed(func, old_text, new_text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(old_text, new_text)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='find_diff 基准')
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--edits', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    old_text, new_text = build_documents(args.lines, args.edits, args.seed)
+    legacy_time, legacy_out = _timed(legacy_find_diff, old_text, new_text, args.repeat)
+    new_time, new_out = _timed(find_diff, old_text, new_text, args.repeat)
+
+    print(f"文档: {args.lines} 行，{args.edits} 处修改")
+    print(f"{'impl':<10}{'best ms':>10}{'diff lines':>12}")
+    print(f"{'difflib':<10}{legacy_time * 1000:>10.1f}{len(legacy_out.splitlines()):>12}")
+    print(f"{'patience':<10}{new_time * 1000:>10.1f}{len(new_out.splitlines()):>12}")
+    print(f"加速比: {legacy_time / new_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""对着本地 LLM 替身服务跑一遍摘要阶段，测量吞吐、并发窗口与重试行为。
+
+用法::
+
+    python scripts/llm_stub_server.py --latency lognormal:0.8,0.5 --error-429 0.05 &
+    python scripts/bench_llm_pipeline.py --articles 300
+    python scripts/bench_llm_pipeline.py --base-url http://127.0.0.1:8765/v1 --long-ratio 0.1
+
+脚本在导入 ai_processer 之前把 AI_BASE_URL/AI_API_KEY 指向替身服务，并关闭结果缓存
+（否则第二次运行全部命中缓存，测不到 API 路径），因此不会访问真实服务、不会消耗额度。
+文章为合成语料；--long-ratio 控制超出上下文预算、走 map-reduce 的长文比例。
+结束后打印墙钟时间、每秒篇数、客户端侧的用量统计与替身服务的 /stats。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_VOCAB = (
+    '南京大学 学生 通知 报名 截止 时间 奖学金 申请 材料 提交 学院 活动 讲座 实习 竞赛 '
+    '招聘 宣讲 校园 图书馆 课程 考试 成绩 选课 教务 研究生 本科生 导师 科研 项目 '
+    '志愿者 社团 体育 比赛 心理 健康 安全 宿舍 食堂 交流 出国 访学 论文 答辩 毕业'
+).split()
+
+
+def _synthetic_articles(count: int, long_ratio: float, seed: int) -> list:
+    rng = random.Random(seed)
+    articles = []
+    for index in range(count):
+        paragraphs = 400 if rng.random() < long_ratio else rng.randint(3, 20)
+        lines = [''.join(rng.sample(_VOCAB, rng.randint(8, 16))) + '。' for _ in range(paragraphs)]
+        articles.append({
+            'source': rng.choice(('南大学工', '南大教务', '南大研究生')),
+            'platform': '微信公众号',
+            'title': f"基准文章 {index:04d}：{''.join(rng.sample(_VOCAB, 3))}",
+            'link': f"https://bench.invalid/article/{index}",
+            'content': '\n'.join(lines),
+        })
+    return articles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='LLM 摘要阶段离线基准（需先启动 llm_stub_server.py）')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8765/v1')
+    parser.add_argument('--articles', type=int, default=200)
+    parser.add_argument('--long-ratio', type=float, default=0.0, help='走 map-reduce 的长文比例')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ['AI_BASE_URL'] = args.base_url
+    os.environ['AI_API_KEY'] = 'stub'
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    import httpx
+    from ai_processer import process_all_data_with_ai
+    from llm_metrics import format_summary, run_metrics
+
+    articles = _synthetic_articles(args.articles, args.long_ratio, args.seed)
+    stats_url = args.base_url.rstrip('/').removesuffix('/v1') + '/stats'
+    try:
+        httpx.post(f"{stats_url}/reset", timeout=5)
+    except httpx.HTTPError as exc:
+        parser.error(f"无法连接替身服务 {args.base_url}：{exc}")
+
+    run_metrics.reset()
+    started = time.perf_counter()
+    results = process_all_data_with_ai(articles)
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for item in results if (item.get('llm_result') or {}).get('error'))
+    print(f"\n文章 {len(results)} 篇，失败 {failed} 篇，耗时 {elapsed:.2f} 秒，{len(results) / max(elapsed, 1e-9):.1f} 篇/秒")
+    print(f"客户端统计: {format_summary(run_metrics.summary())}")
+    print(f"替身服务统计: {httpx.get(stats_url, timeout=5).json()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""SimHash 构建微基准：对比 generate_simhash 与 build_simhash（token 哈希缓存 + NumPy 累加）。
+
+用法::
+
+    python scripts/bench_simhash.py --docs 2000
+
+分两项计时：
+- end-to-end：含 jieba 分词的完整指纹构建；
+- weighting：仅比较分词之后的哈希与加权累加部分（两者共享同一份分词结果）。
+同时逐篇校验两种实现的输出逐位一致。
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from simhash import Simhash  # noqa: E402
+
+from scripts.bench_dedup import build_corpus  # noqa: E402
+from simhash_utils import (  # noqa: E402
+    _token_hash,
+    build_simhash,
+    generate_simhash,
+    get_tokens,
+    simhash_from_tokens,
+)
+
+
+def _reference_from_tokens(tokens) -> Simhash:
+    if not tokens:
+        return Simhash([""], f=128)
+    counts = Counter(tokens)
+    return Simhash([(token, min(count, 255)) for token, count in counts.items()], f=128)
+
+
+def _timed(func, items) -> tuple[float, list]:
+    started = time.perf_counter()
+    results = [func(item) for item in items]
+    return time.perf_counter() - started, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='SimHash 构建微基准')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    texts = [doc['text'] for doc in build_corpus(args.docs, 2, 0.15, args.seed)]
+    get_tokens('预热分词词典')
+
+    reference_time, reference = _timed(generate_simhash, texts)
+    _token_hash.cache_clear()
+    fast_time, fast = _timed(build_simhash, texts)
+
+    mismatches = sum(1 for a, b in zip(reference, fast) if a.value != b.value)
+
+    token_lists = [get_tokens(text) for text in texts]
+    weighting_reference, _ = _timed(_reference_from_tokens, token_lists)
+    _token_hash.cache_clear()
+    weighting_cold, _ = _timed(simhash_from_tokens, token_lists)
+    weighting_warm, _ = _timed(simhash_from_tokens, token_lists)
+
+    count = len(texts)
+    cache_info = _token_hash.cache_info()
+    print(f"文档数: {count}，逐位不一致: {mismatches}")
+    print(f"{'stage':<22}{'reference us/doc':>18}{'fast us/doc':>14}{'speedup':>10}")
+    for label, ref, new in (
+        ('end-to-end', reference_time, fast_time),
+        ('weighting (cold)', weighting_reference, weighting_cold),
+        ('weighting (warm)', weighting_reference, weighting_warm),
+    ):
+        print(f"{label:<22}{ref / count * 1e6:>18.1f}{new / count * 1e6:>14.1f}{ref / new:>9.2f}x")
+    print(f"token 缓存: hits={cache_info.hits} misses={cache_info.misses} size={cache_info.currsize}")
+
+
+if __name__ == '__main__':
+    main()
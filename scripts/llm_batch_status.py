@@ -0,0 +1,47 @@
+"""查看（或等待）在途的离线 LLM 批次。
+
+用法::
+
+    python scripts/llm_batch_status.py                 # 查询一次状态
+    python scripts/llm_batch_status.py --wait --interval 300
+
+批次结果由下一次 ``python main.py`` 运行时自动收取并写回知识库，这里只负责轮询状态。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from ai_processer import client  # noqa: E402
+from llm_batch import BATCH_STATE_FILE, BatchJob, create_batch_backend, poll_batch, wait_for_batch  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='离线 LLM 批次状态')
+    parser.add_argument('--state', default=BATCH_STATE_FILE)
+    parser.add_argument('--wait', action='store_true', help='轮询直至批次结束')
+    parser.add_argument('--interval', type=float, default=60.0, help='轮询间隔（秒）')
+    parser.add_argument('--timeout', type=float, default=None, help='最长等待时间（秒）')
+    args = parser.parse_args()
+
+    job = BatchJob.load(args.state)
+    if job is None:
+        print('当前没有在途的批次。')
+        return
+
+    backend = create_batch_backend(job.data.get('backend'), client=client)
+    if args.wait:
+        status = wait_for_batch(job, backend, interval=args.interval, timeout=args.timeout)
+    else:
+        status = poll_batch(job, backend)['status']
+    print(f"批次 {job.batch_id}: {status}，共 {len(job.requests)} 篇。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+"""本地 OpenAI 兼容的 LLM 替身服务，用于离线基准与压测，不消耗额度、不依赖外网。
+
+用法::
+
+    python scripts/llm_stub_server.py --port 8765                                  # 合成响应
+    python scripts/llm_stub_server.py --latency lognormal:0.8,0.5 --error-429 0.05 --max-concurrency 16
+    python scripts/llm_stub_server.py --recordings llm_recordings.jsonl           # 先回放录制结果
+    python scripts/llm_stub_server.py --recordings llm_recordings.jsonl \\
+        --record-upstream https://dashscope.aliyuncs.com/compatible-mode/v1       # 未命中时转发并录制
+
+随后把 ``AI_BASE_URL`` 指向它即可运行整条管道或 ``scripts/bench_llm_pipeline.py``::
+
+    AI_BASE_URL=http://127.0.0.1:8765/v1 AI_API_KEY=stub python main.py
+
+响应来源（按顺序）：
+
+1. 录制文件（JSONL，每行 ``{"prompt_hash": ..., "response": {...}}``），按全部消息的哈希匹配；
+2. 指定 --record-upstream 时转发到真实服务（使用 AI_API_KEY），成功的响应追加到录制文件；
+3. 否则合成符合 ai_processer 输出结构的 JSON（全文/增量/汇总为摘要结构，分段为 summary/facts）。
+
+拥塞模拟：--latency 指定延迟分布（fixed:S、uniform:A,B、lognormal:中位数,sigma，单位秒）；
+--error-429/--error-5xx 按比例随机注入错误；--max-concurrency 与 --rpm 模拟服务商的并发与
+每分钟请求上限，超出时返回 429（后者带 Retry-After）。--malformed 按比例返回带代码块、
+被截断或缺字段的输出，用于验证本地修复、纠错重问与模型升级。
+usage 按 rate_limiter.estimate_tokens 估算；除最后一条消息外的前缀再次出现时计入
+``prompt_tokens_details.cached_tokens``，模拟服务商的前缀缓存。
+
+``GET /stats`` 返回服务端观测到的请求数、状态码分布、峰值并发与延迟，``POST /stats/reset`` 清零。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from config import LLM_SUMMARY_MIN_CHARS  # noqa: E402
+from rate_limiter import estimate_tokens  # noqa: E402
+
+_MAP_MARKER = '"facts"'
+_CORRECTION_PREFIX = '你上一次的输出不符合要求'
+
+
+def prompt_hash(body: dict) -> str:
+    """按全部消息（角色与内容）计算哈希，与模型名无关，便于跨档位回放。"""
+    messages = [[message.get('role'), message.get('content')] for message in body.get('messages') or []]
+    payload = json.dumps(messages, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """解析延迟分布：fixed:S、uniform:A,B、lognormal:中位数,sigma（秒）。"""
+
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value.strip()]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(max(values[0], 1e-6))
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise argparse.ArgumentTypeError(f"无法解析延迟分布: {spec}")
+
+
+class RecordingStore:
+    """prompt_hash -> 录制的 chat completion 响应，追加写入 JSONL。"""
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = Path(path) if path else None
+        self._responses: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            with self.path.open('r', encoding='utf-8') as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict) and record.get('prompt_hash') and isinstance(record.get('response'), dict):
+                        self._responses[record['prompt_hash']] = record['response']
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._responses.get(key)
+
+    def add(self, key: str, response: dict) -> None:
+        with self._lock:
+            self._responses[key] = response
+            if self.path is not None:
+                with self.path.open('a', encoding='utf-8') as handle:
+                    handle.write(json.dumps({'prompt_hash': key, 'response': response}, ensure_ascii=False) + '\n')
+
+
+class StubStats:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.monotonic()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.statuses: Dict[str, int] = {}
+        self.sources: Dict[str, int] = {}
+        self.latencies: list = []
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def _pct(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 3)
+
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            'requests': self.requests,
+            'elapsed_seconds': round(elapsed, 2),
+            'requests_per_second': round(self.requests / elapsed, 2),
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'statuses': dict(self.statuses),
+            'sources': dict(self.sources),
+            'latency': {'p50': _pct(0.5), 'p95': _pct(0.95), 'p99': _pct(0.99)},
+        }
+
+
+def _task_prompt(body: dict) -> str:
+    """最后一条非纠错的用户消息；纠错追问时即对话中的原提示词。"""
+
+    for message in reversed(body.get('messages') or []):
+        content = message.get('content') or ''
+        if message.get('role') == 'user' and not content.startswith(_CORRECTION_PREFIX):
+            return content
+    return ''
+
+
+def _payload_lines(body: dict) -> list:
+    return [line.strip() for line in _task_prompt(body).splitlines() if line.strip()]
+
+
+def _is_map_prompt(prompt: str) -> bool:
+    """分段提示词在正文前的说明中给出 facts 格式。"""
+
+    return _MAP_MARKER in prompt.partition('\n\n')[0]
+
+
+def synthesize_content(body: dict, rng: random.Random) -> str:
+    """按提示词类型合成结构正确的输出，正文取自原提示词（纠错追问时同样如此）。"""
+
+    lines = _payload_lines(body)
+    text = ''.join(lines[1:]) or ''.join(lines)
+    prompt = _task_prompt(body)
+    if _is_map_prompt(prompt):
+        chunk = [line.strip() for line in prompt.split('\n\n', 1)[-1].splitlines() if line.strip()]
+        chunk = [line.replace('"', '') for line in chunk]  # 避免回显的 JSON 混入后续汇总提示词
+        return json.dumps({'summary': f"【替身分段】{''.join(chunk)[:120]}", 'facts': chunk[:3]}, ensure_ascii=False)
+    points = [line[:18] for line in (lines[1:4] + ['（替身要点）'] * 3)[:3]]
+    return json.dumps({
+        # 正文较短时补足字数，使合成输出满足摘要下限校验
+        'deep_summary': f"【替身摘要】本文要点如下：{text[:240]}".ljust(LLM_SUMMARY_MIN_CHARS, '。'),
+        'key_points': points,
+        'open_question': f"关于“{(lines[1:] or lines or ['本文'])[0][:20]}”，你还想了解什么？",
+    }, ensure_ascii=False)
+
+
+def malform(content: str, rng: random.Random) -> str:
+    """生成常见的格式缺陷：代码块包裹、输出截断或缺少字段。"""
+
+    choice = rng.choice(('fence', 'truncate', 'missing'))
+    if choice == 'fence':
+        return f"好的，结果如下：\n```json\n{content}\n```"
+    if choice == 'truncate':
+        return content[: max(10, int(len(content) * 0.8))]
+    data = json.loads(content)
+    data.pop('key_points' if 'key_points' in data else 'summary', None)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def build_completion(body: dict, content: str, cached_prefix_tokens: int) -> dict:
+    messages = body.get('messages') or []
+    prompt_tokens = sum(estimate_tokens(message.get('content') or '') for message in messages)
+    completion_tokens = estimate_tokens(content)
+    return {
+        'id': f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model') or 'stub',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': min(cached_prefix_tokens, prompt_tokens)},
+        },
+    }
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[dict] = None) -> JSONResponse:
+    payload = {'error': {'message': message, 'type': error_type, 'code': status}}
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title='LLM stub server')
+    rng = random.Random(args.seed)
+    latency = args.latency
+    recordings = RecordingStore(args.recordings)
+    stats = StubStats()
+    seen_prefixes: set = set()
+    request_times: Deque[float] = deque()
+    upstream_key = os.getenv('AI_API_KEY')
+    print(f" [替身] 已加载 {len(recordings)} 条录制响应。")
+
+    def _throttled() -> Optional[JSONResponse]:
+        if args.max_concurrency and stats.in_flight > args.max_concurrency:
+            return _error(429, 'Too many concurrent requests (stub)', 'rate_limit_error')
+        if args.rpm:
+            now = time.monotonic()
+            while request_times and now - request_times[0] >= 60:
+                request_times.popleft()
+            if len(request_times) >= args.rpm:
+                retry_after = max(1, int(60 - (now - request_times[0])) + 1)
+                return _error(429, 'RPM limit reached (stub)', 'rate_limit_error', {'retry-after': str(retry_after)})
+            request_times.append(now)
+        roll = rng.random()
+        if roll < args.error_429:
+            return _error(429, 'Injected rate limit (stub)', 'rate_limit_error')
+        if roll < args.error_429 + args.error_5xx:
+            return _error(rng.choice((500, 502, 503)), 'Injected server error (stub)', 'server_error')
+        return None
+
+    async def _upstream(body: dict) -> Optional[dict]:
+        async with httpx.AsyncClient(timeout=args.upstream_timeout) as client:
+            response = await client.post(
+                f"{args.record_upstream.rstrip('/')}/chat/completions",
+                json=body,
+                headers={'Authorization': f"Bearer {upstream_key}"},
+            )
+        if response.status_code != 200:
+            print(f" [替身] 上游返回 {response.status_code}，改用合成响应。")
+            return None
+        return response.json()
+
+    @app.post('/v1/chat/completions')
+    @app.post('/chat/completions')
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        started = time.monotonic()
+        status = 200
+        try:
+            rejected = _throttled()
+            if rejected is not None:
+                status = rejected.status_code
+                await asyncio.sleep(min(latency(rng), 0.05))  # 拒绝也有少量网络开销
+                return rejected
+
+            key = prompt_hash(body)
+            completion = recordings.get(key)
+            source = 'recorded'
+            if completion is None and args.record_upstream:
+                completion = await _upstream(body)
+                if completion is not None:
+                    recordings.add(key, completion)
+                    source = 'upstream'
+            if completion is None:
+                source = 'synthetic'
+                content = synthesize_content(body, rng)
+                if rng.random() < args.malformed:
+                    content = malform(content, rng)
+                    source = 'malformed'
+                messages = body.get('messages') or []
+                prefix = prompt_hash({'messages': messages[:-1]})
+                cached = 0
+                if prefix in seen_prefixes:
+                    cached = sum(estimate_tokens(message.get('content') or '') for message in messages[:-1])
+                seen_prefixes.add(prefix)
+                completion = build_completion(body, content, cached)
+                await asyncio.sleep(latency(rng))
+            stats.sources[source] = stats.sources.get(source, 0) + 1
+            return JSONResponse(completion)
+        finally:
+            stats.in_flight -= 1
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            if status == 200:
+                stats.latencies.append(time.monotonic() - started)
+
+    @app.get('/v1/models')
+    def list_models() -> dict:
+        return {'object': 'list', 'data': [{'id': 'stub', 'object': 'model', 'owned_by': 'stub'}]}
+
+    @app.get('/stats')
+    def get_stats() -> dict:
+        return stats.snapshot()
+
+    @app.post('/stats/reset')
+    def reset_stats() -> dict:
+        stats.reset()
+        return {'ok': True}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='本地 OpenAI 兼容 LLM 替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=parse_latency, default=parse_latency('lognormal:0.8,0.4'),
+                        help='延迟分布：fixed:S、uniform:A,B、lognormal:中位数,sigma（秒）')
+    parser.add_argument('--error-429', type=float, default=0.0, help='随机注入 429 的比例')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='随机注入 5xx 的比例')
+    parser.add_argument('--max-concurrency', type=int, default=0, help='超过该并发数时返回 429（0 表示不限）')
+    parser.add_argument('--rpm', type=int, default=0, help='每分钟请求上限，超出返回带 Retry-After 的 429')
+    parser.add_argument('--malformed', type=float, default=0.0, help='返回格式有缺陷输出的比例')
+    parser.add_argument('--recordings', default=None, help='录制响应 JSONL 文件')
+    parser.add_argument('--record-upstream', default=None, help='未命中录制时转发的真实服务 base URL')
+    parser.add_argument('--upstream-timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.record_upstream and not args.recordings:
+        parser.error('--record-upstream 需要同时指定 --recordings')
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
 from simhash import Simhash
+import hashlib
 import jieba
+import numpy as np
 from collections import Counter
+from functools import lru_cache
+
+from config import SIMHASH_TOKEN_CACHE_SIZE
+
+SIMHASH_F_BITS = 128
 
 # --- 扩展停用词列表 ---
 STOP_WORDS = set([
@@ -86,6 +93,38 @@ def generate_simhash(doc_text):
     weighted_tokens = [(token, min(count, 255)) for token, count in word_counts.items()]
     return Simhash(weighted_tokens, f=128)
 
+@lru_cache(maxsize=SIMHASH_TOKEN_CACHE_SIZE)
+def _token_hash(token: str) -> bytes:
+    """token -> 128 位 md5 摘要（与 simhash 库的默认 hashfunc 一致），高频词只算一次。"""
+    return hashlib.md5(token.encode('utf-8')).digest()
+
+
+def simhash_from_tokens(tokens) -> Simhash:
+    """
+    由分词结果构建 SimHash：token 哈希走 LRU 缓存，加权位累加一次性用 NumPy 矩阵运算完成。
+    与 Simhash(weighted_tokens, f=128) 的结果逐位一致。
+    """
+    if not tokens:
+        return Simhash([""], f=SIMHASH_F_BITS)
+
+    word_counts = Counter(tokens)
+    weights = np.fromiter(
+        (min(count, 255) for count in word_counts.values()),
+        dtype=np.int64,
+        count=len(word_counts),
+    )
+    digests = b''.join(_token_hash(token) for token in word_counts)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, SIMHASH_F_BITS)
+    sums = weights @ bits
+    value = int.from_bytes(np.packbits(sums > weights.sum() / 2).tobytes(), 'big')
+    return Simhash(value, f=SIMHASH_F_BITS)
+
+
+def build_simhash(doc_text):
+    """generate_simhash 的加速版本，输出逐位一致，已落盘的指纹无需重算。"""
+    return simhash_from_tokens(get_tokens(doc_text))
+
+
 def get_hamming_distance(hash1, hash2):
     """计算两个 Simhash 签名之间的海明距离。"""
     if not (hash1 and hash2):
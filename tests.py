@@ -1,6 +1,53 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
 import unittest
-from simhash_utils import generate_simhash, get_hamming_distance
-from diff_utils import find_diff
+from unittest import mock
+
+# ai_processer 在导入时会初始化 OpenAI 客户端，测试环境下提供占位密钥
+os.environ.setdefault('AI_API_KEY', 'test-key')
+
+from simhash_utils import build_simhash, generate_simhash, get_hamming_distance
+from diff_utils import diff_blocks, find_diff
+from dup_clusters import DuplicateClusters
+import ai_processer
+from ai_processer import filter_duplicates
+from llm_cache import LLMCache
+from llm_engine import AdaptiveConcurrency, AdaptiveLLMEngine
+from rate_limiter import RateLimiter, estimate_tokens
+from retry_queue import STATE_DEAD, RetryQueue
+from llm_journal import LLMJournal
+from prompt_builder import GAP_MARKER, select_content, split_chunks
+from llm_scheduler import schedule_articles
+from llm_metrics import LLMMetrics, load_run_reports, usage_breakdown, write_run_report
+from llm_router import ModelRouter, ModelTier
+from llm_output import KEY_POINT_MAX_CHARS, OutputValidationError, parse_summary_output, repair_json_text
+import llm_batch
+import main
+from dedup_engines import MinHashLSHEngine, SimHashEngine
+import yuque_summarizer
+import wechat_pubaccount_fetcher
+import we_mp_rss_api
+from wechat_api_index import APIArticleIndex
+
+SUMMARY = (
+    '选课与奖学金申请时间调整，报名截止日期延后至下周五，请同学们及时关注教务通知。'
+    '本学期选课系统将于下周一上午九点重新开放，已选课程不受影响，退补选阶段同步顺延三天。'
+    '奖学金申请需在学生工作系统中在线填写申请表，并上传成绩单、获奖证书等证明材料的扫描件。'
+    '材料经院系初审后统一报送学校评审委员会，评审结果预计于下月中旬公示，公示期为五个工作日。'
+    '同学们如对申请条件或材料要求有疑问，可在工作日联系所在院系辅导员或教务办公室咨询。'
+)
+
+
+def summary_json(summary=SUMMARY):
+    return json.dumps(
+        {'deep_summary': summary, 'key_points': ['要点一', '要点二', '要点三'], 'open_question': '你准备好了吗？'},
+        ensure_ascii=False,
+    )
+
 
 class TestSimHashUtils(unittest.TestCase):
     def test_generate_simhash(self):
@@ -14,6 +61,16 @@ class TestSimHashUtils(unittest.TestCase):
         self.assertIsNotNone(hash2)
         self.assertNotEqual(hash1.value, hash2.value)
 
+    def test_build_simhash_matches_reference(self):
+        texts = [
+            "",
+            "这是一个测试文本",
+            "南京大学 通知 " * 80,
+            "南京大学的人工智能学院致力于研究，融合了计算机科学与神经科学的前沿知识。",
+        ]
+        for text in texts:
+            self.assertEqual(build_simhash(text).value, generate_simhash(text).value)
+
 class TestDiffUtils(unittest.TestCase):
     def test_find_diff(self):
         old_text = "这是第一行\n这是第二行\n这是第三行"
@@ -22,5 +79,941 @@ class TestDiffUtils(unittest.TestCase):
         diff = find_diff(old_text, new_text)
         self.assertIn("修改后的第二行", diff)
 
+    def test_diff_blocks_positions_with_repeated_lines(self):
+        old_text = "标题\n\n---\n\n第一段\n\n---\n\n第二段"
+        new_text = "标题\n\n---\n\n第一段（已更新）\n\n---\n\n第二段\n\n新增一段"
+
+        blocks = diff_blocks(old_text, new_text)
+        self.assertEqual([block.tag for block in blocks], ['replace', 'insert'])
+        self.assertEqual((blocks[0].new_start, blocks[0].new_end), (4, 5))
+        self.assertEqual(blocks[0].text, "第一段（已更新）")
+        self.assertEqual(blocks[1].text, "\n新增一段")
+
+        paragraphs = diff_blocks(old_text, new_text, granularity='paragraph')
+        self.assertEqual([block.text for block in paragraphs], ["第一段（已更新）", "新增一段"])
+
+class TestDuplicateClusters(unittest.TestCase):
+    def test_union_keeps_canonical_root(self):
+        clusters = DuplicateClusters()
+        clusters.union('b', 'a')
+        clusters.union('c', 'b')
+        self.assertEqual(clusters.find('c'), 'a')
+        self.assertEqual(clusters.groups()['a'], ['a', 'b', 'c'])
+
+    def test_filter_duplicates_records_reference(self):
+        text = "南京大学人工智能学院发布奖学金申请通知，报名截止时间为十月二十日，请同学们及时提交材料。"
+        articles = [
+            {'link': 'a', 'title': '原文', 'content': text},
+            {'link': 'b', 'title': '转载', 'content': text},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            clusters = DuplicateClusters(path=os.path.join(tmp, 'clusters.json'))
+            unique, filtered = filter_duplicates(articles, clusters=clusters)
+            clusters.save()
+
+            self.assertEqual(len(unique), 1)
+            self.assertEqual(filtered[0]['_duplicate_of'], 'a')
+            self.assertNotIn('content', filtered[0])
+
+            # 下一次运行时，重发的文章可与历史指纹匹配
+            reloaded = DuplicateClusters.load(clusters.path)
+            repost = [{'link': 'c', 'title': '再次转载', 'content': text}]
+            unique, _ = filter_duplicates(repost, clusters=reloaded)
+            self.assertEqual(len(unique), 1)
+            self.assertEqual(reloaded.find('c'), 'a')
+            self.assertIn('c', reloaded.recent_matches)
+
+    def test_inherit_requires_direct_near_duplicate(self):
+        # 链式簇 A~B~C：C 与 A 的汉明距离超过阈值，不应继承 A 的摘要
+        engine = SimHashEngine(threshold=3)
+        clusters = DuplicateClusters(engine=engine.name)
+        for key, value in (('a', 0b0), ('b', 0b111), ('c', 0b111111), ('d', 0b1)):
+            clusters.set_fingerprint(key, engine.encode(value))
+        clusters.union('b', 'a')
+        clusters.record_match('c', 'b')
+        clusters.record_match('d', 'b')
+
+        known = [{'link': 'a', 'deep_summary': 'A 的摘要'}]
+        articles = [{'link': 'c', 'content': '编辑后的正文'}, {'link': 'd', 'content': '转载'}]
+        remaining, inherited = main.inherit_cluster_summaries(articles, known, clusters, engine=engine)
+
+        self.assertEqual([item['link'] for item in remaining], ['c'])
+        self.assertEqual(inherited['d']['_summary_inherited_from'], 'a')
+
+
+class TestDedupEngines(unittest.TestCase):
+    TEXT = "南京大学人工智能学院发布奖学金申请通知，报名截止时间为十月二十日，请同学们及时提交申请材料并关注后续公示。"
+
+    def test_minhash_matches_near_duplicate(self):
+        engine = MinHashLSHEngine()
+        index = engine.new_index()
+        index.add('a', engine.fingerprint(self.TEXT))
+
+        repost = self.TEXT.replace('十月二十日', '10月20日')
+        self.assertEqual(index.query(engine.fingerprint(repost)), 'a')
+        self.assertIsNone(index.query(engine.fingerprint("昨夜雨疏风骤，浓睡不消残酒。试问卷帘人，却道海棠依旧。")))
+
+    def test_fingerprint_encoding_roundtrip(self):
+        for engine in (SimHashEngine(), MinHashLSHEngine()):
+            fingerprint = engine.fingerprint(self.TEXT)
+            restored = engine.decode(engine.encode(fingerprint))
+            index = engine.new_index()
+            index.add('a', restored)
+            self.assertEqual(index.query(fingerprint), 'a')
+
+
+class TestYuqueUpdates(unittest.TestCase):
+    def test_history_is_incremental_and_body_free(self):
+        metadata = [
+            {'id': 1, 'title': 'A', 'updated_at': '2025-10-01T00:00:00Z'},
+            {'id': 2, 'title': 'B', 'updated_at': '2025-10-01T00:00:00Z'},
+        ]
+        bodies = {'1': '南京大学通知：奖学金申请开始。', '2': '课程安排调整说明。'}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            history_file = os.path.join(tmp, 'history.jsonl')
+            with mock.patch.object(yuque_summarizer, 'fetch_yuque_data', return_value=metadata), \
+                    mock.patch.object(yuque_summarizer, 'get_doc_body', side_effect=lambda doc_id, session=None: bodies[doc_id]), \
+                    mock.patch.object(yuque_summarizer, 'YUQUE_KEEP_BODIES', False):
+                first = yuque_summarizer.check_yuque_updates(data_file=history_file, legacy_file=None)
+                self.assertEqual(len(first), 2)
+
+                # 第二次运行只有文档 1 的时间戳变化，但正文未变
+                metadata[0] = dict(metadata[0], updated_at='2025-10-02T00:00:00Z')
+                second = yuque_summarizer.check_yuque_updates(data_file=history_file, legacy_file=None)
+                self.assertEqual(second, [])
+
+            with open(history_file, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 3)
+            history = yuque_summarizer.load_history(history_file)
+            self.assertEqual(history['1']['updated_at'], '2025-10-02T00:00:00Z')
+            self.assertNotIn('body', history['1'])
+            self.assertTrue(history['2']['body_hash'])
+
+    def test_compaction_prunes_unreferenced_bodies(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = yuque_summarizer.BodyStore(os.path.join(tmp, 'bodies'))
+            old_hash = store.put('旧版正文')
+            new_hash = store.put('新版正文')
+            history = {'1': {'id': '1', 'body_hash': new_hash}}
+            yuque_summarizer.compact_history(os.path.join(tmp, 'history.jsonl'), history, store)
+            self.assertIsNone(store.get(old_hash))
+            self.assertEqual(store.get(new_hash), '新版正文')
+
+
+class TestIncrementalSummary(unittest.TestCase):
+    PARAGRAPHS = [f"第{i}段：关于选课与奖学金申请的详细说明，请同学们按时关注教务通知。" for i in range(10)]
+
+    def _run(self, new_content):
+        previous = {
+            'title': '通知',
+            'content': '\n\n'.join(self.PARAGRAPHS),
+            'deep_summary': '原摘要',
+            'key_points': ['要点一'],
+            'llm_result': {'deep_summary': '原摘要'},
+        }
+        reply = mock.Mock()
+        reply.choices = [mock.Mock(message=mock.Mock(content=summary_json()))]
+        with mock.patch.object(ai_processer.client.chat.completions, 'create', return_value=reply) as create, \
+                mock.patch.object(ai_processer, 'get_llm_cache', return_value=None):
+            article = ai_processer.process_with_llm({'title': '通知', 'content': new_content}, previous)
+        prompt = create.call_args.kwargs['messages'][-1]['content']
+        return article, prompt
+
+    def test_small_append_uses_incremental_prompt(self):
+        article, prompt = self._run('\n\n'.join(self.PARAGRAPHS + ['新增：报名截止日期延后至下周五。']))
+        self.assertEqual(article['llm_result']['mode'], 'incremental')
+        self.assertEqual(article['deep_summary'], SUMMARY)
+        self.assertIn('[新增]', prompt)
+        self.assertIn('原摘要', prompt)
+        self.assertNotIn('第0段', prompt)
+
+    def test_prompt_prefix_is_identical_across_articles(self):
+        first = ai_processer._chat_kwargs(ai_processer._build_full_prompt('通知一', '正文一'))['messages']
+        second = ai_processer._chat_kwargs(ai_processer._build_full_prompt('通知二', '正文二'))['messages']
+        self.assertEqual(first[:-1], second[:-1])
+        self.assertEqual(first[0]['role'], 'system')
+        self.assertNotIn('通知一', ai_processer.PROMPT_PREFIX_TEXT)
+        self.assertIn('通知一', first[-1]['content'])
+
+    def test_large_change_falls_back_to_full_summary(self):
+        article, prompt = self._run('完全重写的正文。\n\n另一段全新的内容。')
+        self.assertNotIn('mode', article['llm_result'])
+        self.assertIn('完全重写的正文', prompt)
+
+
+class TestLLMCache(unittest.TestCase):
+    def test_same_prompt_under_different_keys_is_billed_once(self):
+        reply = mock.Mock()
+        reply.choices = [mock.Mock(message=mock.Mock(content=summary_json()))]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LLMCache(path=os.path.join(tmp, 'cache.json'))
+            with mock.patch.object(ai_processer.client.chat.completions, 'create', return_value=reply) as create:
+                ai_processer.process_with_llm({'title': 'T', 'content': '正文  内容', 'link': 'https://a?x=1'}, cache=cache)
+                second = ai_processer.process_with_llm({'title': 'T', 'content': '正文 内容\n', 'link': 'https://a?x=2'}, cache=cache)
+            self.assertEqual(create.call_count, 1)
+            self.assertTrue(second['llm_result']['cached'])
+            self.assertEqual(second['deep_summary_with_link'], f'{SUMMARY}\n\n原文链接：https://a?x=2')
+
+            cache.save()
+            reloaded = LLMCache.load(cache.path)
+            self.assertEqual(len(reloaded), 1)
+
+    def test_eviction_keeps_most_recently_used(self):
+        cache = LLMCache(path=os.devnull, max_entries=2)
+        cache.put('a', {'deep_summary': 'a'})
+        cache.put('b', {'deep_summary': 'b'})
+        with mock.patch('llm_cache.time.time', return_value=time.time() + 10):
+            cache.get('a')
+            cache.put('c', {'deep_summary': 'c'})
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['hits'], 2)
+
+        # 落盘条目的顺序与使用时间不一致时，加载后仍按 last_used 淘汰
+        now = time.time()
+        entries = {
+            'new': {'result': {}, 'created_at': now, 'last_used': now},
+            'old': {'result': {}, 'created_at': now, 'last_used': now - 100},
+        }
+        cache = LLMCache(path=os.devnull, max_entries=2, entries=entries)
+        cache.put('c', {'deep_summary': 'c'})
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('new'))
+
+
+class TestAdaptiveLLMEngine(unittest.TestCase):
+    def test_window_grows_and_backs_off_on_throttle(self):
+        class Throttled(Exception):
+            status_code = 429
+
+        in_flight = 0
+
+        async def provider():
+            nonlocal in_flight
+            in_flight += 1
+            try:
+                await asyncio.sleep(0.001)
+                if in_flight > 6:
+                    raise Throttled()
+                return 'ok'
+            finally:
+                in_flight -= 1
+
+        async def no_sleep(_delay):
+            await asyncio.sleep(0)
+
+        engine = AdaptiveLLMEngine(AdaptiveConcurrency(initial=2, minimum=1, maximum=20), max_attempts=10, sleep=no_sleep)
+
+        async def run():
+            return await asyncio.gather(*(engine.call(provider) for _ in range(200)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, ['ok'] * 200)
+        self.assertGreater(engine.concurrency.peak_limit, 6)
+        self.assertGreater(engine.stats()['decreases'], 0)
+
+    def test_non_throttle_errors_are_raised_immediately(self):
+        calls = 0
+
+        async def provider():
+            nonlocal calls
+            calls += 1
+            raise ValueError('bad json')
+
+        engine = AdaptiveLLMEngine(max_attempts=3)
+        with self.assertRaises(ValueError):
+            asyncio.run(engine.call(provider))
+        self.assertEqual(calls, 1)
+
+    def test_engine_reusable_across_event_loops(self):
+        async def provider():
+            await asyncio.sleep(0.001)
+            return 'ok'
+
+        engine = AdaptiveLLMEngine(AdaptiveConcurrency(initial=1, minimum=1, maximum=1))
+
+        async def run():
+            return await asyncio.gather(*(engine.call(provider) for _ in range(5)))
+
+        # 第二次 asyncio.run 使用新的事件循环，并发窗口不能沿用上一个循环的 Condition
+        self.assertEqual(asyncio.run(run()), ['ok'] * 5)
+        self.assertEqual(asyncio.run(run()), ['ok'] * 5)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rpm_and_tpm_buckets_pace_requests(self):
+        now = [0.0]
+        limiter = RateLimiter(rpm=2, tpm=1200, clock=lambda: now[0])
+        self.assertEqual(limiter.reserve(100), 0.0)
+        self.assertEqual(limiter.reserve(100), 0.0)
+        # 第三个请求需等待 RPM 回填 1 个请求（30 秒）
+        self.assertAlmostEqual(limiter.reserve(100), 30.0)
+
+        now[0] = 120.0
+        # TPM 透支 600 token，按 20 token/秒回填需要 30 秒
+        self.assertAlmostEqual(limiter.reserve(1800), 0.0)
+        self.assertAlmostEqual(limiter.reserve(600), 30.0)
+        # 实际用量低于估算时退还额度
+        limiter.reconcile(600, 0)
+        self.assertAlmostEqual(limiter.reserve(0), 30.0)
+
+    def test_estimate_tokens_counts_cjk_per_character(self):
+        self.assertEqual(estimate_tokens('南京大学'), 4)
+        self.assertEqual(estimate_tokens('abcdefgh'), 2)
+
+
+class TestRetryQueue(unittest.TestCase):
+    def test_backoff_dead_letter_and_persistence(self):
+        now = [1000.0]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queue.json')
+            queue = RetryQueue(path=path, max_attempts=3, base_delay=60, max_delay=600, clock=lambda: now[0])
+            article = {'title': 'T', 'link': 'https://mp/1', 'llm_result': {'error': 'timeout'}}
+
+            entry = queue.record_failure('k', article, 'timeout')
+            self.assertNotIn('llm_result', entry['article'])
+            self.assertEqual(queue.due(), {})
+            now[0] += 91  # 退避 60 秒 * 抖动上限 1.5
+            self.assertIn('k', queue.due())
+
+            queue.record_failure('k', article, 'timeout')
+            queue.record_failure('k', article, 'timeout')
+            self.assertEqual(queue.get('k')['state'], STATE_DEAD)
+            queue.save()
+
+            reloaded = RetryQueue.load(path, clock=lambda: now[0] + 10 ** 6)
+            self.assertEqual(reloaded.dead_letters(), ['k'])
+            self.assertEqual(reloaded.due(), {})
+
+    def test_due_retries_are_processed_before_new_work(self):
+        queue = RetryQueue(path=os.devnull, base_delay=0)
+        failed = {'title': '失败文章', 'link': 'https://mp/1', 'llm_result': {'error': '429'}}
+        queue.record_failure(main.build_article_key(failed), failed, '429')
+        reused = {main.build_article_key(failed): dict(failed)}
+
+        articles, retried = main.take_due_retries(queue, [{'title': '新文章', 'link': 'https://mp/2'}], reused)
+        self.assertEqual(retried, 1)
+        self.assertEqual([item['title'] for item in articles], ['失败文章', '新文章'])
+        self.assertEqual(reused, {})
+
+        articles[0]['llm_result'] = {'deep_summary': 'ok'}
+        self.assertEqual(main.update_retry_queue(queue, articles[:1]), (1, 0))
+        self.assertEqual(len(queue), 0)
+
+
+class TestLLMJournal(unittest.TestCase):
+    def test_resume_skips_completed_articles_with_unchanged_content(self):
+        done = {'title': 'A', 'link': 'https://mp/a', 'content': '正文A', 'deep_summary': '摘要A'}
+        edited = {'title': 'B', 'link': 'https://mp/b', 'content': '正文B', 'deep_summary': '摘要B'}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'journal.jsonl')
+            with LLMJournal(path, fsync_every=1) as journal:
+                journal.append(main.build_article_key(done), done)
+                journal.append(main.build_article_key(edited), edited)
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write('{"key": "half-written')  # 模拟崩溃时的残行
+
+            records = LLMJournal(path).recover()
+            self.assertEqual(len(records), 2)
+
+            pending = [
+                {'title': 'A', 'link': 'https://mp/a', 'content': '正文A'},
+                {'title': 'B', 'link': 'https://mp/b', 'content': '正文B（已修改）'},
+                {'title': 'C', 'link': 'https://mp/c', 'content': '正文C'},
+            ]
+            remaining, resumed = main.resume_from_journal(records, pending)
+            self.assertEqual([item['title'] for item in remaining], ['B', 'C'])
+            self.assertEqual(resumed[main.build_article_key(done)]['deep_summary'], '摘要A')
+
+            LLMJournal(path).clear()
+            self.assertFalse(os.path.exists(path))
+
+    def test_crash_before_save_keeps_cursor_and_resumes_unfetched_article(self):
+        article = {
+            'title': '讲座通知', 'link': 'https://mp/lecture', 'content': '正文',
+            'platform': '微信公众号', 'published_at': '2026-10-18T09:00:00',
+        }
+        fetcher = mock.Mock()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                fetcher.list_articles.return_value = [dict(article)]
+                with mock.patch.object(main, 'create_wechat_fetcher', return_value=fetcher), \
+                        mock.patch.object(main, 'fetch_all_yuque_docs', return_value=[]):
+                    pending_cursors = {}
+                    self.assertEqual(len(main.run_data_aggregation(pending_cursors)), 1)
+                self.assertIn('wechat', pending_cursors)
+                self.assertFalse(os.path.exists(main.FETCH_STATE_FILE))
+
+                # 摘要已写入日志，随后在知识库落盘前崩溃
+                summarized = dict(article, deep_summary='讲座摘要')
+                with LLMJournal('journal.jsonl', fsync_every=1) as journal:
+                    journal.append(main.build_article_key(summarized), summarized)
+
+                # 下次运行抓取器不再返回该文章，日志中的摘要仍需并入知识库
+                remaining, resumed = main.resume_from_journal(LLMJournal('journal.jsonl').recover(), [])
+                self.assertEqual(remaining, [])
+                final = main.combine_processed_articles([], [], resumed)
+                self.assertEqual([item['deep_summary'] for item in final], ['讲座摘要'])
+
+                main.commit_fetch_cursors(pending_cursors)
+                state = main._load_fetch_state()
+                self.assertEqual(main._get_last_published_time(state, 'wechat'), pending_cursors['wechat'])
+            finally:
+                os.chdir(cwd)
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_html_within_budget_is_sent_as_text(self):
+        html = '<section><p style="color:red">讲座通知</p><p>欢迎参加。</p></section>'
+        selected = select_content('标题', html, budget=1000)
+        self.assertFalse(GAP_MARKER in selected.text)
+        self.assertEqual(selected.text, '讲座通知\n欢迎参加。')
+        self.assertLess(selected.used_tokens, selected.original_tokens)
+        # 只去掉了标签，没有省略正文，不算截断
+        self.assertFalse(selected.truncated)
+        self.assertEqual(selected.markup_saved_tokens, selected.saved_tokens)
+        self.assertNotIn('节选', ai_processer._build_full_prompt('讲座', html))
+
+    def test_long_document_keeps_lead_and_tail_deadline(self):
+        filler = '\n'.join(f'这是第{i}段背景介绍内容，与具体安排无关。' for i in range(200))
+        content = f'本次奖学金评选面向全体本科生。\n{filler}\n请于10月31日前提交申请材料。'
+        selected = select_content('奖学金通知', content, budget=300)
+        self.assertTrue(selected.truncated)
+        self.assertLessEqual(selected.used_tokens, 300)
+        self.assertTrue(selected.text.startswith('本次奖学金评选面向全体本科生。'))
+        self.assertIn('请于10月31日前提交申请材料。', selected.text)
+        self.assertIn(GAP_MARKER, selected.text)
+
+    def test_unpunctuated_text_is_hard_split(self):
+        selected = select_content('t', 'word ' * 20000, budget=500)
+        self.assertTrue(selected.truncated)
+        self.assertGreater(selected.used_tokens, 400)
+        self.assertLessEqual(selected.used_tokens, 500)
+        self.assertTrue(selected.text.startswith('word word'))
+
+        chunks = split_chunks('word ' * 20000, chunk_tokens=500, overlap_tokens=50)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(chunk) <= 500 for chunk in chunks))
+
+        # 英文句点断句，小数不受影响
+        self.assertEqual(split_chunks('Version 3.5 is out. See you.', chunk_tokens=6), ['Version 3.5 is out.', 'See you.'])
+
+
+class TestMapReduce(unittest.TestCase):
+    def test_split_chunks_overlap_and_cover_everything(self):
+        text = '\n'.join(f'第{i}句内容说明。' for i in range(40))
+        chunks = split_chunks(text, chunk_tokens=40, overlap_tokens=8)
+        self.assertGreater(len(chunks), 3)
+        joined = '\n'.join(chunks)
+        for i in range(40):
+            self.assertIn(f'第{i}句内容说明。', joined)
+        self.assertEqual(chunks[0].splitlines()[-1], chunks[1].splitlines()[0])
+
+    def test_long_document_is_summarized_by_map_then_reduce(self):
+        prompts = []
+
+        class FakeAsyncClient:
+            def __init__(self):
+                self.chat = mock.Mock()
+                self.chat.completions.create = self.create
+
+            async def create(self, **kwargs):
+                prompt = kwargs['messages'][-1]['content']
+                prompts.append(prompt)
+                await asyncio.sleep(0)
+                if '部分（相邻部分有少量重叠）' in prompt:
+                    payload = {'summary': f'分段{len(prompts)}', 'facts': ['10月31日截止']}
+                else:
+                    payload = json.loads(summary_json())
+                reply = mock.Mock()
+                reply.choices = [mock.Mock(message=mock.Mock(content=json.dumps(payload)))]
+                return reply
+
+            async def close(self):
+                pass
+
+        content = '\n'.join(f'手册第{i}节：关于选课、考试与奖学金的详细规定。' for i in range(60))
+        with mock.patch.multiple(ai_processer, LLM_LONG_DOC_TOKENS=200, LLM_CHUNK_TOKENS=150, LLM_MAX_CHUNKS=16), \
+                mock.patch.object(ai_processer, 'create_async_client', return_value=FakeAsyncClient()), \
+                mock.patch.object(ai_processer, 'get_llm_cache', return_value=None):
+            article = ai_processer.process_with_llm({'title': '学生手册', 'content': content})
+
+        chunks = article['llm_result']['chunks']
+        self.assertEqual(article['llm_result']['mode'], 'map_reduce')
+        self.assertEqual(article['deep_summary'], SUMMARY)
+        self.assertEqual(len(prompts), chunks + 1)
+        self.assertIn('[第 1 部分]', prompts[-1])
+        self.assertIn('手册第59节', '\n'.join(prompts[:-1]))
+
+
+class TestLLMBatch(unittest.TestCase):
+    def test_submit_then_collect_with_local_backend(self):
+        def responder(body):
+            prompt = body['messages'][-1]['content']
+            if '失败' in prompt:
+                raise RuntimeError('content filtered')
+            content = summary_json()
+            return {'choices': [{'message': {'role': 'assistant', 'content': content}}]}
+
+        articles = [
+            {'title': '通知一', 'link': 'https://mp/1', 'content': '报名截止10月31日。'},
+            {'title': '失败文章', 'link': 'https://mp/2', 'content': '正文。'},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = llm_batch.LocalBatchBackend(os.path.join(tmp, 'batches'), responder=responder)
+            state_file = os.path.join(tmp, 'state.json')
+            with mock.patch.object(llm_batch, 'LLM_BATCH_DIR', os.path.join(tmp, 'batches')), \
+                    mock.patch.object(main, 'BATCH_STATE_FILE', state_file), \
+                    mock.patch.object(ai_processer, 'get_llm_cache', return_value=None):
+                reused = {}
+                online, cached = main.submit_llm_batch(backend, articles, reused, {})
+                self.assertEqual((online, cached), ([], []))
+                self.assertEqual(len(reused), 2)
+
+                with open(backend._file(llm_batch.BatchJob.load(state_file).data['input_file_id']), encoding='utf-8') as f:
+                    first_line = json.loads(f.readline())
+                self.assertEqual(first_line['url'], '/v1/chat/completions')
+                self.assertEqual(first_line['custom_id'], llm_batch.make_custom_id(main.build_article_key(articles[0])))
+
+                job = llm_batch.BatchJob.load(state_file)
+                remaining, ingested, in_flight = main.collect_batch_results(job, backend, [], reused)
+
+            self.assertFalse(in_flight)
+            self.assertEqual([item['title'] for item in ingested], ['通知一'])
+            self.assertEqual(ingested[0]['deep_summary'], SUMMARY)
+            self.assertEqual(ingested[0]['llm_result']['mode'], 'batch')
+            self.assertEqual([item['title'] for item in remaining], ['失败文章'])
+            self.assertFalse(os.path.exists(state_file))
+
+
+class TestLLMScheduler(unittest.TestCase):
+    def test_priority_order_and_run_caps(self):
+        now = main._parse_datetime('2024-05-10T00:00:00')
+        articles = [
+            {'title': '旧文档', 'link': 'a', 'content': '正文', 'source': 'Yuque', 'published_at': '2024-03-01T00:00:00'},
+            {'title': '奖学金报名截止通知', 'link': 'b', 'content': '正文', 'source': '南大', 'published_time': '2024-05-09T00:00:00'},
+            {'title': '普通推送', 'link': 'c', 'content': '正文', 'source': '南大', 'published_time': '2024-05-09T00:00:00'},
+        ]
+        selected, deferred = schedule_articles(articles, main._article_published_at, now=now, max_articles=2, max_tokens=0)
+        self.assertEqual([item['link'] for item in selected], ['b', 'c'])
+        self.assertEqual([item['link'] for item in deferred], ['a'])
+
+        # token 上限至少放行一篇
+        selected, deferred = schedule_articles(articles, main._article_published_at, now=now, max_articles=0, max_tokens=1)
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(len(deferred), 2)
+
+    def test_deferred_articles_are_queued_without_counting_failures(self):
+        queue = RetryQueue(path=os.devnull, max_attempts=1)
+        article = {'title': 'T', 'link': 'https://mp/1', 'content': '正文'}
+        key = main.build_article_key(article)
+        reused = {}
+        with mock.patch.object(main, 'schedule_articles', return_value=([], [article])):
+            remaining, deferred = main.defer_over_budget(queue, [article], reused, {})
+        self.assertEqual((remaining, deferred), ([], 1))
+        self.assertIs(reused[key], article)
+        self.assertEqual(queue.get(key)['attempts'], 0)
+        self.assertIn(key, queue.due())
+
+    def test_due_retries_take_slots_before_new_articles(self):
+        now = main._parse_datetime('2024-05-10T00:00:00')
+        retry = {'title': '普通推送', 'link': 'r', 'content': '正文', 'published_time': '2024-04-01T00:00:00'}
+        fresh = {'title': '奖学金报名截止通知', 'link': 'n', 'content': '正文', 'published_time': '2024-05-09T00:00:00'}
+        selected, deferred = schedule_articles([fresh], main._article_published_at, now=now, max_articles=1, first=[retry])
+        self.assertEqual((selected, deferred), ([retry], [fresh]))
+
+    def test_defer_keeps_pending_backoff(self):
+        clock = mock.Mock(return_value=1000.0)
+        queue = RetryQueue(path=os.devnull, base_delay=600, clock=clock)
+        article = {'title': 'T', 'link': 'https://mp/1', 'content': '正文'}
+        backoff_until = queue.record_failure('k', article, 'timeout')['next_attempt_at']
+        self.assertEqual(queue.defer('k', article)['next_attempt_at'], backoff_until)
+        self.assertNotIn('k', queue.due())
+
+
+class TestLLMMetrics(unittest.TestCase):
+    def test_usage_percentiles_and_report(self):
+        usage = {'prompt_tokens': 120, 'completion_tokens': 30, 'prompt_tokens_details': {'cached_tokens': 100}}
+        self.assertEqual(usage_breakdown(usage), {'prompt_tokens': 120, 'completion_tokens': 30, 'cached_tokens': 100})
+        self.assertEqual(usage_breakdown({'prompt_cache_hit_tokens': 64})['cached_tokens'], 64)
+
+        metrics = LLMMetrics()
+        for latency in range(1, 101):
+            metrics.record_completion('full', {'model': 'm', 'usage': usage}, latency=float(latency), title=f'文章{latency}')
+        metrics.record_failure('map', RuntimeError('429'), latency=0.2, retries=3)
+        summary = metrics.summary()
+        self.assertEqual((summary['calls'], summary['failed'], summary['retries']), (101, 1, 3))
+        self.assertEqual(summary['tokens']['cached'], 10000)
+        self.assertEqual(summary['latency']['p50'], 50.0)
+        self.assertEqual(summary['latency']['p99'], 99.0)
+        self.assertEqual(summary['slowest'][0]['title'], '文章100')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            write_run_report(metrics, report_dir=tmp, keep=1, extra={'articles': {'processed': 100}})
+            reports = load_run_reports(tmp)
+            self.assertEqual(reports[0]['articles'], {'processed': 100})
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'latest.json')))
+
+        # 同一秒内的多次运行各自保留报告
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('llm_metrics.datetime', mock.Mock(now=mock.Mock(return_value=datetime(2026, 10, 19, 8)))):
+            first = write_run_report(metrics, report_dir=tmp, keep=5)
+            metrics.record_cache_hit()
+            second = write_run_report(metrics, report_dir=tmp, keep=5)
+            self.assertNotEqual(first, second)
+            self.assertEqual(len(load_run_reports(tmp, limit=5)), 2)
+            # 同名冲突时后写入的报告排在前面
+            self.assertEqual(load_run_reports(tmp)[0]['cache_hits'], 1)
+
+        # 同步路径由 SDK 内部重试，次数记为未知而不是 0
+        metrics.record_completion('full', {'model': 'm', 'usage': usage}, latency=1.0, retries=None)
+        summary = metrics.summary()
+        self.assertEqual((summary['retries'], summary['retries_unknown']), (3, 1))
+
+    def test_engine_reports_attempts_and_latency(self):
+        engine = AdaptiveLLMEngine(AdaptiveConcurrency(initial=1), sleep=lambda _delay: asyncio.sleep(0))
+        calls = []
+
+        async def _request():
+            calls.append(1)
+            if len(calls) == 1:
+                error = RuntimeError('rate limited')
+                error.status_code = 429
+                raise error
+            return 'ok'
+
+        info = {}
+        self.assertEqual(asyncio.run(engine.call(_request, info=info)), 'ok')
+        self.assertEqual(info['attempts'], 2)
+        self.assertGreaterEqual(info['latency'], 0)
+
+
+class TestModelRouting(unittest.TestCase):
+    @staticmethod
+    def _router():
+        def _tier(name, model):
+            engine = AdaptiveLLMEngine(AdaptiveConcurrency(initial=2), sleep=lambda _delay: asyncio.sleep(0))
+            return ModelTier(name, model, engine, RateLimiter(rpm=0, tpm=0))
+        return ModelRouter(_tier('large', 'big'), _tier('small', 'tiny'), small_max_tokens=200, large_sources='Yuque')
+
+    def test_short_notices_go_to_small_model(self):
+        router = self._router()
+        self.assertEqual(router.choose({'source': '南大'}, 'full', 150).name, 'small')
+        self.assertEqual(router.choose({'source': '南大'}, 'full', 500).name, 'large')
+        self.assertEqual(router.choose({'source': 'Yuque'}, 'full', 150).name, 'large')
+        self.assertEqual(router.choose({'source': '南大'}, 'incremental', 150).name, 'large')
+
+    def test_invalid_small_model_output_escalates_to_large(self):
+        router = self._router()
+        models = []
+
+        class FakeAsyncClient:
+            def __init__(self):
+                self.chat = mock.Mock()
+                self.chat.completions.create = self.create
+
+            async def create(self, **kwargs):
+                models.append(kwargs['model'])
+                content = '不是 JSON' if kwargs['model'] == 'tiny' else summary_json()
+                reply = mock.Mock()
+                reply.choices = [mock.Mock(message=mock.Mock(content=content))]
+                return reply
+
+        article = {'title': '通知', 'content': '报名截止到周五。'}
+        cache = LLMCache(path=os.devnull)
+        result = asyncio.run(ai_processer.process_with_llm_async(article, router, FakeAsyncClient(), cache=cache))
+        self.assertEqual(models, ['tiny', 'big'])
+        self.assertEqual(result['llm_result']['model'], 'big')
+        self.assertTrue(result['llm_result']['escalated'])
+        self.assertEqual(router.stats()['escalations'], 1)
+        self.assertEqual(router.stats()['routed'], {'large': 0, 'small': 1})
+
+        # 升级后的结果按大模型写入缓存，小模型的缓存键不会命中大模型结果
+        request = ai_processer.prepare_llm_request({'title': '通知', 'content': '报名截止到周五。'}, cache=cache, router=router)
+        self.assertIsNone(cache.get(request.cache_key))
+        request.model = 'big'
+        self.assertIsNotNone(cache.get(ai_processer._request_cache_key(request)))
+
+        # 命中缓存的请求不计入路由统计
+        cache.put(ai_processer.prepare_llm_request(dict(article), cache=cache, router=router).cache_key, json.loads(summary_json()))
+        asyncio.run(ai_processer.process_with_llm_async(dict(article), router, FakeAsyncClient(), cache=cache))
+        self.assertEqual(router.stats()['routed'], {'large': 0, 'small': 1})
+
+
+class TestLLMOutput(unittest.TestCase):
+    def test_local_repairs(self):
+        fenced = '好的，结果如下：\n```json\n' + summary_json()[:-1] + ',}\n```'
+        output, repairs = parse_summary_output(fenced)
+        self.assertEqual(output['deep_summary'], SUMMARY)
+        self.assertIn('json', repairs)
+
+        truncated = '{"deep_summary": "%s", "key_points": "- 要点一\\n- 要点二\\n- 要点三\\n- 要点四", "open_question": "你会报名' % SUMMARY
+        output, repairs = parse_summary_output(truncated)
+        self.assertEqual(output['key_points'], ['要点一', '要点二', '要点三'])
+        self.assertEqual(output['open_question'], '你会报名')
+        self.assertEqual(repair_json_text('{"a": [1, 2,], "b": {"c": "x\\'), '{"a": [1, 2], "b": {"c": "x"}}')
+
+    def test_invalid_output_triggers_follow_up_reask(self):
+        bad = mock.Mock()
+        bad.choices = [mock.Mock(message=mock.Mock(content=json.dumps({'deep_summary': SUMMARY, 'key_points': ['一']})))]
+        good = mock.Mock()
+        good.choices = [mock.Mock(message=mock.Mock(content=summary_json()))]
+        article = {'title': '通知', 'content': '报名截止到周五。'}
+        with mock.patch.object(ai_processer.client.chat.completions, 'create', side_effect=[bad, good]) as create, \
+                mock.patch.object(ai_processer, 'get_llm_cache', return_value=None):
+            result = ai_processer.process_with_llm(article)
+        self.assertEqual(create.call_count, 2)
+        first_messages = create.call_args_list[0].kwargs['messages']
+        messages = create.call_args.kwargs['messages']
+        # 追问：原提示词、上次输出作为前两轮，纠错提示在最后
+        self.assertEqual(messages[:-2], first_messages)
+        self.assertEqual(messages[-2], {'role': 'assistant', 'content': bad.choices[0].message.content})
+        correction = messages[-1]['content']
+        self.assertIn('key_points', correction)
+        self.assertNotIn('报名截止到周五', correction)
+        self.assertEqual(result['key_points'], ['要点一', '要点二', '要点三'])
+
+        long_points = json.dumps({'deep_summary': SUMMARY, 'key_points': ['长' * 60, '二', '三'], 'open_question': '？'})
+        with self.assertRaises(OutputValidationError) as raised:
+            parse_summary_output(long_points)
+        self.assertIn(f'不超过 {KEY_POINT_MAX_CHARS} 字', str(raised.exception))
+
+        # 提示词中的字数要求与校验常量一致
+        self.assertIn(f'每项{KEY_POINT_MAX_CHARS}字以内', ai_processer.SCHEMA_INSTRUCTIONS)
+        self.assertIn(f'不少于{ai_processer.LLM_SUMMARY_MIN_CHARS}字', ai_processer.SCHEMA_INSTRUCTIONS)
+        with self.assertRaises(OutputValidationError):
+            parse_summary_output(json.dumps({'deep_summary': SUMMARY[:100], 'key_points': ['一', '二', '三'], 'open_question': '？'}))
+
+        with self.assertRaises(OutputValidationError):
+            parse_summary_output('{"deep_summary": "太短"}')
+
+
+def _rss_response(body, status=200, headers=None):
+    response = mock.Mock(status_code=status, headers=headers or {})
+    response.raise_for_status = mock.Mock()
+    response.iter_content = lambda chunk_size: iter([body[i:i + 64] for i in range(0, len(body), 64)])
+    return response
+
+
+RSS_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel>
+<item><title>新文章</title><link>https://mp.weixin.qq.com/s/new</link><author>南大学工</author><category>南大学工</category>
+<pubDate>2026-10-19T08:00:00</pubDate><description>正文二</description></item>
+<item><title>旧文章</title><link>https://mp.weixin.qq.com/s/old</link><author>南大学工</author><category>南大学工</category>
+<pubDate>2026-10-01T08:00:00</pubDate><description>正文一</description></item>
+</channel></rss>""".encode('utf-8')
+
+
+class TestWeChatFeed(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        self.enrichment = mock.patch.multiple(
+            wechat_pubaccount_fetcher,
+            _load_article_source_map=mock.Mock(return_value={}),
+            _load_api_article_index=mock.Mock(return_value=({}, None, True)),
+        )
+        self.enrichment.start()
+
+    def tearDown(self):
+        self.enrichment.stop()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_conditional_get_skips_unchanged_feed(self):
+        first = _rss_response(RSS_FEED, headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 19 Oct 2026 08:00:00 GMT'})
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=first) as get:
+            articles = wechat_pubaccount_fetcher.fetch_articles_from_rss()
+        self.assertEqual([item['title'] for item in articles], ['新文章', '旧文章'])
+        self.assertEqual(get.call_args.kwargs['headers'], {})
+
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(b'', 304)) as get:
+            self.assertEqual(wechat_pubaccount_fetcher.fetch_articles_from_rss(), [])
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(wechat_pubaccount_fetcher._load_api_article_index.call_count, 1)
+
+        # 服务端忽略条件请求头时，正文哈希相同同样跳过
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(RSS_FEED)):
+            self.assertEqual(wechat_pubaccount_fetcher.fetch_articles_from_rss(), [])
+        self.assertEqual(wechat_pubaccount_fetcher._load_api_article_index.call_count, 1)
+
+    def test_validators_saved_only_when_caller_commits(self):
+        deferred = []
+        first = _rss_response(RSS_FEED, headers={'ETag': '"v1"'})
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=first):
+            self.assertEqual(len(wechat_pubaccount_fetcher.fetch_articles_from_rss(deferred_saves=deferred)), 2)
+        self.assertEqual(len(deferred), 1)
+
+        # 知识库写入前崩溃：下次运行不带校验值，Feed 仍完整处理
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(RSS_FEED)) as get:
+            self.assertEqual(len(wechat_pubaccount_fetcher.fetch_articles_from_rss()), 2)
+        self.assertEqual(get.call_args.kwargs['headers'], {})
+
+        main.commit_fetch_cursors({}, deferred)
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(b'', 304)) as get:
+            self.assertEqual(wechat_pubaccount_fetcher.fetch_articles_from_rss(), [])
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+
+    def test_validators_not_saved_when_api_sync_fails(self):
+        wechat_pubaccount_fetcher._load_api_article_index.return_value = ({}, None, False)
+        first = _rss_response(RSS_FEED, headers={'ETag': '"v1"'})
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=first):
+            self.assertEqual(len(wechat_pubaccount_fetcher.fetch_articles_from_rss()), 2)
+
+        # 接口恢复后，同一份 Feed 不应被当作未变化而跳过
+        wechat_pubaccount_fetcher._load_api_article_index.return_value = ({}, None, True)
+        with mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(RSS_FEED)) as get:
+            self.assertEqual(len(wechat_pubaccount_fetcher.fetch_articles_from_rss()), 2)
+        self.assertEqual(get.call_args.kwargs['headers'], {})
+
+    def test_offset_pub_date_compared_in_local_time(self):
+        # 游标为本地无时区时间；带 +0800 的 pubDate 须换算为本地时间再比较
+        original_tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Asia/Shanghai'
+        time.tzset()
+        try:
+            feed = (
+                '<rss><channel><item><title>新</title><link>https://mp.weixin.qq.com/s/x</link>'
+                '<pubDate>Mon, 19 Oct 2026 17:00:00 +0800</pubDate></item></channel></rss>'
+            ).encode('utf-8')
+            stream = wechat_pubaccount_fetcher._HashingStream(iter([feed]))
+            new_items, skipped, stopped = wechat_pubaccount_fetcher._stream_rss_items(
+                stream, datetime(2026, 10, 19, 16, 0), set()
+            )
+        finally:
+            if original_tz is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = original_tz
+            time.tzset()
+        self.assertEqual((len(new_items), skipped, stopped), (1, 0, False))
+
+    def test_cursor_stops_streaming_at_old_items(self):
+        old_items = ''.join(
+            f"<item><title>旧{i}</title><link>https://mp.weixin.qq.com/s/old{i}</link><category>南大学工</category>"
+            f"<pubDate>0{i} Sep 2026 08:00:00 +0800</pubDate><description>旧正文</description></item>"
+            for i in range(5, 0, -1)
+        )
+        feed = RSS_FEED.replace(b'</channel>', old_items.encode('utf-8') + b'</channel>')
+        since = datetime(2026, 10, 10)
+        with mock.patch.object(wechat_pubaccount_fetcher, 'WECHAT_FEED_CONDITIONAL_GET', False), \
+                mock.patch.object(wechat_pubaccount_fetcher, 'WECHAT_FEED_EARLY_STOP_AFTER', 2), \
+                mock.patch.object(wechat_pubaccount_fetcher.requests, 'get', return_value=_rss_response(feed)):
+            articles = wechat_pubaccount_fetcher.fetch_articles_from_rss(since=since)
+        self.assertEqual([item['title'] for item in articles], ['新文章'])
+
+        stream = wechat_pubaccount_fetcher._HashingStream(iter([feed]))
+        seen = set()
+        with mock.patch.object(wechat_pubaccount_fetcher, 'WECHAT_FEED_EARLY_STOP_AFTER', 2):
+            new_items, skipped, stopped = wechat_pubaccount_fetcher._stream_rss_items(stream, since, seen)
+        self.assertEqual((len(new_items), skipped, stopped), (1, 2, True))
+        self.assertIn('https://mp.weixin.qq.com/s/old', seen)
+
+
+class _FakeWeMPRSSClient(we_mp_rss_api.WeMPRSSClient):
+    """按页返回内存中的文章列表，记录请求过的页码。"""
+
+    def __init__(self, articles, with_total=False, delays=None):
+        self.articles = articles
+        self.with_total = with_total
+        self.delays = delays or {}
+        self.pages = []
+
+    def _ensure_token(self):
+        return 'token'
+
+    def list_articles(self, *, mp_name=None, page=1, page_size=20):
+        self.pages.append(page)
+        time.sleep(self.delays.get(page, 0))
+        data = {'list': self.articles[(page - 1) * page_size:page * page_size]}
+        if self.with_total:
+            data['total'] = len(self.articles)
+        return data
+
+    def fetch_article_content(self, article_id, timeout=None):
+        time.sleep(0.05)
+        if article_id == 13:
+            raise we_mp_rss_api.APIError('not found')
+        return {'id': article_id, 'content': f"正文{article_id}", 'timeout': timeout}
+
+
+def _api_article(number):
+    return {
+        'id': number,
+        'title': f"文章{number}",
+        'link': f"https://mp.weixin.qq.com/s/a{number}",
+        'mp_name': '南大学工',
+        'publish_time': 1790000000 + number * 3600,
+    }
+
+
+class TestWeChatAPIIndex(unittest.TestCase):
+    def test_incremental_sync_stops_at_known_page(self):
+        articles = [_api_article(n) for n in range(50, 0, -1)]
+        clock = [1000.0]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.json')
+            load = lambda: APIArticleIndex.load(path, full_sync_hours=24, clock=lambda: clock[0])
+
+            def sync(client):
+                with mock.patch.object(wechat_pubaccount_fetcher, 'WeMPRSSClient', return_value=client), \
+                        mock.patch.object(wechat_pubaccount_fetcher, 'APIArticleIndex', mock.Mock(load=load)), \
+                        mock.patch.object(wechat_pubaccount_fetcher, 'WECHAT_API_PAGE_SIZE', 10), \
+                        mock.patch.object(wechat_pubaccount_fetcher, 'WECHAT_API_MAX_PAGES', 0):
+                    return wechat_pubaccount_fetcher._load_api_article_index()
+
+            client = _FakeWeMPRSSClient(articles)
+            index, _, _ = sync(client)
+            self.assertEqual(len(index), 50)
+            self.assertEqual(client.pages, [1, 2, 3, 4, 5, 6])
+
+            # 两篇新文章排在最前：第一页有未知文章，第二页全部已知即停止
+            client = _FakeWeMPRSSClient([_api_article(52), _api_article(51)] + articles)
+            index, _, _ = sync(client)
+            self.assertEqual(len(index), 52)
+            self.assertEqual(client.pages, [1, 2])
+            self.assertEqual(load().high_water['id'], '52')
+
+            # 超过全量间隔后翻完全部页面，并剔除上游已删除的文章
+            clock[0] += 25 * 3600
+            client = _FakeWeMPRSSClient(articles[:30])
+            index, _, _ = sync(client)
+            self.assertEqual(len(index), 30)
+            self.assertEqual(client.pages, [1, 2, 3, 4])
+
+    def test_parallel_pages_are_yielded_in_order(self):
+        # 第 2 页最慢：并发请求仍按页序产出，重复文章跨页去重
+        articles = [_api_article(n) for n in range(45, 0, -1)] + [_api_article(1)]
+        client = _FakeWeMPRSSClient(articles, with_total=True, delays={2: 0.05})
+        pages = list(client.iter_pages(page_size=10, concurrency=4))
+        self.assertEqual(sorted(client.pages), [1, 2, 3, 4, 5])
+        self.assertEqual([len(page) for page in pages], [10, 10, 10, 10, 5])
+        ids = [item['id'] for page in pages for item in page]
+        self.assertEqual(ids, list(range(45, 0, -1)))
+
+        sequential = _FakeWeMPRSSClient(articles, with_total=True)
+        self.assertEqual([item['id'] for item in sequential.iter_articles(page_size=10)], ids)
+
+    def test_article_details_fetched_concurrently_in_order(self):
+        client = _FakeWeMPRSSClient([])
+        article_ids = list(range(1, 41)) + [None]
+        with mock.patch.multiple(
+            wechat_pubaccount_fetcher, WECHAT_FETCH_CONCURRENCY=8, WECHAT_FETCH_QPS=0, WECHAT_FETCH_TIMEOUT=7
+        ):
+            started = time.perf_counter()
+            details = wechat_pubaccount_fetcher._fetch_article_details(client, article_ids)
+            elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 1.0)  # 串行需要 2 秒
+        self.assertEqual(details[0], {'id': 1, 'content': '正文1', 'timeout': 7})
+        self.assertEqual([detail['id'] for detail in details[:12]], list(range(1, 13)))
+        self.assertIsNone(details[12])  # 单篇失败回退为摘要
+        self.assertIsNone(details[-1])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
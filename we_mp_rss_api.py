@@ -24,17 +24,24 @@ run and reuse it for multiple requests.
 
 from __future__ import annotations
 
+import math
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Iterable, Iterator, Optional, TypedDict
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import (
     WECHAT_API_BASE_URL,
+    WECHAT_API_PAGE_CONCURRENCY,
     WECHAT_API_PASSWORD,
     WECHAT_API_USERNAME,
     WECHAT_API_VERIFY_SSL,
+    WECHAT_FETCH_CONCURRENCY,
 )
 
 
@@ -105,7 +112,12 @@ class WeMPRSSClient:
 
         self._verify_ssl = WECHAT_API_VERIFY_SSL if verify_ssl is None else verify_ssl
         self._token_bucket: Optional[TokenBucket] = None
+        self._token_lock = threading.Lock()
         self._session = requests.Session()
+        # 连接池与并发翻页/并发拉取正文的线程数一致，避免连接被反复丢弃重建
+        adapter = HTTPAdapter(pool_maxsize=max(10, WECHAT_FETCH_CONCURRENCY, WECHAT_API_PAGE_CONCURRENCY))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -116,11 +128,18 @@ class WeMPRSSClient:
         return f"{self._base_url}{segment}"
 
     def _ensure_token(self) -> str:
-        if self._token_bucket and self._token_bucket.is_valid():
+        # 并发翻页时多个线程共享同一 token，加锁保证只登录一次
+        with self._token_lock:
+            if self._token_bucket and self._token_bucket.is_valid():
+                return self._token_bucket.access_token
+
+            self._token_bucket = self._perform_login()
             return self._token_bucket.access_token
 
-        self._token_bucket = self._perform_login()
-        return self._token_bucket.access_token
+    def _invalidate_token(self, token: str) -> None:
+        with self._token_lock:
+            if self._token_bucket and self._token_bucket.access_token == token:
+                self._token_bucket = None
 
     def _perform_login(self) -> TokenBucket:
         token_endpoint = self._build_url("/api/v1/wx/auth/token")
@@ -194,6 +213,7 @@ class WeMPRSSClient:
         *,
         params: Optional[dict] = None,
         json_body: Optional[dict] = None,
+        timeout: float = 30,
     ) -> dict:
         token = self._ensure_token()
         response = self._session.request(
@@ -202,13 +222,13 @@ class WeMPRSSClient:
             params=params,
             json=json_body,
             headers={"Authorization": f"Bearer {token}"},
-            timeout=30,
+            timeout=timeout,
             verify=self._verify_ssl,
         )
 
         if response.status_code == 401:
-            # 尝试一次刷新 token
-            self._token_bucket = None
+            # 尝试一次刷新 token（其他线程可能已经刷新过）
+            self._invalidate_token(token)
             token = self._ensure_token()
             response = self._session.request(
                 method,
@@ -216,7 +236,7 @@ class WeMPRSSClient:
                 params=params,
                 json=json_body,
                 headers={"Authorization": f"Bearer {token}"},
-                timeout=30,
+                timeout=timeout,
                 verify=self._verify_ssl,
             )
 
@@ -267,13 +287,43 @@ class WeMPRSSClient:
 
         return self._request("GET", "/api/v1/wx/articles", params=params)
 
-    def iter_articles(
+    @staticmethod
+    def _unseen_items(items: list, seen_ids: set[str]) -> list[ArticleListItem]:
+        new_items: list[ArticleListItem] = []
+        for item in items:
+            unique_token = (
+                item.get("id")
+                or item.get("appmsgid")
+                or item.get("link")
+                or item.get("title")
+            )
+            token_str = str(unique_token) if unique_token is not None else None
+            if token_str and token_str in seen_ids:
+                continue
+            if token_str:
+                seen_ids.add(token_str)
+            new_items.append(item)
+        return new_items
+
+    def iter_pages(
         self,
         *,
         mp_name: Optional[str] = None,
         page_size: int = 20,
         max_pages: Optional[int] = None,
-    ) -> Iterator[ArticleListItem]:
+        concurrency: int = 1,
+    ) -> Iterator[list[ArticleListItem]]:
+        """Yield each page's not-yet-seen items; callers may stop between pages.
+
+        With ``concurrency > 1`` the first page's ``total`` determines the page
+        count and the remaining pages are fetched by a bounded thread pool while
+        still being yielded in page order (see :meth:`_iter_pages_parallel`).
+        """
+
+        if concurrency > 1:
+            yield from self._iter_pages_parallel(mp_name, page_size, max_pages, concurrency)
+            return
+
         page = 1
         seen_ids: set[str] = set()
 
@@ -283,31 +333,86 @@ class WeMPRSSClient:
             if not items:
                 break
 
-            new_items = 0
-            for item in items:
-                unique_token = (
-                    item.get("id")
-                    or item.get("appmsgid")
-                    or item.get("link")
-                    or item.get("title")
-                )
-                token_str = str(unique_token) if unique_token is not None else None
-                if token_str and token_str in seen_ids:
-                    continue
-                if token_str:
-                    seen_ids.add(token_str)
-                new_items += 1
-                yield item  # type: ignore[misc]
+            new_items = self._unseen_items(items, seen_ids)
+            yield new_items
 
             if max_pages is not None and page >= max_pages:
                 break
-            if new_items == 0 or len(items) < page_size:
+            if not new_items or len(items) < page_size:
                 break
 
             page += 1
 
-    def fetch_article_content(self, article_id: int) -> ArticleDetail:
-        return self._request("GET", f"/api/v1/wx/articles/{article_id}")
+    def _iter_pages_parallel(
+        self,
+        mp_name: Optional[str],
+        page_size: int,
+        max_pages: Optional[int],
+        concurrency: int,
+    ) -> Iterator[list[ArticleListItem]]:
+        seen_ids: set[str] = set()
+        first = self.list_articles(mp_name=mp_name, page=1, page_size=page_size)
+        items = first.get("list") or []
+        if not items:
+            return
+        yield self._unseen_items(items, seen_ids)
+
+        total = first.get("total") or first.get("count") or first.get("totalCount")
+        try:
+            total_pages = math.ceil(int(total) / page_size)
+        except (TypeError, ValueError):
+            total_pages = None
+        if total_pages is None:
+            # 上游未返回 total 时无法预知页数，从第 2 页起退回逐页请求
+            page = 1
+            while len(items) >= page_size and (max_pages is None or page < max_pages):
+                page += 1
+                items = self.list_articles(mp_name=mp_name, page=page, page_size=page_size).get("list") or []
+                new_items = self._unseen_items(items, seen_ids)
+                if not new_items:
+                    break
+                yield new_items
+            return
+        if max_pages is not None:
+            total_pages = min(total_pages, max_pages)
+        if len(items) < page_size or total_pages <= 1:
+            return
+
+        # 确保并发请求前 token 已就绪，避免多个线程同时登录
+        self._ensure_token()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        pending: deque = deque()
+        next_page = 2
+        try:
+            while next_page <= total_pages or pending:
+                # 滑动窗口：在途请求数不超过 concurrency，按页序取回结果
+                while next_page <= total_pages and len(pending) < concurrency:
+                    pending.append(executor.submit(
+                        self.list_articles, mp_name=mp_name, page=next_page, page_size=page_size
+                    ))
+                    next_page += 1
+                page_items = pending.popleft().result().get("list") or []
+                if not page_items:
+                    break
+                yield self._unseen_items(page_items, seen_ids)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_articles(
+        self,
+        *,
+        mp_name: Optional[str] = None,
+        page_size: int = 20,
+        max_pages: Optional[int] = None,
+        concurrency: int = 1,
+    ) -> Iterator[ArticleListItem]:
+        for items in self.iter_pages(
+            mp_name=mp_name, page_size=page_size, max_pages=max_pages, concurrency=concurrency
+        ):
+            yield from items
+
+    def fetch_article_content(self, article_id: int, timeout: Optional[float] = None) -> ArticleDetail:
+        return self._request("GET", f"/api/v1/wx/articles/{article_id}", timeout=timeout or 30)
 
 
 def fetch_article_content(article_id: int) -> ArticleDetail:
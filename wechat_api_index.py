@@ -0,0 +1,131 @@
+# wechat_api_index.py
+"""We-MP-RSS 文章列表的持久化索引。
+
+旧实现每次运行都用 ``iter_articles`` 翻完 We-MP-RSS 的全部文章列表（WECHAT_API_MAX_PAGES
+默认 0 即不限），归档数千篇时需要几十次往返才能找到寥寥几篇新文章。
+
+本索引按规范化链接保存列表元数据，并记录高水位（已见文章中最新的 publish_time 及其 id）：
+
+- 增量同步：从第一页（最新）开始翻页，某一页的文章全部已在索引中、或都不晚于高水位时停止；
+- 全量同步：距上次全量超过 WECHAT_API_FULL_SYNC_HOURS 小时（或索引为空）时翻完全部页面，
+  并用结果替换索引，剔除上游已删除的文章、修正被改动的元数据。
+
+数据以 JSON 落盘::
+
+    {
+        "entries": {"<normalized_link>": {"id": ..., "title": ..., "publish_time": ..., ...}},
+        "high_water": {"publish_time": "2026-10-19T08:00:00", "id": "123"},
+        "last_full_sync": 1700000000.0
+    }
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from config import WECHAT_API_FULL_SYNC_HOURS, WECHAT_API_INDEX_FILE
+
+
+class APIArticleIndex:
+    """规范化链接 -> We-MP-RSS 列表元数据，附带高水位与上次全量同步时间。"""
+
+    def __init__(
+        self,
+        entries: Optional[Dict[str, dict]] = None,
+        high_water: Optional[dict] = None,
+        last_full_sync: float = 0.0,
+        path: str = WECHAT_API_INDEX_FILE,
+        full_sync_hours: float = WECHAT_API_FULL_SYNC_HOURS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.entries: Dict[str, dict] = dict(entries or {})
+        self.high_water: dict = dict(high_water or {})
+        self.last_full_sync = last_full_sync
+        self.path = path
+        self.full_sync_hours = full_sync_hours
+        self._clock = clock
+
+    @classmethod
+    def load(cls, path: str = WECHAT_API_INDEX_FILE, **kwargs) -> 'APIArticleIndex':
+        file_path = Path(path)
+        if not file_path.exists():
+            return cls(path=path, **kwargs)
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析 API 文章索引 {path}，将全量重建。")
+            return cls(path=path, **kwargs)
+        if not isinstance(data, dict):
+            return cls(path=path, **kwargs)
+
+        entries = data.get('entries')
+        high_water = data.get('high_water')
+        last_full_sync = data.get('last_full_sync')
+        return cls(
+            entries=entries if isinstance(entries, dict) else {},
+            high_water=high_water if isinstance(high_water, dict) else {},
+            last_full_sync=float(last_full_sync) if isinstance(last_full_sync, (int, float)) else 0.0,
+            path=path,
+            **kwargs,
+        )
+
+    def save(self) -> None:
+        payload = {
+            'entries': self.entries,
+            'high_water': self.high_water,
+            'last_full_sync': self.last_full_sync,
+        }
+        with Path(self.path).open('w', encoding='utf-8') as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+
+    def needs_full_sync(self) -> bool:
+        """索引为空或距上次全量同步超过间隔（间隔不大于 0 表示每次都全量）时返回 True。"""
+
+        if not self.entries or self.full_sync_hours <= 0:
+            return True
+        return self._clock() - self.last_full_sync >= self.full_sync_hours * 3600
+
+    def is_known(self, link: str, entry: dict) -> bool:
+        """链接已在索引中，或发布时间不晚于高水位（ISO 字符串可直接比较）。"""
+
+        if link in self.entries:
+            return True
+        mark = self.high_water.get('publish_time')
+        published = entry.get('publish_time')
+        return bool(mark and isinstance(published, str) and published < mark)
+
+    def merge(self, page: Iterable[tuple]) -> int:
+        """合并一页 (规范化链接, 元数据)，返回其中未知文章的数量。"""
+
+        unknown = 0
+        for link, entry in page:
+            if not self.is_known(link, entry):
+                unknown += 1
+            self.entries[link] = entry
+            self._raise_high_water(entry)
+        return unknown
+
+    def replace(self, entries: Dict[str, dict]) -> None:
+        """全量同步完成：以本次结果替换索引并重算高水位。"""
+
+        self.entries = dict(entries)
+        self.high_water = {}
+        for entry in self.entries.values():
+            self._raise_high_water(entry)
+        self.last_full_sync = self._clock()
+
+    def _raise_high_water(self, entry: dict) -> None:
+        published = entry.get('publish_time')
+        if not isinstance(published, str) or not published:
+            return
+        if published > (self.high_water.get('publish_time') or ''):
+            self.high_water = {'publish_time': published, 'id': str(entry.get('id'))}
+
+
+__all__ = ['APIArticleIndex']
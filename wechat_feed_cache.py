@@ -0,0 +1,87 @@
+# wechat_feed_cache.py
+"""微信 RSS Feed 的 HTTP 条件请求校验值。
+
+fetch_articles_from_rss 每次运行都完整下载 WECHAT_RSS_URL（We-MP-RSS 把全文 HTML 放在
+description 中，常达数 MB），再逐条解析、查 SQLite、拉 API 索引、抓取公众号名，
+即使 Feed 与上次完全相同。
+
+本模块持久化上次响应的 ``ETag``/``Last-Modified`` 与正文哈希：
+
+- 下次请求带上 ``If-None-Match``/``If-Modified-Since``，服务端返回 304 时直接结束；
+- 服务端不支持条件请求（总是 200）时，正文哈希与上次相同同样视为未变化。
+
+两种情况下抓取器都跳过 SQLite 映射、API 索引与抓取，返回空列表（304 时连下载与解析也省去）。
+正文哈希在流式解析时边读边算，解析因游标提前停止时不记录哈希。校验值只在一次完整抓取成功后写入，
+Feed 地址变化时旧校验值自动作废。数据以 JSON 落盘::
+
+    {
+        "url": "http://localhost:8001/feed/all.rss",
+        "etag": "\\"5f1c...\\"",
+        "last_modified": "Mon, 19 Oct 2026 08:00:00 GMT",
+        "content_hash": "<sha256>",
+        "updated_at": "2026-10-19T16:00:00"
+    }
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Mapping, Optional
+
+from config import WECHAT_FEED_STATE_FILE
+
+
+@dataclass
+class FeedValidators:
+    url: str = ''
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    @classmethod
+    def load(cls, path: str = WECHAT_FEED_STATE_FILE) -> 'FeedValidators':
+        file_path = Path(path)
+        if not file_path.exists():
+            return cls()
+        try:
+            with file_path.open('r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except json.JSONDecodeError:
+            print(f"警告: 无法解析 Feed 校验值文件 {path}，将重新完整拉取。")
+            return cls()
+        if not isinstance(data, dict):
+            return cls()
+        return cls(**{field: data.get(field) for field in cls.__dataclass_fields__ if isinstance(data.get(field), str)})
+
+    def save(self, path: str = WECHAT_FEED_STATE_FILE) -> None:
+        with Path(path).open('w', encoding='utf-8') as handle:
+            json.dump(asdict(self), handle, ensure_ascii=False, indent=2)
+
+    def request_headers(self, url: str) -> dict:
+        """生成条件请求头；地址与上次不同时不带校验值。"""
+
+        if url != self.url:
+            return {}
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def unchanged(self, url: str, content_hash: str) -> bool:
+        return bool(self.content_hash) and url == self.url and content_hash == self.content_hash
+
+    def update(self, url: str, headers: Mapping[str, str], content_hash: Optional[str]) -> None:
+        self.url = url
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+        self.content_hash = content_hash
+        self.updated_at = datetime.now().isoformat()
+
+
+__all__ = ['FeedValidators']
@@ -1,12 +1,17 @@
+import hashlib
 import json
 import re
 import sqlite3
+import threading
+import time
 import xml.etree.ElementTree as ET
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import closing
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 from functools import lru_cache
-from typing import Iterable, Optional, Set, Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
@@ -15,12 +20,20 @@ from config import (
     WECHAT_API_BASE_URL,
     WECHAT_API_INCLUDE_CONTENT_FOR_NEW,
     WECHAT_API_MAX_PAGES,
+    WECHAT_API_PAGE_CONCURRENCY,
     WECHAT_API_PAGE_SIZE,
+    WECHAT_FEED_CONDITIONAL_GET,
+    WECHAT_FEED_EARLY_STOP_AFTER,
+    WECHAT_FETCH_CONCURRENCY,
+    WECHAT_FETCH_QPS,
+    WECHAT_FETCH_TIMEOUT,
     WECHAT_FORCE_REFRESH,
     WECHAT_RSS_URL,
 )
 from we_mp_rss_api import APIError, AuthError, WeMPRSSClient
 from we_mp_rss_sync import locate_we_rss_root
+from wechat_api_index import APIArticleIndex
+from wechat_feed_cache import FeedValidators
 
 # --- 新的配置区域 ---
 # 移除硬编码的 RSS_URL
@@ -28,6 +41,8 @@ from we_mp_rss_sync import locate_we_rss_root
 
 _refresh_attempted = False
 
+_STREAM_CHUNK_SIZE = 64 * 1024
+
 _GENERIC_WECHAT_LABELS = {
     'wechat', '微信公众号', 'weixin', 'wx', 'mp', '公众号', 'official account'
 }
@@ -176,42 +191,139 @@ def _load_article_source_map() -> dict[str, str]:
     return mapping
 
 
-def _load_api_article_index() -> Tuple[dict[str, dict], Optional[WeMPRSSClient]]:
+def _api_index_entry(item: dict) -> Tuple[Optional[str], dict]:
+    link = item.get('link') or item.get('source_url') or item.get('url')
+    normalized = _normalize_wechat_url(link)
+    return normalized, {
+        'id': item.get('id'),
+        'title': item.get('title'),
+        'link': link or normalized,
+        'author': item.get('author') or item.get('mp_name') or item.get('account'),
+        'mp_name': item.get('mp_name') or item.get('mpNickname') or item.get('account'),
+        'publish_time': _normalize_publish_time(item.get('publish_time')),
+        'digest': item.get('digest'),
+    }
+
+
+def _load_api_article_index() -> Tuple[dict[str, dict], Optional[WeMPRSSClient], bool]:
+    """同步持久化的 We-MP-RSS 文章索引（见 wechat_api_index），返回 (规范化链接 -> 元数据, 客户端, 是否可信)。
+
+    平时只翻到第一页全部为已知文章为止；距上次全量超过 WECHAT_API_FULL_SYNC_HOURS 时翻完全部页面。
+    未配置接口凭据时视为未启用，结果仍可信；列表请求失败时为 False，本轮结果不完整。
+    """
+
     try:
         client = WeMPRSSClient()
     except AuthError as exc:
         print(f"警告: 无法登录 We-MP-RSS API，跳过接口增强。原因: {exc}")
-        return {}, None
+        return {}, None, True
 
-    enriched: dict[str, dict] = {}
+    index = APIArticleIndex.load()
+    full_sync = index.needs_full_sync()
     page_size = max(1, WECHAT_API_PAGE_SIZE)
     max_pages = WECHAT_API_MAX_PAGES if WECHAT_API_MAX_PAGES > 0 else None
+    fetched: dict[str, dict] = {}
+    pages = 0
+    unknown = 0
 
     try:
-        for item in client.iter_articles(page_size=page_size, max_pages=max_pages):
-            link = item.get('link') or item.get('source_url') or item.get('url')
-            normalized = _normalize_wechat_url(link)
-            if not normalized:
+        # 只有全量同步会翻完全部页面，此时并发请求；增量同步通常一两页即停止，保持逐页
+        concurrency = WECHAT_API_PAGE_CONCURRENCY if full_sync else 1
+        for items in client.iter_pages(page_size=page_size, max_pages=max_pages, concurrency=concurrency):
+            pages += 1
+            page = [
+                (normalized, entry)
+                for normalized, entry in map(_api_index_entry, items)
+                if normalized
+            ]
+            if full_sync:
+                fetched.update(page)
                 continue
-
-            enriched[normalized] = {
-                'id': item.get('id'),
-                'title': item.get('title'),
-                'link': link or normalized,
-                'author': item.get('author') or item.get('mp_name') or item.get('account'),
-                'mp_name': item.get('mp_name') or item.get('mpNickname') or item.get('account'),
-                'publish_time': _normalize_publish_time(item.get('publish_time')),
-                'digest': item.get('digest'),
-            }
+            page_unknown = index.merge(page)
+            unknown += page_unknown
+            if page_unknown == 0:
+                break
 
     except (APIError, AuthError, requests.RequestException) as exc:
         print(f"警告: 调用 We-MP-RSS API 列表失败，跳过接口增强。原因: {exc}")
-        return {}, None
+        return {}, None, False
+
+    if full_sync:
+        unknown = sum(1 for link in fetched if link not in index.entries)
+        index.replace(fetched)
+    index.save()
+    print(
+        f" [API] 文章索引{'全量' if full_sync else '增量'}同步: 请求 {pages} 页，"
+        f"新增 {unknown} 篇，索引共 {len(index.entries)} 篇。"
+    )
+
+    if not index.entries:
+        return {}, None, True
+
+    return dict(index.entries), client, True
+
+
+def _numeric_article_id(article_id) -> Optional[int]:
+    if isinstance(article_id, bool):
+        return None
+    if isinstance(article_id, (int, float)):
+        return int(article_id)
+    if isinstance(article_id, str):
+        try:
+            return int(article_id.strip())
+        except ValueError:
+            return None
+    return None
+
+
+class _QPSThrottle:
+    """按固定间隔放行请求的线程安全节流器，qps 不大于 0 表示不限速。"""
 
-    if not enriched:
-        return {}, None
+    def __init__(self, qps: float) -> None:
+        self._interval = 1.0 / qps if qps > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
 
-    return enriched, client
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _fetch_article_details(client: WeMPRSSClient, article_ids: list[Optional[int]]) -> list[Optional[dict]]:
+    """并发拉取文章正文，结果与 article_ids 一一对应（None 表示跳过或失败）。
+
+    并发数为 WECHAT_FETCH_CONCURRENCY，发起速率不超过 WECHAT_FETCH_QPS，
+    单个请求超时 WECHAT_FETCH_TIMEOUT 秒；单篇失败只回退为摘要，不影响其他文章。
+    """
+
+    results: list[Optional[dict]] = [None] * len(article_ids)
+    targets = [(index, article_id) for index, article_id in enumerate(article_ids) if article_id is not None]
+    if not targets:
+        return results
+
+    throttle = _QPSThrottle(WECHAT_FETCH_QPS)
+
+    def _fetch(article_id: int) -> dict:
+        throttle.wait()
+        return client.fetch_article_content(article_id, timeout=WECHAT_FETCH_TIMEOUT)
+
+    workers = max(1, min(WECHAT_FETCH_CONCURRENCY, len(targets)))
+    print(f" [API] 并发拉取 {len(targets)} 篇接口文章正文（并发 {workers}，限速 {WECHAT_FETCH_QPS or '不限'} QPS）...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_fetch, article_id): index for index, article_id in targets}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except (APIError, AuthError, requests.RequestException) as exc:
+                print(f"警告: 获取文章 {article_ids[index]} 正文失败，使用摘要代替。原因: {exc}")
+    return results
 
 
 def _extract_first_text_by_names(element: ET.Element, candidate_names: Iterable[str]) -> Optional[str]:
@@ -275,84 +387,248 @@ def _trigger_we_rss_refresh_once() -> None:
         print('警告: We-MP-RSS 主动刷新失败，将继续使用现有 RSS 数据。')
 
 
-def fetch_articles_from_rss() -> list[dict]:
-    """抓取 RSS 数据并用 We-MP-RSS API 进行补全。"""
+class _HashingStream:
+    """把 requests 的分块响应包装成 iterparse 可读的文件对象，同时累计正文哈希。"""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = b''
+        self._hasher = hashlib.sha256()
+        self.exhausted = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.exhausted and (size < 0 or len(self._buffer) < size):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            self._hasher.update(chunk)
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def hexdigest(self) -> Optional[str]:
+        """正文完整读完时返回 sha256，提前停止解析时返回 None。"""
+
+        return self._hasher.hexdigest() if self.exhausted else None
+
+
+def _local_name(tag) -> str:
+    return tag.split('}')[-1].lower() if isinstance(tag, str) else ''
+
+
+def _parse_publish_datetime(value: Optional[str]) -> Optional[datetime]:
+    """解析 ISO 时间、时间戳或 RFC 822（RSS pubDate）时间。
+
+    带时区的时间转为本地时间再去掉时区，与游标的约定一致：游标来自 API 的 publish_time，
+    经 ``datetime.fromtimestamp`` 得到的是本地无时区时间。
+    """
+
+    if not value:
+        return None
+    text = value.strip()
+    parsed: Optional[datetime] = None
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = datetime.fromtimestamp(float(text))
+        except (OverflowError, ValueError):
+            try:
+                parsed = parsedate_to_datetime(text)
+            except (TypeError, ValueError, IndexError):
+                return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _parse_rss_item(item: ET.Element) -> dict:
+    """提取单个 <item> 的基础字段（不访问网络、不查数据库）。"""
+
+    title_element = item.find('title')
+    link_element = item.find('link')
+    guid_element = item.find('guid')
+    pubdate_element = item.find('pubDate')
+    content_element = item.find('description')  # we-mp-rss 将全文放在 description 中
+    author_element = item.find('author')
+
+    author: Optional[str] = None
+    if author_element is not None and author_element.text:
+        author = author_element.text.strip()
+    if not author:
+        author = item.findtext('{http://purl.org/dc/elements/1.1/}creator')
+        if author:
+            author = author.strip()
+
+    mp_name = _extract_first_text_by_names(
+        item,
+        (
+            'mpname', 'mp_name', 'mp-nickname', 'mpnickname', 'nickname',
+            'account', 'account_name', 'accountname', 'wechatname',
+            'wechat_name', 'wechatid', 'source', 'publisher', 'origin'
+        )
+    )
+
+    if not mp_name:
+        categories = _collect_category_labels(item)
+        if categories:
+            mp_name = categories[0]
+
+    if not author and mp_name:
+        author = mp_name
+
+    raw_link = link_element.text.strip() if link_element is not None and link_element.text else None
+    raw_guid = guid_element.text.strip() if guid_element is not None and guid_element.text else None
+
+    unique_candidates: list[str] = []
+    for candidate in (raw_link, raw_guid):
+        normalized_candidate = _normalize_wechat_url(candidate)
+        if normalized_candidate and normalized_candidate not in unique_candidates:
+            unique_candidates.append(normalized_candidate)
+
+    return {
+        'title': title_element.text if title_element is not None else 'No Title',
+        'raw_link': raw_link,
+        'raw_guid': raw_guid,
+        'candidates': unique_candidates,
+        'pub_date': _normalize_publish_time(pubdate_element.text if pubdate_element is not None else None),
+        'content': content_element.text if content_element is not None else 'No Content',
+        'content_format': 'Markdown' if content_element is not None else 'Text',
+        'author': author,
+        'mp_name': mp_name,
+    }
+
+
+def _stream_rss_items(
+    stream: _HashingStream,
+    since: Optional[datetime],
+    seen_links: Set[str],
+) -> Tuple[list[dict], int, bool]:
+    """增量解析 Feed，只保留晚于 since 的条目，返回 (新条目, 跳过的旧条目数, 是否提前停止)。
+
+    每个 <item> 处理完即从父节点移除，内存只随新条目增长。Feed 按发布时间倒序时，
+    连续 WECHAT_FEED_EARLY_STOP_AFTER 条不晚于 since 即停止读取；一旦发现时间乱序则读完整个 Feed。
+    """
+
+    new_items: list[dict] = []
+    skipped = 0
+    old_streak = 0
+    ordered = True
+    previous: Optional[datetime] = None
+    saw_channel = False
+    parents: list[ET.Element] = []
+
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        name = _local_name(element.tag)
+        if event == 'start':
+            saw_channel = saw_channel or name == 'channel'
+            parents.append(element)
+            continue
+        parents.pop()
+        if name != 'item' or not parents or _local_name(parents[-1].tag) != 'channel':
+            continue
+
+        raw = _parse_rss_item(element)
+        parents[-1].remove(element)
+        seen_links.update(raw['candidates'])
+
+        published = _parse_publish_datetime(raw['pub_date'])
+        if published is not None:
+            if previous is not None and published > previous:
+                ordered = False
+            previous = published
+        if since is not None and published is not None and published <= since:
+            skipped += 1
+            old_streak += 1
+            if ordered and 0 < WECHAT_FEED_EARLY_STOP_AFTER <= old_streak:
+                return new_items, skipped, True
+            continue
+        old_streak = 0
+        new_items.append(raw)
+
+    if not saw_channel:
+        print("警告: XML 结构异常，未找到 <channel> 标签。")
+    return new_items, skipped, False
+
+
+def fetch_articles_from_rss(
+    since: Optional[datetime] = None,
+    deferred_saves: Optional[List[Callable[[], None]]] = None,
+) -> list[dict]:
+    """抓取 RSS 数据并用 We-MP-RSS API 进行补全。
+
+    启用 WECHAT_FEED_CONDITIONAL_GET 时带上次的 ETag/Last-Modified 发起条件请求，
+    Feed 未变化（304 或正文哈希相同）时返回空列表，跳过解析、SQLite 映射、API 索引与抓取。
+
+    since 为上次处理到的发布时间（main 的 fetch_state 游标）：Feed 以流式增量解析，
+    不晚于 since 的条目与接口补充文章直接丢弃，不做增强与抓取；Feed 按时间倒序时提前停止读取。
+
+    传入 deferred_saves 时，Feed 校验值的保存操作追加到该列表，由调用方在知识库写入成功后执行
+    （与发布时间游标一起提交）；否则立即保存。提前保存会让崩溃后的下一次运行因 304 跳过尚未摘要的文章。
+    """
 
     all_articles_data: list[dict] = []
-    source_lookup = _load_article_source_map()
-    api_index, api_client = _load_api_article_index()
     seen_links: Set[str] = set()
     api_enhanced = 0
     api_only_count = 0
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
 
     _trigger_we_rss_refresh_once()
 
     print(f"尝试从 RSS Feed 获取所有文章: {WECHAT_RSS_URL}")
+    validators = FeedValidators.load() if WECHAT_FEED_CONDITIONAL_GET else FeedValidators()
     try:
-        response = requests.get(WECHAT_RSS_URL, timeout=30)
-        response.raise_for_status()
-
-        root = ET.fromstring(response.content)
-        channel = root.find('channel')
-        if channel is None:
-            print("警告: XML 结构异常，未找到 <channel> 标签。")
+        response = requests.get(
+            WECHAT_RSS_URL,
+            headers=validators.request_headers(WECHAT_RSS_URL),
+            timeout=30,
+            stream=True,
+        )
+        with closing(response):
+            if response.status_code == 304:
+                print(" [RSS] Feed 未变化（304 Not Modified），跳过解析与接口增强。")
+                return []
+            response.raise_for_status()
+
+            stream = _HashingStream(response.iter_content(chunk_size=_STREAM_CHUNK_SIZE))
+            new_items, skipped, stopped_early = _stream_rss_items(stream, since, seen_links)
+            content_hash = stream.hexdigest()
+
+        if WECHAT_FEED_CONDITIONAL_GET and content_hash and validators.unchanged(WECHAT_RSS_URL, content_hash):
+            print(" [RSS] Feed 内容与上次相同，跳过接口增强。")
             return []
-
-        for item in channel.findall('item'):
-            title_element = item.find('title')
-            link_element = item.find('link')
-            guid_element = item.find('guid')
-            pubdate_element = item.find('pubDate')
-            content_element = item.find('description')  # we-mp-rss 将全文放在 description 中
-            author_element = item.find('author')
-
-            author: Optional[str] = None
-            if author_element is not None and author_element.text:
-                author = author_element.text.strip()
-            if not author:
-                author = item.findtext('{http://purl.org/dc/elements/1.1/}creator')
-                if author:
-                    author = author.strip()
-
-            mp_name = _extract_first_text_by_names(
-                item,
-                (
-                    'mpname', 'mp_name', 'mp-nickname', 'mpnickname', 'nickname',
-                    'account', 'account_name', 'accountname', 'wechatname',
-                    'wechat_name', 'wechatid', 'source', 'publisher', 'origin'
-                )
+        if since is not None:
+            print(
+                f" [RSS] 游标 {since.isoformat()} 之后 {len(new_items)} 篇，跳过 {skipped} 篇旧文章"
+                f"{'，已提前停止读取' if stopped_early else ''}。"
             )
 
-            if not mp_name:
-                categories = _collect_category_labels(item)
-                if categories:
-                    mp_name = categories[0]
-
-            if not author and mp_name:
-                author = mp_name
-
-            raw_link = link_element.text.strip() if link_element is not None and link_element.text else None
-            raw_guid = guid_element.text.strip() if guid_element is not None and guid_element.text else None
+        source_lookup = _load_article_source_map() if new_items else {}
+        api_index, api_client, api_synced = _load_api_article_index()
+
+        for raw in new_items:
+            title = raw['title']
+            content = raw['content']
+            content_format = raw['content_format']
+            author = raw['author']
+            mp_name = raw['mp_name']
+            raw_link = raw['raw_link']
+            raw_guid = raw['raw_guid']
             link_value = raw_link or raw_guid
-
-            unique_candidates: list[str] = []
-            for candidate in (raw_link, raw_guid):
-                normalized_candidate = _normalize_wechat_url(candidate)
-                if normalized_candidate and normalized_candidate not in unique_candidates:
-                    unique_candidates.append(normalized_candidate)
+            unique_candidates = raw['candidates']
 
             normalized_link = unique_candidates[0] if unique_candidates else None
             for normalized_candidate in unique_candidates:
-                seen_links.add(normalized_candidate)
                 if normalized_candidate in source_lookup and source_lookup[normalized_candidate].strip():
                     mp_name = source_lookup[normalized_candidate].strip()
                     break
 
-            title = title_element.text if title_element is not None else 'No Title'
-            content = content_element.text if content_element is not None else 'No Content'
-            content_format = 'Markdown' if content_element is not None else 'Text'
-
-            pub_date = _normalize_publish_time(pubdate_element.text if pubdate_element is not None else None)
+            pub_date = raw['pub_date']
             if not pub_date:
                 pub_date = datetime.now().isoformat()
 
@@ -437,12 +713,38 @@ def fetch_articles_from_rss() -> list[dict]:
                 'platform': '微信公众号'
             })
 
-        if api_index:
-            for normalized_link, meta in api_index.items():
+        api_pending: list[tuple[str, dict]] = []
+        for normalized_link, meta in api_index.items():
+            if normalized_link in seen_links:
+                continue
+            published = _parse_publish_datetime(meta.get('publish_time'))
+            if since is not None and published is not None and published <= since:
+                continue
+            api_pending.append((normalized_link, meta))
+
+        details: list[Optional[dict]] = [None] * len(api_pending)
+        if api_pending:
+            source_lookup = _load_article_source_map()
+        if WECHAT_API_INCLUDE_CONTENT_FOR_NEW and api_client and api_pending:
+            article_ids = []
+            for _, meta in api_pending:
+                article_id = meta.get('id')
+                article_numeric_id = _numeric_article_id(article_id)
+                if article_id and article_numeric_id is None:
+                    # 非数字 ID 表示这是新的复合标识，API 暂不支持获取正文
+                    # 记录日志以便后续分析
+                    print(
+                        "警告: We-MP-RSS 返回的文章 ID 非数字格式，跳过正文拉取: "
+                        f"{article_id}"
+                    )
+                article_ids.append(article_numeric_id)
+            details = _fetch_article_details(api_client, article_ids)
+
+        if api_pending:
+            for (normalized_link, meta), detail in zip(api_pending, details):
                 if normalized_link in seen_links:
                     continue
 
-                article_id = meta.get('id')
                 link = meta.get('link') or normalized_link or 'No Link'
                 if isinstance(link, str):
                     link = _ensure_absolute_link(link)
@@ -453,45 +755,20 @@ def fetch_articles_from_rss() -> list[dict]:
                 content = meta.get('digest') or ''
                 content_format = 'Text'
 
-                if WECHAT_API_INCLUDE_CONTENT_FOR_NEW and api_client and article_id:
-                    article_numeric_id = None
-                    if isinstance(article_id, (int, float)):
-                        article_numeric_id = int(article_id)
-                    elif isinstance(article_id, str):
-                        try:
-                            article_numeric_id = int(article_id.strip())
-                        except ValueError:
-                            article_numeric_id = None
-
-                    if article_numeric_id is not None:
-                        try:
-                            detail = api_client.fetch_article_content(article_numeric_id)
-                        except APIError as exc:
-                            print(f"警告: 获取文章 {article_id} 正文失败，使用摘要代替。原因: {exc}")
-                            detail = None
-                    else:
-                        detail = None
-                        # 非数字 ID 表示这是新的复合标识，API 暂不支持获取正文
-                        # 记录日志以便后续分析
-                        print(
-                            "警告: We-MP-RSS 返回的文章 ID 非数字格式，跳过正文拉取: "
-                            f"{article_id}"
-                        )
-
-                    if detail:
-                        content = detail.get('content') or content
-                        content_format = detail.get('content_format') or 'HTML'
-                        pub_detail = _normalize_publish_time(detail.get('publish_time'))
-                        if pub_detail:
-                            pub_date = pub_detail
-                        mp_name = (
-                            detail.get('mp_name')
-                            or detail.get('mp_nickname')
-                            or mp_name
-                        )
-                        author = detail.get('author') or author or mp_name
-                        link = detail.get('link') or link
-                        title = detail.get('title') or title
+                if detail:
+                    content = detail.get('content') or content
+                    content_format = detail.get('content_format') or 'HTML'
+                    pub_detail = _normalize_publish_time(detail.get('publish_time'))
+                    if pub_detail:
+                        pub_date = pub_detail
+                    mp_name = (
+                        detail.get('mp_name')
+                        or detail.get('mp_nickname')
+                        or mp_name
+                    )
+                    author = detail.get('author') or author or mp_name
+                    link = detail.get('link') or link
+                    title = detail.get('title') or title
 
                 if not content:
                     content = '暂无正文'
@@ -544,6 +821,14 @@ def fetch_articles_from_rss() -> list[dict]:
         if api_only_count:
             print(f" [API] 额外补充 {api_only_count} 篇仅在接口中返回的文章。")
 
+        # 接口同步失败时本轮缺少仅在接口中返回的文章，不记录校验值，下次 Feed 未变时仍完整处理
+        if WECHAT_FEED_CONDITIONAL_GET and api_synced:
+            validators.update(WECHAT_RSS_URL, response.headers, content_hash)
+            if deferred_saves is None:
+                validators.save()
+            else:
+                deferred_saves.append(validators.save)
+
     except requests.exceptions.RequestException as e:
         print(f"错误: 无法访问 RSS Feed - {e}")
         return []
@@ -1,17 +1,26 @@
 # yuque_summarizer.py (修正版)
 
-from simhash import Simhash
-from diff_utils import find_diff
 # --- 修正 1: 导入正确的语雀获取函数 ---
 from yuque_fetcher import fetch_yuque_data
+import concurrent.futures
+import hashlib
 import json
 import os
 import requests
-from datetime import datetime, timedelta
-from simhash_utils import generate_simhash, get_hamming_distance
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from requests.adapters import HTTPAdapter
+from simhash_utils import build_simhash
 # --- 修正 2: 导入统一配置中心的配置 ---
-from config import YUQUE_TOKEN, YUQUE_GROUP, YUQUE_BOOK, YUQUE_BASE_URL, SIMHASH_THRESHOLD
+from config import (
+    YUQUE_TOKEN, YUQUE_GROUP, YUQUE_BOOK, YUQUE_BASE_URL, SIMHASH_THRESHOLD,
+    YUQUE_FETCH_CONCURRENCY, YUQUE_FETCH_TIMEOUT, YUQUE_KEEP_BODIES,
+)
 
+YUQUE_HISTORY_FILE = 'yuque_history.jsonl'
+# 旧版历史文件：整库一个 JSON，且包含每篇文档的完整 body
+LEGACY_YUQUE_HISTORY_FILE = 'yuque_history.json'
+YUQUE_BODY_STORE_DIR = 'yuque_bodies'
 
 # ----------------------------------------------------------------------
 # 辅助函数：数据存储与加载
@@ -32,22 +41,175 @@ def load_data(filename):
 
 
 def save_data(filename, data):
-    """将数据保存到文件。"""
+    """将数据保存到文件，返回是否写入成功。"""
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
     except IOError as e:
         print(f"错误：无法将数据保存到文件{filename}:{e}")
+        return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# 辅助函数：增量历史与正文存储
+# ----------------------------------------------------------------------
+
+def _body_hash(body: str) -> str:
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def _parse_simhash(value) -> Optional[int]:
+    """历史文件中的 SimHash：旧版为整数，新版为十六进制字符串。"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return int(value, 16)
+        except ValueError:
+            return None
+    return None
+
+
+class BodyStore:
+    """按正文哈希寻址的文档正文存储，相同正文只落盘一次。"""
+
+    def __init__(self, root: str = YUQUE_BODY_STORE_DIR):
+        self.root = Path(root)
+
+    def _path(self, body_hash: str) -> Path:
+        return self.root / body_hash[:2] / f"{body_hash}.md"
+
+    def put(self, body: str) -> str:
+        body_hash = _body_hash(body)
+        path = self._path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(body, encoding='utf-8')
+        return body_hash
+
+    def get(self, body_hash: Optional[str]) -> Optional[str]:
+        if not body_hash:
+            return None
+        path = self._path(body_hash)
+        if not path.exists():
+            return None
+        return path.read_text(encoding='utf-8')
+
+    def prune(self, referenced: Iterable[str]) -> int:
+        """删除不再被任何历史记录引用的正文（文档修改后的旧版本），返回删除的文件数。"""
+        if not self.root.exists():
+            return 0
+        keep = set(referenced)
+        removed = 0
+        for path in self.root.glob('*/*.md'):
+            if path.stem not in keep:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+def _history_record(doc_meta: dict, simhash_value: Optional[int], body_hash: Optional[str]) -> dict:
+    """历史中只保留比对所需的字段：指纹、正文哈希与 updated_at。"""
+    return {
+        'id': str(doc_meta.get('id')),
+        'slug': doc_meta.get('slug'),
+        'title': doc_meta.get('title'),
+        'updated_at': doc_meta.get('updated_at'),
+        'simhash': format(simhash_value, 'x') if simhash_value is not None else None,
+        'body_hash': body_hash,
+    }
+
+
+def _migrate_legacy_history(legacy_file: str, body_store: Optional[BodyStore]) -> Dict[str, dict]:
+    legacy = load_data(legacy_file)
+    history: Dict[str, dict] = {}
+    for doc_id, info in legacy.items() if isinstance(legacy, dict) else []:
+        if not isinstance(info, dict):
+            continue
+        body = info.get('body')
+        body_hash = None
+        if isinstance(body, str) and body:
+            body_hash = body_store.put(body) if body_store else _body_hash(body)
+        history[str(doc_id)] = _history_record(info, _parse_simhash(info.get('simhash')), body_hash)
+    return history
+
+
+def load_history(data_file: str = YUQUE_HISTORY_FILE) -> Dict[str, dict]:
+    """回放追加式历史日志，同一文档以最后一条记录为准。"""
+    history: Dict[str, dict] = {}
+    if not os.path.exists(data_file):
+        return history
+
+    with open(data_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 进程中断可能留下半行，跳过即可
+                continue
+            doc_id = str(record.get('id'))
+            if record.get('deleted'):
+                history.pop(doc_id, None)
+            else:
+                history[doc_id] = record
+    return history
+
+
+def append_history(data_file: str, records: Iterable[dict]) -> int:
+    """只把本次变化的记录追加到历史日志末尾。"""
+    count = 0
+    with open(data_file, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def compact_history(data_file: str, history: Dict[str, dict], body_store: Optional[BodyStore] = None) -> None:
+    """把历史日志重写为每篇文档一行（原子替换）；传入 body_store 时同时清理无人引用的正文。"""
+    tmp_file = f"{data_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for record in history.values():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(tmp_file, data_file)
+    if body_store is not None:
+        removed = body_store.prune(record['body_hash'] for record in history.values() if record.get('body_hash'))
+        if removed:
+            print(f" [语雀] 已清理 {removed} 份不再引用的旧版正文。")
+
+
+def _history_line_count(data_file: str) -> int:
+    if not os.path.exists(data_file):
+        return 0
+    with open(data_file, 'rb') as f:
+        return sum(1 for _ in f)
 
 
 # ----------------------------------------------------------------------
 # 辅助函数：获取单个文档正文
 # ----------------------------------------------------------------------
 
-def get_doc_body(doc_id: str) -> str or None:
+def create_yuque_session(pool_size: int = YUQUE_FETCH_CONCURRENCY) -> requests.Session:
+    """创建复用连接池的语雀会话，连接数与并发数一致。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        "X-Auth-Token": YUQUE_TOKEN or '',
+        "Content-Type": "application/json"
+    })
+    return session
+
+
+def get_doc_body(doc_id: str, session: Optional[requests.Session] = None) -> str or None:
     """
     获取单个语雀文档的正文内容（Markdown格式）。
-    内部使用 config.py 中的全局配置。
+    内部使用 config.py 中的全局配置；传入 session 时复用其连接池。
     """
     # 使用 config.py 中的配置
     url = f"{YUQUE_BASE_URL}/repos/{YUQUE_GROUP}/{YUQUE_BOOK}/docs/{doc_id}?raw=true"
@@ -57,7 +219,10 @@ def get_doc_body(doc_id: str) -> str or None:
     }
 
     try:
-        response = requests.get(url, headers=headers)
+        if session is not None:
+            response = session.get(url, timeout=YUQUE_FETCH_TIMEOUT)
+        else:
+            response = requests.get(url, headers=headers, timeout=YUQUE_FETCH_TIMEOUT)
         response.raise_for_status()
         doc_data = response.json().get("data")
 
@@ -74,10 +239,18 @@ def get_doc_body(doc_id: str) -> str or None:
 # 核心功能：语雀文档增量更新与差异检测
 # ----------------------------------------------------------------------
 
-def check_yuque_updates(data_file='yuque_history.json', simhash_threshold=SIMHASH_THRESHOLD):
+def check_yuque_updates(
+    data_file=YUQUE_HISTORY_FILE,
+    simhash_threshold=SIMHASH_THRESHOLD,
+    max_workers=YUQUE_FETCH_CONCURRENCY,
+    legacy_file=LEGACY_YUQUE_HISTORY_FILE,
+):
     """
     检查语雀知识库的更新，过滤不显著的更改和同质化内容。
 
+    只对 updated_at 变化的文档并发拉取正文（共享连接池）；历史日志只保存
+    指纹、正文哈希与 updated_at，并以追加方式写入本次变化的记录。
+
     返回:
     list: 包含有显著变化或新增文档的列表 (仅包含文档元数据)。
     """
@@ -88,87 +261,104 @@ def check_yuque_updates(data_file='yuque_history.json', simhash_threshold=SIMHAS
         print("无法获取语雀数据，请检查配置或网络连接。")
         return []
 
-    # 2. 加载上次运行的历史数据
-    last_run_data = load_data(data_file)
-    new_run_data = {}  # 用于存储本次运行后的所有数据
+    # 2. 加载上次运行的历史数据（首次运行时迁移旧版整库 JSON）
+    body_store = BodyStore() if YUQUE_KEEP_BODIES else None
+    if not os.path.exists(data_file) and legacy_file and os.path.exists(legacy_file):
+        migrated = _migrate_legacy_history(legacy_file, body_store)
+        compact_history(data_file, migrated, body_store)
+        print(f" [语雀] 已将 {len(migrated)} 条旧版历史迁移至 {data_file}。")
+    last_run_data = load_history(data_file)
+
+    changed_records = []  # 本次需要追加到历史日志的记录
     updated_docs_meta = []  # 存储需要返回给主流程进行 AI 处理的文档元数据
 
+    # --------------------------------------------
+    # 步骤 A: 判断文档是否更新 (时间戳比对)
+    # --------------------------------------------
+    pending = []
+    current_ids = set()
     for doc_meta in yuque_metadata:
         doc_id_str = str(doc_meta.get('id'))
-
-        # 提取关键信息
-        updated_at = doc_meta.get('updated_at')
+        current_ids.add(doc_id_str)
+        updated_at = doc_meta.get('updated_at') or ''
         last_doc_info = last_run_data.get(doc_id_str)
 
-        # --------------------------------------------
-        # 步骤 A: 判断文档是否更新 (时间戳比对)
-        # --------------------------------------------
-        is_updated = False
         if not last_doc_info:
-            # 新增文档
-            is_updated = True
             print(f" [NEW] 新增文档: {doc_meta.get('title')}")
-        elif updated_at > last_doc_info.get('updated_at', '1970-01-01T00:00:00Z'):
-            # 已有文档，且时间戳发生变化
-            is_updated = True
+            pending.append(doc_meta)
+        elif updated_at > (last_doc_info.get('updated_at') or '1970-01-01T00:00:00Z'):
             print(f" [UPDATE] 文档已更新: {doc_meta.get('title')}")
-
-        # --------------------------------------------
-        # 步骤 B: 如果已更新，则进一步判断差异是否显著 (SimHash比对)
-        # --------------------------------------------
-        if is_updated:
-            document_body = get_doc_body(doc_id_str)
-            if not document_body:
-                # 无法获取正文，跳过本次处理
-                new_run_data[doc_id_str] = last_doc_info or doc_meta  # 至少保留元数据
-                continue
-
-            # 生成新文档的 SimHash
-            new_simhash_obj = generate_simhash(document_body)
-            new_doc_info = doc_meta.copy()
-
-            # 检查差异是否显著
-            is_significant = False
-
-            if not last_doc_info:
-                # 新文档：自动视为显著更新
-                is_significant = True
-            elif last_doc_info.get('simhash'):
-                # 非首次：比对 SimHash 汉明距离
-                old_simhash_value = last_doc_info['simhash']
-                old_simhash_obj = Simhash(int(old_simhash_value))
-
-                distance = get_hamming_distance(old_simhash_obj, new_simhash_obj)
-                print(f"   - SimHash 距离: {distance} (阈值: {simhash_threshold})")
-
-                if distance > simhash_threshold:
-                    # 距离大于阈值，判定为显著更新
+            pending.append(doc_meta)
+
+    for doc_id_str in set(last_run_data) - current_ids:
+        changed_records.append({'id': doc_id_str, 'deleted': True})
+
+    # --------------------------------------------
+    # 步骤 B: 并发拉取正文，并判断差异是否显著 (SimHash比对)
+    # --------------------------------------------
+    if pending:
+        print(f" [语雀] 并发拉取 {len(pending)} 篇变化文档的正文（并发 {max_workers}）...")
+        session = create_yuque_session(max_workers)
+        with session, concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            future_to_meta = {
+                executor.submit(get_doc_body, str(doc_meta.get('id')), session): doc_meta
+                for doc_meta in pending
+            }
+            for future in concurrent.futures.as_completed(future_to_meta):
+                doc_meta = future_to_meta[future]
+                document_body = future.result()
+                if not document_body:
+                    # 无法获取正文，保留旧记录，下次运行再试
+                    continue
+
+                last_doc_info = last_run_data.get(str(doc_meta.get('id')))
+                new_body_hash = _body_hash(document_body)
+                new_simhash_value = build_simhash(document_body).value
+                if body_store is not None:
+                    body_store.put(document_body)
+
+                # 检查差异是否显著
+                is_significant = False
+                old_simhash_value = _parse_simhash(last_doc_info.get('simhash')) if last_doc_info else None
+
+                if not last_doc_info:
+                    # 新文档：自动视为显著更新
+                    is_significant = True
+                elif last_doc_info.get('body_hash') == new_body_hash:
+                    print(f"   - {doc_meta.get('title')}: 正文未变化，仅元数据更新。")
+                elif old_simhash_value is not None:
+                    # 非首次：比对 SimHash 汉明距离
+                    distance = (old_simhash_value ^ new_simhash_value).bit_count()
+                    print(f"   - {doc_meta.get('title')}: SimHash 距离 {distance} (阈值: {simhash_threshold})")
+
+                    if distance > simhash_threshold:
+                        # 距离大于阈值，判定为显著更新
+                        is_significant = True
+                else:
+                    # 历史缺少指纹，无法比对，按显著更新处理
                     is_significant = True
 
-                    # 额外输出差异内容（可选，仅作调试/通知用）
-                    # old_doc_body = last_doc_info.get("body", "")
-                    # diff_content = find_diff(old_doc_body, document_body)
-                    # if diff_content:
-                    #     print("   - 行级差异内容已检出...")
-
-            if is_significant:
-                # 显著更新：加入待处理列表
-                updated_docs_meta.append(doc_meta)
-                print("   -> 判定为显著更新/新增，将提交给 LLM 重新处理。")
+                if is_significant:
+                    # 显著更新：加入待处理列表
+                    updated_docs_meta.append(doc_meta)
+                    print("   -> 判定为显著更新/新增，将提交给 LLM 重新处理。")
+                elif last_doc_info.get('body_hash') != new_body_hash:
+                    print("   -> SimHash 距离较近，判定为微小修改，过滤。")
+
+                # 无论是否显著，都需要更新历史中的指纹与正文哈希
+                changed_records.append(_history_record(doc_meta, new_simhash_value, new_body_hash))
+
+    # 3. 增量保存本次运行的数据：只追加变化的记录，日志膨胀后再整体压缩
+    if changed_records:
+        append_history(data_file, changed_records)
+        for record in changed_records:
+            if record.get('deleted'):
+                last_run_data.pop(record['id'], None)
             else:
-                print("   -> SimHash 距离较近，判定为微小修改，过滤。")
-
-            # 无论是否显著，都需要更新历史数据中的 'body' 和 'simhash'
-            new_run_data[doc_id_str] = new_doc_info
-            new_run_data[doc_id_str]["body"] = document_body
-            new_run_data[doc_id_str]["simhash"] = new_simhash_obj.value
-
-        else:
-            # 3. 文档未更新：直接复制旧数据，确保指纹和正文不丢失
-            new_run_data[doc_id_str] = last_doc_info.copy()
+                last_run_data[record['id']] = record
+        if _history_line_count(data_file) > 2 * len(last_run_data) + 100:
+            compact_history(data_file, last_run_data, body_store)
 
-    # 4. 保存本次运行的数据
-    save_data(data_file, new_run_data)
     print(f"\n--- 语雀增量检测完成：{len(updated_docs_meta)} 篇文档需重新处理。 ---")
 
     return updated_docs_meta